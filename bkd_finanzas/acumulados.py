@@ -0,0 +1,224 @@
+"""
+Totales mensuales materializados (acumulados_mensuales).
+
+Los endpoints de gastos, ingresos y pagos aplican deltas en la misma
+transacción que el cambio de detalle, así los reportes mensuales leen unas
+pocas filas en lugar de recorrer los movimientos del mes.
+
+Uso por línea de comandos:
+    python acumulados.py reconstruir
+    python acumulados.py verificar
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, delete, extract, func, insert
+from datetime import date
+from typing import Dict, List, Tuple
+import models
+
+ORIGEN_GASTO = "gasto"
+ORIGEN_INGRESO = "ingreso"
+ORIGEN_PAGO_TARJETA = "pago_tarjeta"
+ORIGEN_PAGO_PRESTAMO = "pago_prestamo"
+
+# Diferencia máxima admitida al verificar totales (redondeos de punto flotante)
+TOLERANCIA = 0.005
+
+Clave = Tuple[int, int, models.TipoMoneda, str, str, str]
+
+
+def _valor(tipo) -> str:
+    return getattr(tipo, "value", tipo) or ""
+
+
+def _clave(origen: str, objeto) -> Clave:
+    """Clave (ano, mes, moneda, tipo, categoria, origen) de un gasto, ingreso o pago"""
+    if origen == ORIGEN_GASTO:
+        return (objeto.fecha.year, objeto.fecha.month, objeto.moneda, _valor(objeto.tipo), objeto.categoria or "", origen)
+    if origen == ORIGEN_INGRESO:
+        return (objeto.fecha.year, objeto.fecha.month, objeto.moneda, _valor(objeto.tipo), "", origen)
+    # Los pagos no tienen moneda propia; los reportes siempre los sumaron como pesos
+    return (objeto.fecha_pago.year, objeto.fecha_pago.month, models.TipoMoneda.PESOS, "", "", origen)
+
+
+def _aplicar(db: Session, clave: Clave, total: float, cantidad: int):
+    ano, mes, moneda, tipo, categoria, origen = clave
+    acumulado = db.query(models.AcumuladoMensual).filter(
+        and_(
+            models.AcumuladoMensual.ano == ano,
+            models.AcumuladoMensual.mes == mes,
+            models.AcumuladoMensual.moneda == moneda,
+            models.AcumuladoMensual.tipo == tipo,
+            models.AcumuladoMensual.categoria == categoria,
+            models.AcumuladoMensual.origen == origen
+        )
+    ).first()
+    if not acumulado:
+        acumulado = models.AcumuladoMensual(
+            ano=ano, mes=mes, moneda=moneda, tipo=tipo, categoria=categoria, origen=origen,
+            total=0.0, cantidad=0
+        )
+        db.add(acumulado)
+        db.flush()
+    acumulado.total += total
+    acumulado.cantidad += cantidad
+
+
+def registrar(db: Session, origen: str, objeto, signo: int = 1):
+    """Suma (signo=1) o resta (signo=-1) un movimiento en su fila mensual"""
+    _aplicar(db, _clave(origen, objeto), signo * (objeto.monto or 0.0), signo)
+
+
+def registrar_varios(db: Session, origen: str, objetos, signo: int = 1):
+    """Como registrar, pero agrupa los movimientos y toca cada fila mensual una sola vez"""
+    deltas: Dict[Clave, List] = {}
+    for objeto in objetos:
+        delta = deltas.setdefault(_clave(origen, objeto), [0.0, 0])
+        delta[0] += signo * (objeto.monto or 0.0)
+        delta[1] += signo
+    for clave, (total, cantidad) in deltas.items():
+        _aplicar(db, clave, total, cantidad)
+
+
+def quitar(db: Session, origen: str, objeto):
+    """Resta un movimiento (antes de borrarlo o de modificar sus campos)"""
+    registrar(db, origen, objeto, -1)
+
+
+def _calcular_desde_detalle(db: Session) -> Dict[Clave, Tuple[float, int]]:
+    """Agrupa todo el detalle por clave mensual (una consulta por origen)"""
+    esperado = {}
+
+    def agrupar(origen, modelo, columna_fecha, columnas_extra):
+        ano = extract('year', columna_fecha)
+        mes = extract('month', columna_fecha)
+        filas = db.query(
+            ano, mes, *columnas_extra, func.sum(modelo.monto), func.count(modelo.id)
+        ).group_by(ano, mes, *columnas_extra).all()
+        for fila in filas:
+            ano_fila, mes_fila = int(fila[0]), int(fila[1])
+            extra = fila[2:-2]
+            if origen == ORIGEN_GASTO:
+                clave = (ano_fila, mes_fila, extra[0], _valor(extra[1]), extra[2] or "", origen)
+            elif origen == ORIGEN_INGRESO:
+                clave = (ano_fila, mes_fila, extra[0], _valor(extra[1]), "", origen)
+            else:
+                clave = (ano_fila, mes_fila, models.TipoMoneda.PESOS, "", "", origen)
+            total, cantidad = esperado.get(clave, (0.0, 0))
+            esperado[clave] = (total + (fila[-2] or 0.0), cantidad + fila[-1])
+
+    agrupar(ORIGEN_GASTO, models.Gasto, models.Gasto.fecha,
+            [models.Gasto.moneda, models.Gasto.tipo, func.coalesce(models.Gasto.categoria, "")])
+    agrupar(ORIGEN_INGRESO, models.Ingreso, models.Ingreso.fecha,
+            [models.Ingreso.moneda, models.Ingreso.tipo])
+    agrupar(ORIGEN_PAGO_TARJETA, models.PagoTarjeta, models.PagoTarjeta.fecha_pago, [])
+    agrupar(ORIGEN_PAGO_PRESTAMO, models.PagoPrestamo, models.PagoPrestamo.fecha_pago, [])
+    return esperado
+
+
+def reconstruir(db: Session) -> int:
+    """Recalcula todos los acumulados desde el detalle"""
+    esperado = _calcular_desde_detalle(db)
+    db.execute(delete(models.AcumuladoMensual))
+    filas = [{
+        "ano": ano, "mes": mes, "moneda": moneda, "tipo": tipo, "categoria": categoria,
+        "origen": origen, "total": total, "cantidad": cantidad
+    } for (ano, mes, moneda, tipo, categoria, origen), (total, cantidad) in esperado.items()]
+    if filas:
+        db.execute(insert(models.AcumuladoMensual), filas)
+    db.commit()
+    return len(filas)
+
+
+def verificar(db: Session) -> Dict:
+    """Compara los acumulados con el detalle y devuelve las diferencias"""
+    esperado = _calcular_desde_detalle(db)
+    almacenado = {
+        (a.ano, a.mes, a.moneda, a.tipo, a.categoria, a.origen): (a.total, a.cantidad)
+        for a in db.query(models.AcumuladoMensual).all()
+    }
+
+    diferencias = []
+    for clave in set(esperado) | set(almacenado):
+        total_esperado, cantidad_esperada = esperado.get(clave, (0.0, 0))
+        total_almacenado, cantidad_almacenada = almacenado.get(clave, (0.0, 0))
+        if cantidad_esperada != cantidad_almacenada or abs(total_esperado - total_almacenado) > TOLERANCIA:
+            ano, mes, moneda, tipo, categoria, origen = clave
+            diferencias.append({
+                "periodo": f"{ano}-{mes:02d}",
+                "moneda": moneda.value,
+                "tipo": tipo,
+                "categoria": categoria,
+                "origen": origen,
+                "total_detalle": total_esperado,
+                "total_acumulado": total_almacenado,
+                "cantidad_detalle": cantidad_esperada,
+                "cantidad_acumulado": cantidad_almacenada
+            })
+
+    diferencias.sort(key=lambda d: (d["periodo"], d["origen"], d["tipo"], d["categoria"]))
+    return {"consistente": not diferencias, "diferencias": diferencias}
+
+
+def asegurar_inicializado(db: Session):
+    """Reconstruye los acumulados si la tabla está vacía pero ya hay movimientos"""
+    if db.query(models.AcumuladoMensual.id).first():
+        return
+    for modelo in (models.Gasto, models.Ingreso, models.PagoTarjeta, models.PagoPrestamo):
+        if db.query(modelo.id).first():
+            reconstruir(db)
+            return
+
+
+def filas_mes(db: Session, ano: int, mes: int) -> List[models.AcumuladoMensual]:
+    """Filas acumuladas de un mes"""
+    return db.query(models.AcumuladoMensual).filter(
+        and_(
+            models.AcumuladoMensual.ano == ano,
+            models.AcumuladoMensual.mes == mes
+        )
+    ).all()
+
+
+def totales_por_mes(db: Session, origen: str, desde: date, hasta: date) -> Dict[Tuple[date, models.TipoMoneda], float]:
+    """Totales por (primer día del mes, moneda) de un origen entre dos fechas"""
+    periodo = models.AcumuladoMensual.ano * 100 + models.AcumuladoMensual.mes
+    filas = db.query(
+        models.AcumuladoMensual.ano, models.AcumuladoMensual.mes, models.AcumuladoMensual.moneda,
+        func.sum(models.AcumuladoMensual.total)
+    ).filter(
+        and_(
+            models.AcumuladoMensual.origen == origen,
+            periodo >= desde.year * 100 + desde.month,
+            periodo <= hasta.year * 100 + hasta.month
+        )
+    ).group_by(
+        models.AcumuladoMensual.ano, models.AcumuladoMensual.mes, models.AcumuladoMensual.moneda
+    ).all()
+    return {(date(ano, mes, 1), moneda): total or 0.0 for ano, mes, moneda, total in filas}
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import SessionLocal, Base, engine
+
+    parser = argparse.ArgumentParser(description="Mantenimiento de los acumulados mensuales")
+    parser.add_argument("accion", choices=["reconstruir", "verificar"])
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if args.accion == "reconstruir":
+            print(f"Acumulados reconstruidos: {reconstruir(db)} filas")
+        else:
+            resultado = verificar(db)
+            if resultado["consistente"]:
+                print("Los acumulados coinciden con el detalle")
+            else:
+                for d in resultado["diferencias"]:
+                    print(f"{d['periodo']} {d['origen']} {d['moneda']} {d['tipo']} {d['categoria']}: "
+                          f"detalle {d['total_detalle']:.2f} ({d['cantidad_detalle']}) / "
+                          f"acumulado {d['total_acumulado']:.2f} ({d['cantidad_acumulado']})")
+                raise SystemExit(1)
+    finally:
+        db.close()
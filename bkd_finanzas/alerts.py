@@ -1,13 +1,20 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, extract, func, or_
+from sqlalchemy import and_, func, or_
 from datetime import date, timedelta
 from typing import List, Dict
 import models
 import reports
+import inflacion
+import anomalias
+import acumulados
+import cache_resultados
 
 
-def obtener_alertas(db: Session) -> List[Dict]:
-    """Obtiene todas las alertas del sistema con análisis inteligente"""
+def obtener_alertas(db: Session, real: bool = False) -> List[Dict]:
+    """Obtiene todas las alertas del sistema con análisis inteligente
+
+    real: compara los gastos en términos reales (descontando la inflación de la línea de base)
+    """
     alertas = []
     
     # Obtener mes actual
@@ -15,8 +22,9 @@ def obtener_alertas(db: Session) -> List[Dict]:
     mes_actual = hoy.month
     ano_actual = hoy.year
     
-    # Alertas de incremento de gastos
-    alertas_gastos = analizar_incremento_gastos(db, ano_actual, mes_actual)
+    # Alertas de gastos atípicos (línea de base móvil por categoría y moneda; en términos
+    # reales, con los meses de la base ajustados por IPC)
+    alertas_gastos = anomalias.analizar_anomalias(db, real=real)
     alertas.extend(alertas_gastos)
     
     # Alertas de deudas
@@ -54,84 +62,6 @@ def obtener_alertas(db: Session) -> List[Dict]:
     return alertas
 
 
-def analizar_incremento_gastos(db: Session, ano: int, mes: int) -> List[Dict]:
-    """Analiza incrementos en gastos comparando con meses anteriores"""
-    alertas = []
-    
-    # Obtener gastos del mes actual
-    gastos_actuales = db.query(models.Gasto).filter(
-        and_(
-            extract('year', models.Gasto.fecha) == ano,
-            extract('month', models.Gasto.fecha) == mes
-        )
-    ).all()
-    
-    total_actual_ars = sum(g.monto for g in gastos_actuales if g.moneda == models.TipoMoneda.PESOS)
-    total_actual_usd = sum(g.monto for g in gastos_actuales if g.moneda == models.TipoMoneda.DOLARES)
-    
-    # Comparar con mes anterior
-    mes_anterior = mes - 1
-    ano_anterior = ano
-    if mes_anterior == 0:
-        mes_anterior = 12
-        ano_anterior = ano - 1
-    
-    gastos_anteriores = db.query(models.Gasto).filter(
-        and_(
-            extract('year', models.Gasto.fecha) == ano_anterior,
-            extract('month', models.Gasto.fecha) == mes_anterior
-        )
-    ).all()
-    
-    total_anterior_ars = sum(g.monto for g in gastos_anteriores if g.moneda == models.TipoMoneda.PESOS)
-    total_anterior_usd = sum(g.monto for g in gastos_anteriores if g.moneda == models.TipoMoneda.DOLARES)
-    
-    if total_anterior_ars > 0:
-        incremento_porcentual_ars = ((total_actual_ars - total_anterior_ars) / total_anterior_ars) * 100
-        if incremento_porcentual_ars > 20:  # Alerta si incremento > 20%
-            alertas.append({
-                "tipo": "incremento_gastos",
-                "severidad": "alta" if incremento_porcentual_ars > 50 else "media",
-                "titulo": "Incremento significativo en gastos (ARS)",
-                "mensaje": f"Los gastos en pesos aumentaron un {incremento_porcentual_ars:.1f}% respecto al mes anterior",
-                "detalle": {
-                    "mes_actual": f"{ano}-{mes:02d}",
-                    "mes_anterior": f"{ano_anterior}-{mes_anterior:02d}",
-                    "total_actual": total_actual_ars,
-                    "total_anterior": total_anterior_ars,
-                    "incremento_porcentual": round(incremento_porcentual_ars, 2),
-                    "incremento_absoluto": total_actual_ars - total_anterior_ars
-                }
-            })
-    
-    # Analizar por tipo de gasto
-    tipos_gasto = [models.TipoGasto.FIJO, models.TipoGasto.ORDINARIO, models.TipoGasto.EXTRAORDINARIO]
-    for tipo in tipos_gasto:
-        gastos_tipo_actual = [g for g in gastos_actuales if g.tipo == tipo]
-        gastos_tipo_anterior = [g for g in gastos_anteriores if g.tipo == tipo]
-        
-        total_tipo_actual = sum(g.monto for g in gastos_tipo_actual if g.moneda == models.TipoMoneda.PESOS)
-        total_tipo_anterior = sum(g.monto for g in gastos_tipo_anterior if g.moneda == models.TipoMoneda.PESOS)
-        
-        if total_tipo_anterior > 0:
-            incremento = ((total_tipo_actual - total_tipo_anterior) / total_tipo_anterior) * 100
-            if incremento > 30:
-                alertas.append({
-                    "tipo": "incremento_gasto_tipo",
-                    "severidad": "media",
-                    "titulo": f"Incremento en gastos {tipo.value}",
-                    "mensaje": f"Los gastos {tipo.value.lower()} aumentaron un {incremento:.1f}% respecto al mes anterior",
-                    "detalle": {
-                        "tipo_gasto": tipo.value,
-                        "incremento_porcentual": round(incremento, 2),
-                        "total_actual": total_tipo_actual,
-                        "total_anterior": total_tipo_anterior
-                    }
-                })
-    
-    return alertas
-
-
 def analizar_deudas(db: Session) -> List[Dict]:
     """Analiza deudas y genera alertas"""
     alertas = []
@@ -229,7 +159,7 @@ def analizar_saldo_negativo(db: Session, ano: int, mes: int) -> List[Dict]:
     """Analiza si hay saldo negativo en el mes"""
     alertas = []
     
-    resumen = reports.saldos_positivos(db, ano, mes)
+    resumen = reports.saldos_positivos(db, ano, mes, incluir_detalle=False)
     
     if resumen["saldo"]["ars"] < 0:
         alertas.append({
@@ -247,55 +177,174 @@ def analizar_saldo_negativo(db: Session, ano: int, mes: int) -> List[Dict]:
     return alertas
 
 
-def analizar_tendencias(db: Session) -> Dict:
-    """Analiza tendencias de los últimos 6 meses"""
+GRANULARIDADES = ("semana", "mes", "trimestre")
+
+
+def _inicio_semana(columna, dialecto: str):
+    """Expresión SQL con la fecha de inicio de la semana (desde el lunes)"""
+    if dialecto == "sqlite":
+        return func.date(columna, "weekday 0", "-6 days")
+    return func.date_trunc("week", columna)
+
+
+def _inicios_periodos(desde: date, hasta: date, granularidad: str) -> List[date]:
+    """Fechas de inicio de todos los períodos entre `desde` y `hasta` (incluidos)"""
+    if granularidad == "semana":
+        actual = desde - timedelta(days=desde.weekday())
+        inicios = []
+        while actual <= hasta:
+            inicios.append(actual)
+            actual += timedelta(days=7)
+        return inicios
+
+    paso = 3 if granularidad == "trimestre" else 1
+    mes = ((desde.month - 1) // paso) * paso + 1
+    ano = desde.year
+    inicios = []
+    while date(ano, mes, 1) <= hasta:
+        inicios.append(date(ano, mes, 1))
+        mes += paso
+        if mes > 12:
+            mes -= 12
+            ano += 1
+    return inicios
+
+
+def _etiqueta_periodo(inicio: date, granularidad: str) -> str:
+    if granularidad == "semana":
+        return inicio.isoformat()
+    if granularidad == "trimestre":
+        return f"{inicio.year}-T{(inicio.month - 1) // 3 + 1}"
+    return f"{inicio.year}-{inicio.month:02d}"
+
+
+def _totales_por_periodo(db: Session, modelo, granularidad: str, desde: date, hasta: date) -> Dict:
+    """Suma montos por (inicio de período, moneda)
+
+    Meses y trimestres salen de los acumulados mensuales; las semanas, de un
+    único GROUP BY sobre el detalle.
+    """
+    if granularidad != "semana":
+        origen = acumulados.ORIGEN_GASTO if modelo is models.Gasto else acumulados.ORIGEN_INGRESO
+        totales = {}
+        for (inicio, moneda), total in acumulados.totales_por_mes(db, origen, desde, hasta).items():
+            if granularidad == "trimestre":
+                inicio = date(inicio.year, ((inicio.month - 1) // 3) * 3 + 1, 1)
+            totales[(inicio, moneda)] = totales.get((inicio, moneda), 0.0) + total
+        return totales
+
+    periodo = _inicio_semana(modelo.fecha, db.get_bind().dialect.name)
+    filas = db.query(
+        periodo.label("periodo"), modelo.moneda, func.sum(modelo.monto)
+    ).filter(
+        and_(
+            modelo.fecha >= desde,
+            modelo.fecha <= hasta
+        )
+    ).group_by(periodo, modelo.moneda).all()
+
+    totales = {}
+    for inicio, moneda, total in filas:
+        inicio = date.fromisoformat(str(inicio)[:10])
+        totales[(inicio, moneda)] = total or 0.0
+    return totales
+
+
+def _media_movil(valores: List[float], ventana: int) -> List[float]:
+    """Media móvil simple hacia atrás (los primeros puntos usan los valores disponibles)"""
+    medias = []
+    acumulado = 0.0
+    for i, valor in enumerate(valores):
+        acumulado += valor
+        if i >= ventana:
+            acumulado -= valores[i - ventana]
+        medias.append(acumulado / min(i + 1, ventana))
+    return medias
+
+
+def _pendiente(valores: List[float]) -> float:
+    """Pendiente de la recta de mínimos cuadrados (variación por período)"""
+    n = len(valores)
+    if n < 2:
+        return 0.0
+    media_x = (n - 1) / 2
+    media_y = sum(valores) / n
+    numerador = sum((i - media_x) * (y - media_y) for i, y in enumerate(valores))
+    denominador = sum((i - media_x) ** 2 for i in range(n))
+    return numerador / denominador
+
+
+@cache_resultados.cacheado(("acumulados_mensuales", "gastos", "ingresos", "indice_precios"))
+def analizar_tendencias(
+    db: Session,
+    real: bool = False,
+    base: str = None,
+    meses: int = 6,
+    granularidad: str = "mes",
+    ventana: int = 3
+) -> Dict:
+    """Analiza tendencias de gastos, ingresos y saldos en ambas monedas
+
+    meses: horizonte hacia atrás (incluye el período actual)
+    granularidad: "semana", "mes" o "trimestre"
+    ventana: cantidad de períodos de la media móvil
+    real: expresa los totales en pesos del mes `base` (por defecto, el más reciente)
+
+    Cuesta dos consultas (gastos e ingresos) sin importar el horizonte. Las
+    series se devuelven del período más reciente al más antiguo.
+    """
+    if granularidad not in GRANULARIDADES:
+        raise ValueError(f"Granularidad inválida: {granularidad}")
+    
     hoy = date.today()
+    mes_desde = hoy.month - meses + 1
+    ano_desde = hoy.year
+    while mes_desde <= 0:
+        mes_desde += 12
+        ano_desde -= 1
+    inicios = _inicios_periodos(date(ano_desde, mes_desde, 1), hoy, granularidad)
+    desde = inicios[0]
+    
+    totales_gastos = _totales_por_periodo(db, models.Gasto, granularidad, desde, hoy)
+    totales_ingresos = _totales_por_periodo(db, models.Ingreso, granularidad, desde, hoy)
+    
+    def serie(totales: Dict) -> List[Dict]:
+        return [{
+            "mes": _etiqueta_periodo(inicio, granularidad),
+            "inicio": inicio.isoformat(),
+            "mes_referencia": f"{inicio.year}-{inicio.month:02d}",
+            "total": totales.get((inicio, models.TipoMoneda.PESOS), 0.0),
+            "total_usd": totales.get((inicio, models.TipoMoneda.DOLARES), 0.0)
+        } for inicio in inicios]
+    
+    gastos = serie(totales_gastos)
+    ingresos = serie(totales_ingresos)
+    
+    if real:
+        gastos = inflacion.deflactar_serie(db, gastos, base, clave="mes_referencia")
+        ingresos = inflacion.deflactar_serie(db, ingresos, base, clave="mes_referencia")
+    
+    saldos = [{
+        **{k: v for k, v in gasto.items() if k not in ("total", "total_usd")},
+        "total": ingreso["total"] - gasto["total"],
+        "total_usd": ingreso["total_usd"] - gasto["total_usd"]
+    } for gasto, ingreso in zip(gastos, ingresos)]
+    
     tendencias = {
-        "gastos": [],
-        "ingresos": [],
-        "saldos": []
+        "granularidad": granularidad,
+        "meses": meses,
+        "pendiente": {}
     }
-    
-    for i in range(6):
-        mes = hoy.month - i
-        ano = hoy.year
-        
-        if mes <= 0:
-            mes += 12
-            ano -= 1
-        
-        # Gastos
-        gastos = db.query(models.Gasto).filter(
-            and_(
-                extract('year', models.Gasto.fecha) == ano,
-                extract('month', models.Gasto.fecha) == mes
-            )
-        ).all()
-        total_gastos = sum(g.monto for g in gastos if g.moneda == models.TipoMoneda.PESOS)
-        
-        # Ingresos
-        ingresos = db.query(models.Ingreso).filter(
-            and_(
-                extract('year', models.Ingreso.fecha) == ano,
-                extract('month', models.Ingreso.fecha) == mes
-            )
-        ).all()
-        total_ingresos = sum(i.monto for i in ingresos if i.moneda == models.TipoMoneda.PESOS)
-        
-        saldo = total_ingresos - total_gastos
-        
-        tendencias["gastos"].append({
-            "mes": f"{ano}-{mes:02d}",
-            "total": total_gastos
-        })
-        tendencias["ingresos"].append({
-            "mes": f"{ano}-{mes:02d}",
-            "total": total_ingresos
-        })
-        tendencias["saldos"].append({
-            "mes": f"{ano}-{mes:02d}",
-            "total": saldo
-        })
+    for nombre, puntos in (("gastos", gastos), ("ingresos", ingresos), ("saldos", saldos)):
+        for campo, sufijo in (("total", "ars"), ("total_usd", "usd")):
+            valores = [p[campo] for p in puntos]
+            for punto, media in zip(puntos, _media_movil(valores, ventana)):
+                punto["media_movil" if campo == "total" else "media_movil_usd"] = media
+            tendencias["pendiente"].setdefault(nombre, {})[sufijo] = _pendiente(valores)
+        tendencias[nombre] = list(reversed(puntos))
+    
+    if real:
+        tendencias["real"] = True
     
     # Calcular porcentajes de cambio
     if len(tendencias["gastos"]) >= 2:
@@ -0,0 +1,327 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, delete, func, insert
+from datetime import date
+from calendar import monthrange
+from typing import Dict, List, Optional
+import math
+import models
+import cotizaciones
+
+# Tolerancia para considerar cubierta una cuota (redondeos de centavos)
+TOLERANCIA_PAGO = 0.01
+# Campos que, al modificarse, obligan a recalcular el cronograma de cuotas
+CAMPOS_CRONOGRAMA = {
+    "monto_total", "tasa_interes", "impuesto_iva", "impuesto_ganancias", "gastos_administrativos",
+    "seguro", "impuesto_sellos", "fecha_inicio", "fecha_vencimiento", "cuota_mensual",
+    "sistema_amortizacion", "cantidad_cuotas", "valor_uva_inicial"
+}
+
+
+def sumar_meses(fecha: date, meses: int) -> date:
+    """Suma meses a una fecha ajustando el día al último del mes si hace falta"""
+    mes = fecha.month - 1 + meses
+    ano = fecha.year + mes // 12
+    mes = mes % 12 + 1
+    return date(ano, mes, min(fecha.day, monthrange(ano, mes)[1]))
+
+
+def calcular_cantidad_cuotas(prestamo: models.Prestamo) -> int:
+    """Determina la cantidad de cuotas del préstamo"""
+    if prestamo.cantidad_cuotas and prestamo.cantidad_cuotas > 0:
+        return prestamo.cantidad_cuotas
+
+    if prestamo.fecha_vencimiento and prestamo.fecha_vencimiento > prestamo.fecha_inicio:
+        meses = (prestamo.fecha_vencimiento.year - prestamo.fecha_inicio.year) * 12 + \
+            prestamo.fecha_vencimiento.month - prestamo.fecha_inicio.month
+        return max(1, meses)
+
+    if prestamo.cuota_mensual and prestamo.cuota_mensual > 0:
+        return max(1, math.ceil(prestamo.monto_total / prestamo.cuota_mensual))
+
+    return 12
+
+
+def calcular_cronograma(
+    prestamo: models.Prestamo,
+    capital_inicial: Optional[float] = None,
+    desde_cuota: int = 1,
+    valores_uva: Optional[Dict[str, float]] = None
+) -> List[Dict]:
+    """Calcula las cuotas del préstamo desde `desde_cuota` hasta la última.
+
+    Cada cuota se obtiene con la fórmula cerrada de su sistema (sin depender de
+    la cuota anterior), de modo que el cronograma completo sale en una sola pasada.
+    `valores_uva` mapea "YYYY-MM" al valor de la UVA; si falta un mes se usa
+    el valor inicial (proyección a UVA constante).
+    """
+    total_cuotas = calcular_cantidad_cuotas(prestamo)
+    n = total_cuotas - desde_cuota + 1
+    if n <= 0:
+        return []
+
+    capital = prestamo.monto_total if capital_inicial is None else capital_inicial
+    sistema = prestamo.sistema_amortizacion or models.SistemaAmortizacion.FRANCES
+    i = (prestamo.tasa_interes or 0.0) / 12.0 / 100.0
+
+    valor_uva_inicial = prestamo.valor_uva_inicial or 1.0
+    if sistema == models.SistemaAmortizacion.UVA:
+        capital = capital / valor_uva_inicial  # El cronograma se calcula en UVAs
+
+    impuesto_iva = prestamo.impuesto_iva if prestamo.impuesto_iva is not None else 21.0
+    impuesto_ganancias = prestamo.impuesto_ganancias or 0.0
+    gastos_administrativos = prestamo.gastos_administrativos if prestamo.gastos_administrativos is not None else 500.0
+    seguro = prestamo.seguro or 0.0
+    impuesto_sellos = (prestamo.monto_total * (prestamo.impuesto_sellos or 0.0) / 100.0)
+    iva_cargos_fijos = (gastos_administrativos + seguro) * impuesto_iva / 100.0
+
+    if i > 0:
+        cuota_pura = capital * i / (1 - (1 + i) ** -n)
+    else:
+        cuota_pura = capital / n
+    amortizacion_aleman = capital / n
+
+    def saldo_previo(k: int) -> float:
+        """Saldo de capital antes de pagar la k-ésima cuota restante (k desde 1)"""
+        if sistema == models.SistemaAmortizacion.ALEMAN:
+            return capital - amortizacion_aleman * (k - 1)
+        if i > 0:
+            factor = (1 + i) ** (k - 1)
+            return capital * factor - cuota_pura * (factor - 1) / i
+        return capital - cuota_pura * (k - 1)
+
+    hoy = date.today()
+    filas = []
+    for k in range(1, n + 1):
+        numero_cuota = desde_cuota + k - 1
+        # Siempre desde la fecha de inicio: así un día 31 no queda fijado en 28/30
+        fecha_vencimiento = sumar_meses(prestamo.fecha_inicio, numero_cuota)
+        saldo_anterior = saldo_previo(k)
+        intereses = saldo_anterior * i
+        if sistema == models.SistemaAmortizacion.ALEMAN:
+            amortizacion = amortizacion_aleman
+        else:
+            amortizacion = cuota_pura - intereses
+        saldo = max(0.0, saldo_anterior - amortizacion)
+
+        if sistema == models.SistemaAmortizacion.UVA:
+            valor_uva = (valores_uva or {}).get(fecha_vencimiento.strftime("%Y-%m"), valor_uva_inicial)
+            intereses *= valor_uva
+            amortizacion *= valor_uva
+            saldo *= valor_uva
+
+        iva_intereses = intereses * impuesto_iva / 100.0
+        ganancias = intereses * impuesto_ganancias / 100.0
+        otros_impuestos = iva_cargos_fijos + (impuesto_sellos if numero_cuota == 1 else 0.0)
+
+        filas.append({
+            "prestamo_id": prestamo.id,
+            "fecha_vencimiento": fecha_vencimiento,
+            "numero_cuota": numero_cuota,
+            "monto_total": amortizacion + intereses + iva_intereses + ganancias + gastos_administrativos + seguro + otros_impuestos,
+            "capital": amortizacion,
+            "intereses": intereses,
+            "iva_intereses": iva_intereses,
+            "impuesto_ganancias": ganancias,
+            "gastos_administrativos": gastos_administrativos,
+            "seguro": seguro,
+            "otros_impuestos": otros_impuestos,
+            "saldo_capital": saldo,
+            "adelanto_capital": 0.0,
+            "moneda": prestamo.moneda,
+            "descripcion": f"Cuota {numero_cuota}/{total_cuotas} ({sistema.value})",
+            "pagada": False,
+            "created_at": hoy,
+        })
+
+    return filas
+
+
+def valores_uva_de(db: Session, prestamo: models.Prestamo) -> Dict[str, float]:
+    """Valor de la UVA para el mes de cada vencimiento ("YYYY-MM"), de la serie UVA de cotizaciones.
+
+    Los meses posteriores al último valor cargado usan ese último valor; sin
+    serie cargada queda vacío (el cronograma se proyecta con valor_uva_inicial).
+    """
+    if prestamo.sistema_amortizacion != models.SistemaAmortizacion.UVA:
+        return {}
+    fechas = [sumar_meses(prestamo.fecha_inicio, k) for k in range(1, calcular_cantidad_cuotas(prestamo) + 1)]
+    vigentes = cotizaciones.cotizaciones_asof(db, fechas, models.SerieCotizacion.UVA)
+    return {fecha.strftime("%Y-%m"): valor for fecha, valor in vigentes.items() if valor}
+
+
+def _credito(db: Session, prestamo: models.Prestamo) -> float:
+    """Lo pagado que todavía no cubre cuotas enteras ni se aplicó como adelanto de capital"""
+    pagado_en_cuotas, adelantado = db.query(
+        func.coalesce(func.sum(case((models.DesgloseCuotaPrestamo.pagada == True, models.DesgloseCuotaPrestamo.monto_total), else_=0.0)), 0.0),
+        func.coalesce(func.sum(models.DesgloseCuotaPrestamo.adelanto_capital), 0.0)
+    ).filter(models.DesgloseCuotaPrestamo.prestamo_id == prestamo.id).one()
+    return (prestamo.monto_pagado or 0.0) - pagado_en_cuotas - adelantado
+
+
+def aplicar_pagos(db: Session, prestamo: models.Prestamo) -> int:
+    """Marca como pagadas las cuotas cubiertas por monto_pagado. Devuelve cuántas marcó."""
+    credito = _credito(db, prestamo)
+
+    pendientes = db.query(models.DesgloseCuotaPrestamo).filter(
+        and_(
+            models.DesgloseCuotaPrestamo.prestamo_id == prestamo.id,
+            models.DesgloseCuotaPrestamo.pagada == False
+        )
+    ).order_by(models.DesgloseCuotaPrestamo.numero_cuota)
+
+    marcadas = 0
+    for cuota in pendientes:
+        if credito + TOLERANCIA_PAGO < cuota.monto_total:
+            break
+        cuota.pagada = True
+        credito -= cuota.monto_total
+        marcadas += 1
+    db.flush()
+    return marcadas
+
+
+def generar_cronograma(db: Session, prestamo: models.Prestamo, valores_uva: Optional[Dict[str, float]] = None) -> int:
+    """Genera y persiste el cronograma completo del préstamo (reemplaza el existente).
+
+    Lo pagado vuelve a aplicarse desde la primera cuota; no confirma la transacción.
+    """
+    if valores_uva is None:
+        valores_uva = valores_uva_de(db, prestamo)
+    db.execute(delete(models.DesgloseCuotaPrestamo).where(
+        models.DesgloseCuotaPrestamo.prestamo_id == prestamo.id
+    ))
+    filas = calcular_cronograma(prestamo, valores_uva=valores_uva)
+    if filas:
+        db.execute(insert(models.DesgloseCuotaPrestamo), filas)
+    pagadas = aplicar_pagos(db, prestamo)
+    return pagadas + regenerar_pendientes(db, prestamo, valores_uva)
+
+
+def regenerar_pendientes(db: Session, prestamo: models.Prestamo, valores_uva: Optional[Dict[str, float]] = None) -> int:
+    """Recalcula solo las cuotas impagas a partir del saldo de la última cuota pagada.
+
+    Primero marca las cuotas que cubre lo pagado; lo que sobra (menos de una
+    cuota) se toma como adelanto de capital: las cuotas pendientes se
+    recalculan sobre el saldo menos el adelanto, con el mismo plazo. El
+    adelanto queda en la primera cuota pendiente para no volver a contarlo.
+    No confirma la transacción. Devuelve las cuotas pendientes generadas.
+    """
+    if valores_uva is None:
+        valores_uva = valores_uva_de(db, prestamo)
+    aplicar_pagos(db, prestamo)
+    ultima_pagada = db.query(models.DesgloseCuotaPrestamo).filter(
+        and_(
+            models.DesgloseCuotaPrestamo.prestamo_id == prestamo.id,
+            models.DesgloseCuotaPrestamo.pagada == True
+        )
+    ).order_by(models.DesgloseCuotaPrestamo.numero_cuota.desc()).first()
+    desde_cuota = ultima_pagada.numero_cuota + 1 if ultima_pagada else 1
+
+    pendientes = and_(
+        models.DesgloseCuotaPrestamo.prestamo_id == prestamo.id,
+        models.DesgloseCuotaPrestamo.numero_cuota >= desde_cuota
+    )
+    adelanto = db.query(func.coalesce(func.sum(models.DesgloseCuotaPrestamo.adelanto_capital), 0.0)).filter(
+        pendientes
+    ).scalar() + max(0.0, _credito(db, prestamo))
+    if adelanto < TOLERANCIA_PAGO:
+        adelanto = 0.0
+    db.execute(delete(models.DesgloseCuotaPrestamo).where(pendientes))
+
+    valor_uva_inicial = prestamo.valor_uva_inicial or 1.0
+    saldo = ultima_pagada.saldo_capital if ultima_pagada else prestamo.monto_total
+    if prestamo.sistema_amortizacion == models.SistemaAmortizacion.UVA:
+        # Saldo y adelanto están en pesos al valor UVA de la última cuota pagada;
+        # calcular_cronograma espera pesos al valor inicial
+        valor_uva = valor_uva_inicial
+        if ultima_pagada:
+            valor_uva = (valores_uva or {}).get(ultima_pagada.fecha_vencimiento.strftime("%Y-%m"), valor_uva_inicial)
+        saldo = saldo / valor_uva * valor_uva_inicial
+        capital = saldo - adelanto / valor_uva * valor_uva_inicial
+    else:
+        capital = saldo - adelanto
+    if capital <= TOLERANCIA_PAGO:
+        return 0
+
+    filas = calcular_cronograma(prestamo, capital_inicial=capital, desde_cuota=desde_cuota, valores_uva=valores_uva)
+    if filas:
+        filas[0]["adelanto_capital"] = adelanto
+        db.execute(insert(models.DesgloseCuotaPrestamo), filas)
+    return len(filas)
+
+
+def generar_faltantes(db: Session) -> int:
+    """Genera el cronograma de los préstamos que no tienen (p. ej. creados antes de persistirlos)"""
+    con_cronograma = db.query(models.DesgloseCuotaPrestamo.prestamo_id).distinct()
+    prestamos = db.query(models.Prestamo).filter(models.Prestamo.id.not_in(con_cronograma)).all()
+    for prestamo in prestamos:
+        generar_cronograma(db, prestamo)
+    if prestamos:
+        db.commit()
+    return len(prestamos)
+
+
+def obtener_proxima_cuota(db: Session, prestamo: models.Prestamo) -> Optional[models.DesgloseCuotaPrestamo]:
+    """Devuelve la próxima cuota impaga (solo lectura; None si no queda ninguna)"""
+    return db.query(models.DesgloseCuotaPrestamo).filter(
+        and_(
+            models.DesgloseCuotaPrestamo.prestamo_id == prestamo.id,
+            models.DesgloseCuotaPrestamo.pagada == False
+        )
+    ).order_by(models.DesgloseCuotaPrestamo.numero_cuota).first()
+
+
+def desglose_proxima_cuota(db: Session, prestamo: models.Prestamo) -> Optional[Dict]:
+    """Desglose de la próxima cuota impaga según el cronograma persistido (None si no queda ninguna)"""
+    cuota = obtener_proxima_cuota(db, prestamo)
+    if not cuota:
+        return None
+    
+    # Lo que falta pagar según el cronograma (capital, intereses y cargos de las cuotas impagas)
+    monto_pendiente = db.query(func.sum(models.DesgloseCuotaPrestamo.monto_total)).filter(
+        and_(
+            models.DesgloseCuotaPrestamo.prestamo_id == prestamo.id,
+            models.DesgloseCuotaPrestamo.pagada == False
+        )
+    ).scalar()
+    
+    tasa_interes_anual = prestamo.tasa_interes if prestamo.tasa_interes else 0.0
+    tasa_interes_mensual = tasa_interes_anual / 12.0
+    impuesto_iva = prestamo.impuesto_iva if prestamo.impuesto_iva is not None else 21.0
+    
+    # El IVA sobre gastos administrativos y seguro se persiste dentro de otros_impuestos
+    iva_gastos_admin = cuota.gastos_administrativos * impuesto_iva / 100.0
+    iva_seguro = cuota.seguro * impuesto_iva / 100.0
+    otros_impuestos = max(0.0, cuota.otros_impuestos - iva_gastos_admin - iva_seguro)
+    total_impuestos = cuota.iva_intereses + cuota.impuesto_ganancias + cuota.otros_impuestos
+    total_cargos = cuota.intereses + cuota.gastos_administrativos + cuota.seguro + total_impuestos
+    
+    return {
+        "prestamo_id": prestamo.id,
+        "prestamo_nombre": prestamo.nombre,
+        "fecha_vencimiento": cuota.fecha_vencimiento.isoformat(),
+        "numero_cuota": cuota.numero_cuota,
+        "moneda": prestamo.moneda.value,
+        "monto_pendiente": monto_pendiente,
+        "sistema_amortizacion": (prestamo.sistema_amortizacion or models.SistemaAmortizacion.FRANCES).value,
+        "desglose": {
+            "monto_total": cuota.monto_total,
+            "capital": cuota.capital,
+            "intereses": cuota.intereses,
+            "iva_intereses": cuota.iva_intereses,
+            "impuesto_ganancias": cuota.impuesto_ganancias,
+            "gastos_administrativos": cuota.gastos_administrativos,
+            "iva_gastos_admin": iva_gastos_admin,
+            "seguro": cuota.seguro,
+            "iva_seguro": iva_seguro,
+            "otros_impuestos": otros_impuestos,
+            "total_impuestos": total_impuestos,
+            "total_cargos": total_cargos
+        },
+        "porcentajes": {
+            "tasa_interes_anual": tasa_interes_anual,
+            "tasa_interes_mensual": tasa_interes_mensual,
+            "impuesto_iva": impuesto_iva,
+            "impuesto_ganancias": prestamo.impuesto_ganancias or 0.0
+        }
+    }
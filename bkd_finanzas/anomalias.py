@@ -0,0 +1,375 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import delete
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+import math
+import orjson
+import models
+import inflacion
+
+# Umbrales de z-score para marcar un valor como atípico
+Z_UMBRAL_MES = 2.0
+Z_UMBRAL_GASTO = 3.0
+# Observaciones mínimas antes de confiar en la línea de base
+MINIMO_MESES = 3
+MINIMO_GASTOS = 8
+# Meses cerrados que forman la línea de base móvil (los más viejos salen al abrir cada mes)
+VENTANA_MESES = 12
+
+
+def clave_categoria(categoria: Optional[str], tipo: models.TipoGasto) -> str:
+    """Categoría usada para agrupar: la del gasto o, si no tiene, su tipo"""
+    categoria = (categoria or "").strip()
+    return categoria or tipo.value
+
+
+def periodo_de(fecha: date) -> str:
+    return f"{fecha.year}-{fecha.month:02d}"
+
+
+def _meses_entre(desde: str, hasta: str) -> int:
+    """Cantidad de meses de `desde` a `hasta` (ambos "YYYY-MM")"""
+    ano_d, mes_d = map(int, desde.split("-"))
+    ano_h, mes_h = map(int, hasta.split("-"))
+    return (ano_h - ano_d) * 12 + mes_h - mes_d
+
+
+def _periodo_anterior(periodo: str, meses: int) -> str:
+    ano, mes = map(int, periodo.split("-"))
+    indice = ano * 12 + mes - 1 - meses
+    return f"{indice // 12}-{indice % 12 + 1:02d}"
+
+
+def _welford_agregar(n: int, media: float, m2: float, x: float) -> Tuple[int, float, float]:
+    n += 1
+    delta = x - media
+    media += delta / n
+    m2 += delta * (x - media)
+    return n, media, m2
+
+
+def _welford_quitar(n: int, media: float, m2: float, x: float) -> Tuple[int, float, float]:
+    if n <= 1:
+        return 0, 0.0, 0.0
+    media_nueva = (n * media - x) / (n - 1)
+    m2 -= (x - media) * (x - media_nueva)
+    return n - 1, media_nueva, max(0.0, m2)
+
+
+def _welford_combinar(
+    n_a: int, media_a: float, m2_a: float, n_b: int, media_b: float, m2_b: float
+) -> Tuple[int, float, float]:
+    """Une dos acumulados de Welford (fórmula de Chan)"""
+    n = n_a + n_b
+    if n == 0:
+        return 0, 0.0, 0.0
+    delta = media_b - media_a
+    return n, media_a + delta * n_b / n, m2_a + m2_b + delta * delta * n_a * n_b / n
+
+
+def _desvio(n: int, m2: float) -> float:
+    return math.sqrt(m2 / (n - 1)) if n > 1 else 0.0
+
+
+# Cada mes de la ventana es [periodo, total, n, media, m2] (Welford de sus gastos);
+# el último es el mes abierto
+Mes = List
+
+
+def _leer_ventana(estadistica: models.EstadisticaGasto) -> List[Mes]:
+    return orjson.loads(estadistica.ventana) if estadistica.ventana else []
+
+
+def _guardar_ventana(estadistica: models.EstadisticaGasto, meses: List[Mes]):
+    """Guarda la ventana y recalcula las columnas que leen las alertas (O(VENTANA_MESES))"""
+    estadistica.ventana = orjson.dumps(meses).decode()
+    n, media, m2 = 0, 0.0, 0.0
+    for _, _, n_mes, media_gasto, m2_gasto in meses:
+        n, media, m2 = _welford_combinar(n, media, m2, n_mes, media_gasto, m2_gasto)
+    estadistica.n, estadistica.media, estadistica.m2 = n, media, m2
+
+    n, media, m2 = 0, 0.0, 0.0
+    for mes in meses[:-1]:
+        n, media, m2 = _welford_agregar(n, media, m2, mes[1])
+    estadistica.n_meses, estadistica.media_mes, estadistica.m2_mes = n, media, m2
+    estadistica.periodo = meses[-1][0] if meses else None
+    estadistica.total_periodo = meses[-1][1] if meses else 0.0
+
+
+def _abrir_periodo(meses: List[Mes], nuevo_periodo: str):
+    """Cierra el mes abierto (rellenando con cero los meses sin gastos), abre `nuevo_periodo`
+    y descarta los meses que quedan fuera de la ventana"""
+    if meses:
+        vacios = min(_meses_entre(meses[-1][0], nuevo_periodo) - 1, VENTANA_MESES)
+        for atras in range(vacios, 0, -1):
+            meses.append([_periodo_anterior(nuevo_periodo, atras), 0.0, 0, 0.0, 0.0])
+    meses.append([nuevo_periodo, 0.0, 0, 0.0, 0.0])
+    del meses[:-(VENTANA_MESES + 1)]
+
+
+def _sumar(meses: List[Mes], periodo: str, monto: float) -> bool:
+    """Agrega un gasto a su mes; False si el mes ya salió de la ventana"""
+    if not meses or periodo > meses[-1][0]:
+        _abrir_periodo(meses, periodo)
+    for mes in meses:
+        if mes[0] == periodo:
+            mes[1] += monto
+            mes[2], mes[3], mes[4] = _welford_agregar(mes[2], mes[3], mes[4], monto)
+            return True
+    return False
+
+
+def _restar(meses: List[Mes], periodo: str, monto: float) -> bool:
+    for mes in meses:
+        if mes[0] == periodo:
+            mes[1] = max(0.0, mes[1] - monto)
+            mes[2], mes[3], mes[4] = _welford_quitar(mes[2], mes[3], mes[4], monto)
+            return True
+    return False
+
+
+def _nueva_estadistica(categoria: str, moneda: models.TipoMoneda) -> models.EstadisticaGasto:
+    return models.EstadisticaGasto(
+        categoria=categoria, moneda=moneda, n=0, media=0.0, m2=0.0,
+        n_meses=0, media_mes=0.0, m2_mes=0.0, total_periodo=0.0
+    )
+
+
+def _obtener_estadistica(db: Session, categoria: str, moneda: models.TipoMoneda) -> models.EstadisticaGasto:
+    estadistica = db.query(models.EstadisticaGasto).filter(
+        models.EstadisticaGasto.categoria == categoria,
+        models.EstadisticaGasto.moneda == moneda
+    ).first()
+    if not estadistica:
+        estadistica = _nueva_estadistica(categoria, moneda)
+        db.add(estadistica)
+        db.flush()
+    return estadistica
+
+
+def _estadisticas_de(db: Session, gastos) -> Dict[Tuple[str, models.TipoMoneda], models.EstadisticaGasto]:
+    """Estadísticas existentes de las categorías de `gastos` (una sola consulta)"""
+    categorias = {clave_categoria(g.categoria, g.tipo) for g in gastos}
+    if not categorias:
+        return {}
+    existentes = db.query(models.EstadisticaGasto).filter(
+        models.EstadisticaGasto.categoria.in_(categorias)
+    ).all()
+    return {(e.categoria, e.moneda): e for e in existentes}
+
+
+def registrar_gasto(
+    db: Session, gasto: models.Gasto, estadistica: Optional[models.EstadisticaGasto] = None
+) -> Optional[models.AnomaliaGasto]:
+    """Actualiza las estadísticas con un gasto nuevo (el gasto ya debe tener id).
+
+    Si el monto es atípico frente a la línea de base previa, registra la anomalía.
+    Los gastos de meses que ya salieron de la ventana no cambian la línea de base.
+    """
+    categoria = clave_categoria(gasto.categoria, gasto.tipo)
+    estadistica = estadistica or _obtener_estadistica(db, categoria, gasto.moneda)
+
+    anomalia = None
+    desvio = _desvio(estadistica.n or 0, estadistica.m2 or 0.0)
+    if (estadistica.n or 0) >= MINIMO_GASTOS and desvio > 0:
+        z = (gasto.monto - estadistica.media) / desvio
+        if z > Z_UMBRAL_GASTO:
+            anomalia = models.AnomaliaGasto(
+                gasto_id=gasto.id,
+                categoria=categoria,
+                moneda=gasto.moneda,
+                fecha=gasto.fecha,
+                monto=gasto.monto,
+                media=estadistica.media,
+                desvio=desvio,
+                z_score=z
+            )
+            db.add(anomalia)
+
+    meses = _leer_ventana(estadistica)
+    if _sumar(meses, periodo_de(gasto.fecha), gasto.monto):
+        _guardar_ventana(estadistica, meses)
+
+    return anomalia
+
+
+def _quitar_de_estadistica(estadistica: Optional[models.EstadisticaGasto], gasto: models.Gasto):
+    if estadistica:
+        meses = _leer_ventana(estadistica)
+        if _restar(meses, periodo_de(gasto.fecha), gasto.monto):
+            _guardar_ventana(estadistica, meses)
+
+
+def quitar_gasto(db: Session, gasto: models.Gasto):
+    """Revierte el aporte de un gasto (antes de borrarlo o modificarlo)"""
+    categoria = clave_categoria(gasto.categoria, gasto.tipo)
+    estadistica = db.query(models.EstadisticaGasto).filter(
+        models.EstadisticaGasto.categoria == categoria,
+        models.EstadisticaGasto.moneda == gasto.moneda
+    ).first()
+    _quitar_de_estadistica(estadistica, gasto)
+
+    db.query(models.AnomaliaGasto).filter(
+        models.AnomaliaGasto.gasto_id == gasto.id
+    ).delete(synchronize_session=False)
+
+
+def registrar_gastos(db: Session, gastos) -> List[models.AnomaliaGasto]:
+    """registrar_gasto para un lote, leyendo las estadísticas una sola vez"""
+    estadisticas = _estadisticas_de(db, gastos)
+    registradas = []
+    for gasto in gastos:
+        clave = (clave_categoria(gasto.categoria, gasto.tipo), gasto.moneda)
+        if clave not in estadisticas:
+            estadisticas[clave] = _obtener_estadistica(db, *clave)
+        anomalia = registrar_gasto(db, gasto, estadisticas[clave])
+        if anomalia:
+            registradas.append(anomalia)
+    return registradas
+
+
+def quitar_gastos(db: Session, gastos):
+    """quitar_gasto para un lote (una consulta de estadísticas y un solo DELETE de anomalías)"""
+    estadisticas = _estadisticas_de(db, gastos)
+    for gasto in gastos:
+        _quitar_de_estadistica(estadisticas.get((clave_categoria(gasto.categoria, gasto.tipo), gasto.moneda)), gasto)
+    if gastos:
+        db.execute(delete(models.AnomaliaGasto).where(
+            models.AnomaliaGasto.gasto_id.in_([g.id for g in gastos])
+        ))
+
+
+def recalcular_estadisticas(db: Session, meses: int = VENTANA_MESES) -> int:
+    """Reconstruye la línea de base con los gastos del mes actual y los `meses` meses anteriores"""
+    periodo_actual = periodo_de(date.today())
+    desde = date.fromisoformat(_periodo_anterior(periodo_actual, meses) + "-01")
+
+    gastos = db.query(
+        models.Gasto.categoria, models.Gasto.tipo, models.Gasto.moneda,
+        models.Gasto.fecha, models.Gasto.monto
+    ).filter(models.Gasto.fecha >= desde).order_by(models.Gasto.fecha).all()
+
+    db.execute(delete(models.EstadisticaGasto))
+    db.flush()
+
+    ventanas: Dict[Tuple[str, models.TipoMoneda], List[Mes]] = {}
+    for gasto in gastos:
+        clave = (clave_categoria(gasto.categoria, gasto.tipo), gasto.moneda)
+        _sumar(ventanas.setdefault(clave, []), periodo_de(gasto.fecha), gasto.monto)
+
+    estadisticas = []
+    for clave, ventana in ventanas.items():
+        # Las categorías sin gastos en el mes actual cierran su último mes
+        if ventana[-1][0] < periodo_actual:
+            _abrir_periodo(ventana, periodo_actual)
+        estadistica = _nueva_estadistica(*clave)
+        _guardar_ventana(estadistica, ventana)
+        estadisticas.append(estadistica)
+
+    db.add_all(estadisticas)
+    db.commit()
+    return len(estadisticas)
+
+
+def asegurar_inicializado(db: Session):
+    """Reconstruye la línea de base si falta (tabla vacía con gastos cargados, o filas sin
+    ventana mensual de una versión anterior) al arrancar"""
+    sin_ventana = db.query(models.EstadisticaGasto.id).filter(models.EstadisticaGasto.ventana.is_(None)).first()
+    if sin_ventana is not None or (
+        db.query(models.EstadisticaGasto.id).first() is None and db.query(models.Gasto.id).first()
+    ):
+        recalcular_estadisticas(db)
+
+
+def _base_real(estadistica: models.EstadisticaGasto, factores: Dict[str, Optional[float]]) -> Tuple[int, float, float, bool]:
+    """Línea de base mensual con cada mes cerrado llevado a pesos del mes actual"""
+    n, media, m2 = 0, 0.0, 0.0
+    ajustada = False
+    for periodo, total, *_ in _leer_ventana(estadistica)[:-1]:
+        factor = factores.get(periodo)
+        ajustada = ajustada or factor is not None
+        n, media, m2 = _welford_agregar(n, media, m2, total * (factor if factor is not None else 1.0))
+    return n, media, m2, ajustada
+
+
+def analizar_anomalias(db: Session, dias_gastos: int = 30, real: bool = False) -> List[Dict]:
+    """Alertas por categorías con gasto mensual atípico y por gastos individuales atípicos.
+
+    Lee solo la tabla de estadísticas (una fila por categoría y moneda) y las
+    anomalías registradas recientemente; no recorre los gastos ni escribe (la
+    línea de base se arma al arrancar, con asegurar_inicializado).
+
+    real: compara el mes en pesos contra los meses de la ventana ajustados por IPC
+    """
+    alertas = []
+    hoy = date.today()
+    periodo_actual = periodo_de(hoy)
+
+    estadisticas = [
+        e for e in db.query(models.EstadisticaGasto).all()
+        if e.periodo == periodo_actual and (e.n_meses or 0) >= MINIMO_MESES
+    ]
+    factores: Dict[str, Optional[float]] = {}
+    if real:
+        periodos = {
+            mes[0] for e in estadisticas if e.moneda == models.TipoMoneda.PESOS
+            for mes in _leer_ventana(e)[:-1]
+        }
+        factores = inflacion.deflactores(db, periodo_actual, periodos) if periodos else {}
+
+    for estadistica in estadisticas:
+        n_meses, media_mes, m2_mes = estadistica.n_meses, estadistica.media_mes, estadistica.m2_mes
+        ajustada = False
+        if real and estadistica.moneda == models.TipoMoneda.PESOS:
+            n_meses, media_mes, m2_mes, ajustada = _base_real(estadistica, factores)
+        desvio = _desvio(n_meses, m2_mes)
+        if desvio <= 0:
+            continue
+        z = (estadistica.total_periodo - media_mes) / desvio
+        if z > Z_UMBRAL_MES:
+            incremento = ((estadistica.total_periodo - media_mes) / media_mes * 100) if media_mes > 0 else 0
+            sufijo = " en términos reales" if ajustada else ""
+            alertas.append({
+                "tipo": "anomalia_categoria",
+                "severidad": "alta" if z > 2 * Z_UMBRAL_MES else "media",
+                "titulo": f"Gasto inusual en {estadistica.categoria} ({estadistica.moneda.value})",
+                "mensaje": f"Los gastos del mes en {estadistica.categoria} suman {estadistica.total_periodo:.2f} {estadistica.moneda.value}, "
+                          f"{z:.1f} desvíos por encima del promedio mensual{sufijo} ({media_mes:.2f} {estadistica.moneda.value})",
+                "detalle": {
+                    "categoria": estadistica.categoria,
+                    "moneda": estadistica.moneda.value,
+                    "real": ajustada,
+                    "mes_actual": periodo_actual,
+                    "total_actual": estadistica.total_periodo,
+                    "media_mensual": media_mes,
+                    "desvio_mensual": desvio,
+                    "meses_base": n_meses,
+                    "z_score": round(z, 2),
+                    "incremento_porcentual": round(incremento, 2)
+                }
+            })
+
+    recientes = db.query(models.AnomaliaGasto).filter(
+        models.AnomaliaGasto.fecha >= hoy - timedelta(days=dias_gastos)
+    ).order_by(models.AnomaliaGasto.z_score.desc()).all()
+    for anomalia in recientes:
+        alertas.append({
+            "tipo": "anomalia_gasto",
+            "severidad": "media",
+            "titulo": f"Gasto atípico en {anomalia.categoria}",
+            "mensaje": f"El gasto de {anomalia.monto:.2f} {anomalia.moneda.value} del {anomalia.fecha.strftime('%d/%m/%Y')} "
+                      f"está {anomalia.z_score:.1f} desvíos por encima de lo habitual en {anomalia.categoria} "
+                      f"(promedio {anomalia.media:.2f} {anomalia.moneda.value})",
+            "detalle": {
+                "gasto_id": anomalia.gasto_id,
+                "categoria": anomalia.categoria,
+                "moneda": anomalia.moneda.value,
+                "fecha": anomalia.fecha.isoformat(),
+                "monto": anomalia.monto,
+                "media": anomalia.media,
+                "desvio": anomalia.desvio,
+                "z_score": round(anomalia.z_score, 2)
+            }
+        })
+
+    return alertas
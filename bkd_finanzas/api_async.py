@@ -0,0 +1,445 @@
+"""
+Endpoints asíncronos (FINANZAS_DB_ASYNC=1).
+
+Mismas rutas y respuestas que sus versiones de main.py, pero con AsyncSession:
+no ocupan el threadpool de FastAPI mientras esperan a la base. Cubre el CRUD
+de todas las entidades (con los lotes, el cronograma y los pagos de
+préstamos), la cotización vigente, los reportes JSON y las alertas; la lógica
+compartida (lotes, amortización, reportes, alertas) se reutiliza con run_sync.
+
+Siguen en el threadpool las descargas PDF/Excel, las cargas de archivos
+(liquidaciones, cotizaciones, IPC) y las rutas de administración y
+sincronización: generan archivos o hacen trabajo de CPU, no esperan a la base.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date
+from typing import List, Optional
+import asyncio
+
+from database import AsyncSessionLocal, AsyncSessionLectura, CAPACIDAD_ESCRITURA, CAPACIDAD_LECTURA
+import models
+import schemas
+import reports
+import alerts
+import anomalias
+import acumulados
+import amortizacion
+import cotizaciones
+import lotes
+import serializacion
+
+router = APIRouter()
+
+
+# Sin límite, los requests que esperan conexión agotan el pool_timeout en lugar de hacer cola
+_cupo_escritura = asyncio.Semaphore(CAPACIDAD_ESCRITURA)
+_cupo_lectura = asyncio.Semaphore(CAPACIDAD_LECTURA)
+
+
+async def get_db():
+    async with _cupo_escritura:
+        async with AsyncSessionLocal() as db:
+            yield db
+
+
+async def get_db_lectura():
+    async with _cupo_lectura:
+        async with AsyncSessionLectura() as db:
+            yield db
+
+
+def _registrar_gasto(db, gasto: models.Gasto):
+    anomalias.registrar_gasto(db, gasto)
+    acumulados.registrar(db, acumulados.ORIGEN_GASTO, gasto)
+
+
+def _quitar_gasto(db, gasto: models.Gasto):
+    anomalias.quitar_gasto(db, gasto)
+    acumulados.quitar(db, acumulados.ORIGEN_GASTO, gasto)
+
+
+async def _aplicar_lote(db: AsyncSession, modelo, schema, origen: str, lote, **kwargs):
+    try:
+        resultado = await db.run_sync(lotes.aplicar, modelo, schema, origen, lote, **kwargs)
+    except lotes.FilasInexistentes as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except lotes.LoteInvalido as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    await db.commit()
+    return serializacion.ORJSONResponse(resultado)
+
+
+async def _obtener(db: AsyncSession, modelo, fila_id: int, detalle: str):
+    fila = await db.get(modelo, fila_id)
+    if not fila:
+        raise HTTPException(status_code=404, detail=detalle)
+    return fila
+
+
+async def _crear(db: AsyncSession, modelo, datos):
+    fila = modelo(**datos.model_dump())
+    db.add(fila)
+    await db.commit()
+    await db.refresh(fila)
+    return fila
+
+
+async def _modificar(db: AsyncSession, fila, datos):
+    for field, value in datos.model_dump(exclude_unset=True).items():
+        setattr(fila, field, value)
+    await db.commit()
+    await db.refresh(fila)
+    return fila
+
+
+async def _eliminar(db: AsyncSession, fila, mensaje: str):
+    await db.delete(fila)
+    await db.commit()
+    return {"message": mensaje}
+
+
+# ========== INGRESOS ==========
+@router.get("/api/ingresos", response_model=List[schemas.Ingreso])
+async def get_ingresos(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db_lectura)):
+    return await serializacion.listar_async(db, models.Ingreso, schemas.Ingreso, lambda q: q.offset(skip).limit(limit))
+
+@router.get("/api/ingresos/{ingreso_id}", response_model=schemas.Ingreso)
+async def get_ingreso(ingreso_id: int, db: AsyncSession = Depends(get_db_lectura)):
+    ingreso = await db.get(models.Ingreso, ingreso_id)
+    if not ingreso:
+        raise HTTPException(status_code=404, detail="Ingreso no encontrado")
+    return ingreso
+
+@router.post("/api/ingresos", response_model=schemas.Ingreso)
+async def create_ingreso(ingreso: schemas.IngresoCreate, db: AsyncSession = Depends(get_db)):
+    db_ingreso = models.Ingreso(**ingreso.model_dump())
+    db.add(db_ingreso)
+    await db.run_sync(acumulados.registrar, acumulados.ORIGEN_INGRESO, db_ingreso)
+    await db.commit()
+    await db.refresh(db_ingreso)
+    return db_ingreso
+
+@router.put("/api/ingresos/{ingreso_id}", response_model=schemas.Ingreso)
+async def update_ingreso(ingreso_id: int, ingreso: schemas.IngresoUpdate, db: AsyncSession = Depends(get_db)):
+    db_ingreso = await db.get(models.Ingreso, ingreso_id)
+    if not db_ingreso:
+        raise HTTPException(status_code=404, detail="Ingreso no encontrado")
+
+    await db.run_sync(acumulados.quitar, acumulados.ORIGEN_INGRESO, db_ingreso)
+    update_data = ingreso.model_dump(exclude_unset=True)
+    for field, value in update_data.items():
+        setattr(db_ingreso, field, value)
+    await db.run_sync(acumulados.registrar, acumulados.ORIGEN_INGRESO, db_ingreso)
+
+    await db.commit()
+    await db.refresh(db_ingreso)
+    return db_ingreso
+
+@router.delete("/api/ingresos/{ingreso_id}")
+async def delete_ingreso(ingreso_id: int, db: AsyncSession = Depends(get_db)):
+    db_ingreso = await db.get(models.Ingreso, ingreso_id)
+    if not db_ingreso:
+        raise HTTPException(status_code=404, detail="Ingreso no encontrado")
+    await db.run_sync(acumulados.quitar, acumulados.ORIGEN_INGRESO, db_ingreso)
+    await db.delete(db_ingreso)
+    await db.commit()
+    return {"message": "Ingreso eliminado"}
+
+@router.post("/api/ingresos/bulk", response_model=schemas.IngresosLoteResultado)
+async def bulk_ingresos(lote: schemas.IngresosLote, db: AsyncSession = Depends(get_db)):
+    """Crea, modifica y elimina ingresos en una sola transacción"""
+    return await _aplicar_lote(db, models.Ingreso, schemas.Ingreso, acumulados.ORIGEN_INGRESO, lote)
+
+
+# ========== GASTOS ==========
+@router.get("/api/gastos", response_model=List[schemas.Gasto])
+async def get_gastos(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db_lectura)):
+    return await serializacion.listar_async(db, models.Gasto, schemas.Gasto, lambda q: q.offset(skip).limit(limit))
+
+@router.get("/api/gastos/{gasto_id}", response_model=schemas.Gasto)
+async def get_gasto(gasto_id: int, db: AsyncSession = Depends(get_db_lectura)):
+    gasto = await db.get(models.Gasto, gasto_id)
+    if not gasto:
+        raise HTTPException(status_code=404, detail="Gasto no encontrado")
+    return gasto
+
+@router.post("/api/gastos", response_model=schemas.Gasto)
+async def create_gasto(gasto: schemas.GastoCreate, db: AsyncSession = Depends(get_db)):
+    db_gasto = models.Gasto(**gasto.model_dump())
+    db.add(db_gasto)
+    await db.flush()
+    await db.run_sync(_registrar_gasto, db_gasto)
+    await db.commit()
+    await db.refresh(db_gasto)
+    return db_gasto
+
+@router.put("/api/gastos/{gasto_id}", response_model=schemas.Gasto)
+async def update_gasto(gasto_id: int, gasto: schemas.GastoUpdate, db: AsyncSession = Depends(get_db)):
+    db_gasto = await db.get(models.Gasto, gasto_id)
+    if not db_gasto:
+        raise HTTPException(status_code=404, detail="Gasto no encontrado")
+
+    await db.run_sync(_quitar_gasto, db_gasto)
+    update_data = gasto.model_dump(exclude_unset=True)
+    for field, value in update_data.items():
+        setattr(db_gasto, field, value)
+    await db.run_sync(_registrar_gasto, db_gasto)
+
+    await db.commit()
+    await db.refresh(db_gasto)
+    return db_gasto
+
+@router.delete("/api/gastos/{gasto_id}")
+async def delete_gasto(gasto_id: int, db: AsyncSession = Depends(get_db)):
+    db_gasto = await db.get(models.Gasto, gasto_id)
+    if not db_gasto:
+        raise HTTPException(status_code=404, detail="Gasto no encontrado")
+    await db.run_sync(_quitar_gasto, db_gasto)
+    await db.delete(db_gasto)
+    await db.commit()
+    return {"message": "Gasto eliminado"}
+
+@router.post("/api/gastos/bulk", response_model=schemas.GastosLoteResultado)
+async def bulk_gastos(lote: schemas.GastosLote, db: AsyncSession = Depends(get_db)):
+    """Crea, modifica y elimina gastos en una sola transacción"""
+    return await _aplicar_lote(
+        db, models.Gasto, schemas.Gasto, acumulados.ORIGEN_GASTO, lote,
+        al_quitar=anomalias.quitar_gastos, al_registrar=anomalias.registrar_gastos
+    )
+
+
+# ========== TARJETAS ==========
+@router.get("/api/tarjetas", response_model=List[schemas.TarjetaCredito])
+async def get_tarjetas(db: AsyncSession = Depends(get_db_lectura)):
+    return await serializacion.listar_async(db, models.TarjetaCredito, schemas.TarjetaCredito)
+
+@router.get("/api/tarjetas/{tarjeta_id}", response_model=schemas.TarjetaCredito)
+async def get_tarjeta(tarjeta_id: int, db: AsyncSession = Depends(get_db_lectura)):
+    return await _obtener(db, models.TarjetaCredito, tarjeta_id, "Tarjeta no encontrada")
+
+@router.post("/api/tarjetas", response_model=schemas.TarjetaCredito)
+async def create_tarjeta(tarjeta: schemas.TarjetaCreditoCreate, db: AsyncSession = Depends(get_db)):
+    return await _crear(db, models.TarjetaCredito, tarjeta)
+
+@router.put("/api/tarjetas/{tarjeta_id}", response_model=schemas.TarjetaCredito)
+async def update_tarjeta(tarjeta_id: int, tarjeta: schemas.TarjetaCreditoUpdate, db: AsyncSession = Depends(get_db)):
+    return await _modificar(db, await _obtener(db, models.TarjetaCredito, tarjeta_id, "Tarjeta no encontrada"), tarjeta)
+
+@router.delete("/api/tarjetas/{tarjeta_id}")
+async def delete_tarjeta(tarjeta_id: int, db: AsyncSession = Depends(get_db)):
+    return await _eliminar(db, await _obtener(db, models.TarjetaCredito, tarjeta_id, "Tarjeta no encontrada"), "Tarjeta eliminada")
+
+
+# ========== PRESTAMOS ==========
+def _cronograma(db, prestamo_id: int) -> List[models.DesgloseCuotaPrestamo]:
+    return db.query(models.DesgloseCuotaPrestamo).filter(
+        models.DesgloseCuotaPrestamo.prestamo_id == prestamo_id
+    ).order_by(models.DesgloseCuotaPrestamo.numero_cuota).all()
+
+
+@router.get("/api/prestamos", response_model=List[schemas.Prestamo])
+async def get_prestamos(db: AsyncSession = Depends(get_db_lectura)):
+    return await serializacion.listar_async(db, models.Prestamo, schemas.Prestamo)
+
+@router.get("/api/prestamos/{prestamo_id}", response_model=schemas.Prestamo)
+async def get_prestamo(prestamo_id: int, db: AsyncSession = Depends(get_db_lectura)):
+    return await _obtener(db, models.Prestamo, prestamo_id, "Préstamo no encontrado")
+
+@router.post("/api/prestamos", response_model=schemas.Prestamo)
+async def create_prestamo(prestamo: schemas.PrestamoCreate, db: AsyncSession = Depends(get_db)):
+    db_prestamo = models.Prestamo(**prestamo.model_dump())
+    db.add(db_prestamo)
+    await db.flush()
+    await db.run_sync(amortizacion.generar_cronograma, db_prestamo)
+    await db.commit()
+    await db.refresh(db_prestamo)
+    return db_prestamo
+
+@router.put("/api/prestamos/{prestamo_id}", response_model=schemas.Prestamo)
+async def update_prestamo(prestamo_id: int, prestamo: schemas.PrestamoUpdate, db: AsyncSession = Depends(get_db)):
+    db_prestamo = await _obtener(db, models.Prestamo, prestamo_id, "Préstamo no encontrado")
+    update_data = prestamo.model_dump(exclude_unset=True)
+    for field, value in update_data.items():
+        setattr(db_prestamo, field, value)
+
+    # Si cambian las condiciones o lo pagado, recalcular solo las cuotas impagas
+    if amortizacion.CAMPOS_CRONOGRAMA.intersection(update_data) or "monto_pagado" in update_data:
+        await db.run_sync(amortizacion.regenerar_pendientes, db_prestamo)
+
+    await db.commit()
+    await db.refresh(db_prestamo)
+    return db_prestamo
+
+@router.delete("/api/prestamos/{prestamo_id}")
+async def delete_prestamo(prestamo_id: int, db: AsyncSession = Depends(get_db)):
+    db_prestamo = await _obtener(db, models.Prestamo, prestamo_id, "Préstamo no encontrado")
+    await db.execute(delete(models.DesgloseCuotaPrestamo).where(
+        models.DesgloseCuotaPrestamo.prestamo_id == prestamo_id
+    ))
+    return await _eliminar(db, db_prestamo, "Préstamo eliminado")
+
+@router.get("/api/prestamos/{prestamo_id}/desglose-cuota")
+async def get_desglose_cuota_prestamo(prestamo_id: int, db: AsyncSession = Depends(get_db_lectura)):
+    """Devuelve el desglose de la próxima cuota impaga según el cronograma persistido"""
+    prestamo = await _obtener(db, models.Prestamo, prestamo_id, "Préstamo no encontrado")
+    if not prestamo.activo:
+        raise HTTPException(status_code=400, detail="El préstamo no está activo")
+    desglose = await db.run_sync(amortizacion.desglose_proxima_cuota, prestamo)
+    if desglose is None:
+        raise HTTPException(status_code=400, detail="El préstamo está completamente pagado")
+    return desglose
+
+@router.get("/api/prestamos/{prestamo_id}/cronograma", response_model=List[schemas.CuotaPrestamo])
+async def get_cronograma_prestamo(prestamo_id: int, db: AsyncSession = Depends(get_db_lectura)):
+    """Devuelve el cronograma completo de cuotas del préstamo"""
+    await _obtener(db, models.Prestamo, prestamo_id, "Préstamo no encontrado")
+    return await db.run_sync(_cronograma, prestamo_id)
+
+@router.post("/api/prestamos/{prestamo_id}/cronograma", response_model=List[schemas.CuotaPrestamo])
+async def regenerar_cronograma_prestamo(prestamo_id: int, db: AsyncSession = Depends(get_db)):
+    """Regenera el cronograma completo del préstamo"""
+    prestamo = await _obtener(db, models.Prestamo, prestamo_id, "Préstamo no encontrado")
+    await db.run_sync(amortizacion.generar_cronograma, prestamo)
+    await db.commit()
+    return await db.run_sync(_cronograma, prestamo_id)
+
+@router.post("/api/prestamos/{prestamo_id}/pagos", response_model=schemas.PagoPrestamo)
+async def create_pago_prestamo(prestamo_id: int, pago: schemas.PagoPrestamoCreate, db: AsyncSession = Depends(get_db)):
+    """Registra un pago del préstamo, marca las cuotas que cubre y recalcula las pendientes"""
+    prestamo = await _obtener(db, models.Prestamo, prestamo_id, "Préstamo no encontrado")
+    if pago.prestamo_id != prestamo_id:
+        raise HTTPException(status_code=400, detail="El pago no corresponde al préstamo")
+
+    db_pago = models.PagoPrestamo(**pago.model_dump())
+    db.add(db_pago)
+    await db.run_sync(acumulados.registrar, acumulados.ORIGEN_PAGO_PRESTAMO, db_pago)
+    prestamo.monto_pagado = (prestamo.monto_pagado or 0.0) + pago.monto
+    # Lo que sobra después de cubrir cuotas enteras se aplica como adelanto de capital
+    await db.run_sync(amortizacion.regenerar_pendientes, prestamo)
+
+    await db.commit()
+    await db.refresh(db_pago)
+    return db_pago
+
+@router.get("/api/prestamos/{prestamo_id}/pagos", response_model=List[schemas.PagoPrestamo])
+async def get_pagos_prestamo(prestamo_id: int, db: AsyncSession = Depends(get_db_lectura)):
+    return await serializacion.listar_async(db, models.PagoPrestamo, schemas.PagoPrestamo, lambda q: q.where(
+        models.PagoPrestamo.prestamo_id == prestamo_id
+    ).order_by(models.PagoPrestamo.fecha_pago))
+
+
+# ========== INVERSIONES ==========
+@router.get("/api/inversiones", response_model=List[schemas.Inversion])
+async def get_inversiones(db: AsyncSession = Depends(get_db_lectura)):
+    return await serializacion.listar_async(db, models.Inversion, schemas.Inversion)
+
+@router.get("/api/inversiones/{inversion_id}", response_model=schemas.Inversion)
+async def get_inversion(inversion_id: int, db: AsyncSession = Depends(get_db_lectura)):
+    return await _obtener(db, models.Inversion, inversion_id, "Inversión no encontrada")
+
+@router.post("/api/inversiones", response_model=schemas.Inversion)
+async def create_inversion(inversion: schemas.InversionCreate, db: AsyncSession = Depends(get_db)):
+    return await _crear(db, models.Inversion, inversion)
+
+@router.put("/api/inversiones/{inversion_id}", response_model=schemas.Inversion)
+async def update_inversion(inversion_id: int, inversion: schemas.InversionUpdate, db: AsyncSession = Depends(get_db)):
+    return await _modificar(db, await _obtener(db, models.Inversion, inversion_id, "Inversión no encontrada"), inversion)
+
+@router.delete("/api/inversiones/{inversion_id}")
+async def delete_inversion(inversion_id: int, db: AsyncSession = Depends(get_db)):
+    return await _eliminar(db, await _obtener(db, models.Inversion, inversion_id, "Inversión no encontrada"), "Inversión eliminada")
+
+
+# ========== PROYECCIONES ==========
+@router.get("/api/proyecciones", response_model=List[schemas.ProyeccionPago])
+async def get_proyecciones(db: AsyncSession = Depends(get_db_lectura)):
+    return await serializacion.listar_async(db, models.ProyeccionPago, schemas.ProyeccionPago)
+
+@router.post("/api/proyecciones", response_model=schemas.ProyeccionPago)
+async def create_proyeccion(proyeccion: schemas.ProyeccionPagoCreate, db: AsyncSession = Depends(get_db)):
+    return await _crear(db, models.ProyeccionPago, proyeccion)
+
+@router.delete("/api/proyecciones/{proyeccion_id}")
+async def delete_proyeccion(proyeccion_id: int, db: AsyncSession = Depends(get_db)):
+    return await _eliminar(db, await _obtener(db, models.ProyeccionPago, proyeccion_id, "Proyección no encontrada"), "Proyección eliminada")
+
+@router.get("/api/proyecciones/tarjetas")
+async def get_proyecciones_tarjetas(meses: int = Query(default=6, ge=1, le=24), db: AsyncSession = Depends(get_db_lectura)):
+    """Calcula las proyecciones de pagos de tarjetas para los próximos N meses"""
+    return await db.run_sync(reports.proyecciones_tarjetas, meses)
+
+
+# ========== REPORTES ==========
+@router.get("/api/reportes/egresos-mensuales")
+async def get_egresos_mensuales(ano: int = Query(...), mes: int = Query(...), db: AsyncSession = Depends(get_db_lectura)):
+    return await db.run_sync(reports.egresos_mensuales, ano, mes)
+
+@router.get("/api/reportes/saldos-positivos")
+async def get_saldos_positivos(ano: int = Query(...), mes: int = Query(...), db: AsyncSession = Depends(get_db_lectura)):
+    return await db.run_sync(reports.saldos_positivos, ano, mes)
+
+@router.get("/api/reportes/resumen-mensual")
+async def get_resumen_mensual(ano: int = Query(...), mes: int = Query(...), db: AsyncSession = Depends(get_db_lectura)):
+    return await db.run_sync(reports.resumen_mensual, ano, mes)
+
+@router.get("/api/reportes/consolidado")
+async def get_reporte_consolidado(
+    fecha_inicio: date = Query(...),
+    fecha_fin: date = Query(...),
+    serie: models.SerieCotizacion = Query(default=models.SerieCotizacion.MEP),
+    moneda: models.TipoMoneda = Query(default=models.TipoMoneda.PESOS),
+    db: AsyncSession = Depends(get_db_lectura)
+):
+    """Ingresos, gastos y saldo del período convertidos a una sola moneda"""
+    if fecha_inicio > fecha_fin:
+        raise HTTPException(status_code=400, detail="La fecha de inicio debe ser anterior a la fecha de fin")
+
+    gastos = await db.run_sync(cotizaciones.total_consolidado, models.Gasto, fecha_inicio, fecha_fin, serie, moneda)
+    ingresos = await db.run_sync(cotizaciones.total_consolidado, models.Ingreso, fecha_inicio, fecha_fin, serie, moneda)
+    return {
+        "fecha_inicio": fecha_inicio.isoformat(),
+        "fecha_fin": fecha_fin.isoformat(),
+        "moneda": moneda.value,
+        "serie": serie.value,
+        "gastos": gastos,
+        "ingresos": ingresos,
+        "saldo": ingresos["total"] - gastos["total"]
+    }
+
+
+# ========== COTIZACIONES ==========
+@router.get("/api/cotizaciones")
+async def get_cotizacion(
+    serie: models.SerieCotizacion = Query(default=models.SerieCotizacion.MEP),
+    fecha: Optional[date] = Query(default=None),
+    db: AsyncSession = Depends(get_db_lectura)
+):
+    """Cotización vigente a una fecha (por defecto hoy)"""
+    cotizacion = await db.run_sync(cotizaciones.obtener_cotizacion, fecha or date.today(), serie)
+    if not cotizacion:
+        raise HTTPException(status_code=404, detail="No hay cotizaciones cargadas para esa fecha")
+    return {
+        "serie": cotizacion.serie.value,
+        "fecha": cotizacion.fecha.isoformat(),
+        "compra": cotizacion.compra,
+        "venta": cotizacion.venta
+    }
+
+
+# ========== ALERTAS ==========
+@router.get("/api/alertas")
+async def get_alertas(real: bool = Query(default=False), db: AsyncSession = Depends(get_db_lectura)):
+    return await db.run_sync(alerts.obtener_alertas, real)
+
+@router.get("/api/alertas/tendencias")
+async def get_tendencias(
+    meses: int = Query(default=6, ge=1, le=600, description="Horizonte en meses"),
+    granularidad: str = Query(default="mes", pattern="^(semana|mes|trimestre)$"),
+    ventana: int = Query(default=3, ge=1, le=52, description="Períodos de la media móvil"),
+    real: bool = Query(default=False, description="Totales en términos reales (ajustados por IPC)"),
+    base: Optional[str] = Query(default=None, pattern=r"^\d{4}-\d{2}$", description="Mes base YYYY-MM"),
+    db: AsyncSession = Depends(get_db_lectura)
+):
+    return await db.run_sync(alerts.analizar_tendencias, real, base, meses, granularidad, ventana)
@@ -0,0 +1,256 @@
+"""
+Bandeja de entrada de liquidaciones: vigila un directorio e importa los PDFs que aparecen.
+
+Los archivos nuevos se detectan con inotify (Linux, vía ctypes) o, donde no
+está disponible, revisando el directorio cada INTERVALO_S. Un PDF se toma
+recién cuando su tamaño y fecha de modificación no cambian durante ESPERA_S
+(las descargas a medio escribir se esperan). Antes de parsearlo se calcula
+su hash: si ya se importó, o hay otro igual en curso, pasa directo a
+procesados/. El resto se parsea en un pool de PROCESOS procesos (con a lo
+sumo dos archivos por proceso en vuelo) y se importa con
+importacion.importar, una transacción por archivo, desde un único hilo
+escritor. Después el archivo se mueve a procesados/ o a fallidos/ (junto a
+un .error.txt con el motivo).
+"""
+from concurrent.futures import Future, ProcessPoolExecutor
+from sqlalchemy import select
+from typing import Dict, Optional, Set, Tuple
+import ctypes
+import ctypes.util
+import os
+import select as select_
+import struct
+import threading
+import time
+import importacion
+import models
+from database import SessionLectura, SessionLocal
+
+ESPERA_S = float(os.environ.get("FINANZAS_BANDEJA_ESPERA_S", "2.0"))
+INTERVALO_S = float(os.environ.get("FINANZAS_BANDEJA_INTERVALO_S", "1.0"))
+PROCESOS = int(os.environ.get("FINANZAS_BANDEJA_PROCESOS", "2"))
+PROCESADOS = "procesados"
+FALLIDOS = "fallidos"
+
+# Constantes de <sys/inotify.h>
+_IN_MODIFY = 0x002
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_EVENTO = struct.Struct("iIII")
+
+
+class _Inotify:
+    """Nombres de archivos creados, modificados o movidos al directorio (solo Linux)"""
+
+    def __init__(self, directorio: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        mascara = _IN_CREATE | _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO
+        if libc.inotify_add_watch(self._fd, os.fsencode(directorio), mascara) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, "inotify_add_watch")
+
+    def esperar(self, timeout: float) -> Set[str]:
+        listos, _, _ = select_.select([self._fd], [], [], timeout)
+        if not listos:
+            return set()
+        try:
+            datos = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        nombres = set()
+        posicion = 0
+        while posicion < len(datos):
+            _, _, _, largo = _EVENTO.unpack_from(datos, posicion)
+            posicion += _EVENTO.size
+            nombre = datos[posicion:posicion + largo].rstrip(b"\0")
+            posicion += largo
+            if nombre:
+                nombres.add(os.fsdecode(nombre))
+        return nombres
+
+    def cerrar(self):
+        os.close(self._fd)
+
+
+class _Sondeo:
+    """Alternativa a inotify: devuelve todo lo que hay en el directorio cada `timeout`"""
+
+    def __init__(self, directorio: str):
+        self._directorio = directorio
+
+    def esperar(self, timeout: float) -> Set[str]:
+        time.sleep(timeout)
+        return {entrada.name for entrada in os.scandir(self._directorio) if entrada.is_file()}
+
+    def cerrar(self):
+        pass
+
+
+def crear_detector(directorio: str, sondeo: bool = False):
+    """inotify si se puede; si no (otro sistema operativo, límite de watches), sondeo"""
+    if not sondeo:
+        try:
+            return _Inotify(directorio)
+        except (OSError, AttributeError, TypeError):
+            pass
+    return _Sondeo(directorio)
+
+
+def _mover(ruta: str, subdirectorio: str, error: Optional[str] = None) -> str:
+    """Mueve el archivo a `subdirectorio` sin pisar otro con el mismo nombre"""
+    destino_dir = os.path.join(os.path.dirname(ruta), subdirectorio)
+    os.makedirs(destino_dir, exist_ok=True)
+    base, extension = os.path.splitext(os.path.basename(ruta))
+    destino = os.path.join(destino_dir, base + extension)
+    numero = 1
+    while os.path.exists(destino):
+        destino = os.path.join(destino_dir, f"{base}-{numero}{extension}")
+        numero += 1
+    os.replace(ruta, destino)
+    if error:
+        with open(destino + ".error.txt", "w", encoding="utf-8") as archivo:
+            archivo.write(error + "\n")
+    return destino
+
+
+class Bandeja:
+    def __init__(
+        self,
+        directorio: str,
+        procesos: int = PROCESOS,
+        espera: float = ESPERA_S,
+        tarjeta_id: Optional[int] = None,
+        sondeo: bool = False,
+    ):
+        self.directorio = os.path.abspath(directorio)
+        self.procesos = max(1, procesos)
+        self.espera = espera
+        self.tarjeta_id = tarjeta_id
+        self.sondeo = sondeo
+        # nombre -> (tamaño, mtime, desde cuándo no cambia)
+        self._pendientes: Dict[str, Optional[Tuple[int, float, float]]] = {}
+        # futuro del parseo -> (ruta, hash)
+        self._en_curso: Dict[Future, Tuple[str, str]] = {}
+        self._hashes_en_curso: Set[str] = set()
+        self._detener = threading.Event()
+        self.contadores = {"importados": 0, "repetidos": 0, "fallidos": 0}
+
+    def detener(self):
+        self._detener.set()
+
+    def _es_pdf(self, nombre: str) -> bool:
+        return nombre.lower().endswith(".pdf") and os.path.isfile(os.path.join(self.directorio, nombre))
+
+    def _estables(self) -> list:
+        """Pendientes cuyo tamaño y mtime no cambiaron durante `espera`.
+
+        Los que siguen vacíos pasado ese tiempo (descargas fallidas) van a fallidos/.
+        """
+        ahora = time.monotonic()
+        listos = []
+        for nombre, anterior in list(self._pendientes.items()):
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                estado = os.stat(ruta)
+            except FileNotFoundError:
+                del self._pendientes[nombre]
+                continue
+            actual = (estado.st_size, estado.st_mtime)
+            if anterior is None or anterior[:2] != actual:
+                self._pendientes[nombre] = (*actual, ahora)
+            elif ahora - anterior[2] < self.espera:
+                continue
+            elif estado.st_size > 0:
+                listos.append(nombre)
+            else:
+                del self._pendientes[nombre]
+                self.contadores["fallidos"] += 1
+                print(f"{nombre}: ERROR archivo vacío; se mueve a {FALLIDOS}/", flush=True)
+                _mover(ruta, FALLIDOS, "El archivo está vacío (¿descarga incompleta?)")
+        return listos
+
+    def _ya_importado(self, huella: str) -> bool:
+        with SessionLectura() as db:
+            return db.scalar(
+                select(models.LiquidacionImportada.id).where(models.LiquidacionImportada.hash == huella)
+            ) is not None
+
+    def _tomar(self, pool: ProcessPoolExecutor, nombre: str):
+        """Hashea el PDF y, si no se vio antes, lo manda a parsear"""
+        ruta = os.path.join(self.directorio, nombre)
+        del self._pendientes[nombre]
+        try:
+            with open(ruta, "rb") as archivo:
+                huella = importacion.huella(archivo.read())
+        except OSError:
+            return
+        if huella in self._hashes_en_curso or self._ya_importado(huella):
+            self.contadores["repetidos"] += 1
+            print(f"{nombre}: ya importado, se mueve a {PROCESADOS}/", flush=True)
+            _mover(ruta, PROCESADOS)
+            return
+        self._hashes_en_curso.add(huella)
+        self._en_curso[pool.submit(importacion.parsear, ruta)] = (ruta, huella)
+
+    def _importar(self, futuro: Future):
+        ruta, huella = self._en_curso.pop(futuro)
+        self._hashes_en_curso.discard(huella)
+        nombre = os.path.basename(ruta)
+        try:
+            liquidacion = futuro.result()
+            if liquidacion["error"]:
+                raise ValueError(liquidacion["error"])
+            with SessionLocal() as db:
+                importacion.importar(db, [liquidacion], self.tarjeta_id)
+                if liquidacion["estado"] == "sin_tarjeta":
+                    raise ValueError("No se pudo identificar el banco de la liquidación")
+                if liquidacion["estado"] == "importada":
+                    tarjeta = liquidacion["tarjeta"]
+                    destino = f"{tarjeta.nombre} (ID {tarjeta.id})"
+                db.commit()
+        except Exception as e:
+            self.contadores["fallidos"] += 1
+            print(f"{nombre}: ERROR {e}; se mueve a {FALLIDOS}/", flush=True)
+            _mover(ruta, FALLIDOS, str(e))
+            return
+        if liquidacion["estado"] == "duplicada":
+            self.contadores["repetidos"] += 1
+            print(f"{nombre}: ya importado, se mueve a {PROCESADOS}/", flush=True)
+        else:
+            self.contadores["importados"] += 1
+            print(f"{nombre}: {len(liquidacion['datos'].get('movimientos', []))} gastos -> {destino}", flush=True)
+        _mover(ruta, PROCESADOS)
+
+    def correr(self, una_vez: bool = False):
+        """Vigila el directorio hasta detener() (o, con `una_vez`, hasta vaciarlo)"""
+        os.makedirs(self.directorio, exist_ok=True)
+        detector = crear_detector(self.directorio, self.sondeo)
+        print(f"Vigilando {self.directorio} ({'inotify' if isinstance(detector, _Inotify) else 'sondeo'}, "
+              f"{self.procesos} proceso(s))", flush=True)
+        # Lo que ya estaba antes de arrancar
+        self._pendientes.update({e.name: None for e in os.scandir(self.directorio) if e.is_file()})
+        try:
+            with ProcessPoolExecutor(max_workers=self.procesos) as pool:
+                while not self._detener.is_set():
+                    en_curso = {os.path.basename(ruta) for ruta, _ in self._en_curso.values()}
+                    for nombre in detector.esperar(INTERVALO_S) - en_curso:
+                        self._pendientes.setdefault(nombre, None)
+                    for nombre in [n for n in self._pendientes if not self._es_pdf(n)]:
+                        del self._pendientes[nombre]
+                    for nombre in self._estables():
+                        if len(self._en_curso) >= self.procesos * 2:
+                            break
+                        self._tomar(pool, nombre)
+                    for futuro in [f for f in self._en_curso if f.done()]:
+                        self._importar(futuro)
+                    if una_vez and not self._pendientes and not self._en_curso:
+                        break
+        finally:
+            detector.cerrar()
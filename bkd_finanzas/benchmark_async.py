@@ -0,0 +1,180 @@
+"""
+Compara el throughput del backend en modo sincrónico, asíncrono y con
+escritura agrupada (group commit).
+
+Levanta uvicorn una vez por modo sobre una base SQLite temporal con datos de
+prueba y, para cada cantidad de clientes concurrentes, mide requests por
+segundo y latencias de una mezcla de lecturas y altas (o solo altas).
+
+Uso:
+    python benchmark_async.py
+    python benchmark_async.py --clientes 50 200 1000 --duracion 15 --json resultado.json
+    python benchmark_async.py --modos sync agrupada --escrituras
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import httpx
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+
+# (peso, método, ruta) de la mezcla de tráfico
+MEZCLA = [
+    (40, "GET", "/api/gastos?limit=100"),
+    (20, "GET", "/api/reportes/resumen-mensual?ano={ano}&mes={mes}"),
+    (15, "GET", "/api/alertas/tendencias?meses=12"),
+    (10, "GET", "/api/ingresos"),
+    (15, "POST", "/api/gastos"),
+]
+# Solo altas concurrentes (para medir el group commit)
+MEZCLA_ESCRITURAS = [(1, "POST", "/api/gastos")]
+
+# Variables de entorno de cada modo
+MODOS = {
+    "sync": {},
+    "async": {"FINANZAS_DB_ASYNC": "1"},
+    "agrupada": {"FINANZAS_ESCRITURA_AGRUPADA": "1"},
+}
+
+
+def _gasto_aleatorio(rng: random.Random) -> dict:
+    return {
+        "fecha": (date.today() - timedelta(days=rng.randint(0, 365))).isoformat(),
+        "monto": round(rng.uniform(100, 50000), 2),
+        "moneda": "ARS",
+        "tipo": rng.choice(["Fijo", "Ordinario", "Extraordinario"]),
+        "categoria": rng.choice(["Supermercado", "Servicios", "Transporte", "Salud"]),
+        "descripcion": "benchmark",
+    }
+
+
+def _percentil(valores, p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+async def _esperar_servidor(url: str, timeout: float = 30.0):
+    limite = time.monotonic() + timeout
+    async with httpx.AsyncClient() as cliente:
+        while time.monotonic() < limite:
+            try:
+                await cliente.get(f"{url}/api/ingresos?limit=1")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"El servidor no respondió en {url}")
+
+
+async def _sembrar(url: str, gastos: int):
+    rng = random.Random(1)
+    async with httpx.AsyncClient(base_url=url, timeout=30) as cliente:
+        for _ in range(gastos):
+            await cliente.post("/api/gastos", json=_gasto_aleatorio(rng))
+
+
+async def _medir(url: str, clientes: int, duracion: float, mezcla=MEZCLA) -> dict:
+    hoy = date.today()
+    pesos = [peso for peso, _, _ in mezcla]
+    latencias = []
+    errores = 0
+    fin = time.monotonic() + duracion
+
+    limites = httpx.Limits(max_connections=clientes, max_keepalive_connections=clientes)
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limites) as cliente:
+        async def trabajador(semilla: int):
+            nonlocal errores
+            rng = random.Random(semilla)
+            while time.monotonic() < fin:
+                _, metodo, ruta = rng.choices(mezcla, weights=pesos)[0]
+                ruta = ruta.format(ano=hoy.year, mes=hoy.month)
+                inicio = time.perf_counter()
+                try:
+                    if metodo == "POST":
+                        respuesta = await cliente.post(ruta, json=_gasto_aleatorio(rng))
+                    else:
+                        respuesta = await cliente.get(ruta)
+                    if respuesta.status_code >= 400:
+                        errores += 1
+                except httpx.HTTPError:
+                    errores += 1
+                latencias.append(time.perf_counter() - inicio)
+
+        inicio = time.monotonic()
+        await asyncio.gather(*(trabajador(i) for i in range(clientes)))
+        transcurrido = time.monotonic() - inicio
+
+    return {
+        "clientes": clientes,
+        "requests": len(latencias),
+        "errores": errores,
+        "rps": len(latencias) / transcurrido,
+        "p50_ms": _percentil(latencias, 0.50) * 1000,
+        "p95_ms": _percentil(latencias, 0.95) * 1000,
+        "p99_ms": _percentil(latencias, 0.99) * 1000,
+    }
+
+
+def correr_modo(modo: str, clientes, duracion: float, gastos: int, puerto: int, mezcla=MEZCLA) -> list:
+    with tempfile.TemporaryDirectory() as directorio:
+        entorno = dict(
+            os.environ,
+            FINANZAS_DATABASE_URL=f"sqlite:///{os.path.join(directorio, 'bench.db')}",
+            FINANZAS_DB_ASYNC="0",
+            FINANZAS_ESCRITURA_AGRUPADA="0",
+        )
+        entorno.update(MODOS[modo])
+        servidor = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(puerto), "--log-level", "warning"],
+            cwd=DIRECTORIO, env=entorno
+        )
+        url = f"http://127.0.0.1:{puerto}"
+        try:
+            asyncio.run(_esperar_servidor(url))
+            asyncio.run(_sembrar(url, gastos))
+            resultados = []
+            for n in clientes:
+                resultado = asyncio.run(_medir(url, n, duracion, mezcla))
+                resultado["modo"] = modo
+                resultados.append(resultado)
+                print(f"{resultado['modo']:>8} {n:>5} clientes: {resultado['rps']:8.1f} req/s  "
+                      f"p50 {resultado['p50_ms']:7.1f} ms  p95 {resultado['p95_ms']:7.1f} ms  "
+                      f"p99 {resultado['p99_ms']:7.1f} ms  errores {resultado['errores']}")
+            return resultados
+        finally:
+            servidor.terminate()
+            servidor.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sync vs async (vs escritura agrupada) del backend")
+    parser.add_argument("--modos", nargs="+", choices=list(MODOS), default=["sync", "async"])
+    parser.add_argument("--escrituras", action="store_true", help="Medir solo altas de gastos")
+    parser.add_argument("--clientes", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--duracion", type=float, default=10.0, help="Segundos por nivel de concurrencia")
+    parser.add_argument("--gastos", type=int, default=500, help="Gastos de prueba a cargar")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--json", help="Archivo donde guardar los resultados")
+    args = parser.parse_args()
+
+    resultados = []
+    mezcla = MEZCLA_ESCRITURAS if args.escrituras else MEZCLA
+    for modo in args.modos:
+        resultados.extend(correr_modo(modo, args.clientes, args.duracion, args.gastos, args.puerto, mezcla))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as archivo:
+            json.dump(resultados, archivo, indent=2)
+
+
+if __name__ == "__main__":
+    main()
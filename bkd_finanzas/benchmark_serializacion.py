@@ -0,0 +1,83 @@
+"""
+Micro-benchmark de serialización de listados (filas por segundo).
+
+Compara el camino clásico (objetos ORM validados con pydantic y codificados
+con json) con el rápido de serializacion.py (tuplas + orjson) sobre una base
+SQLite en memoria.
+
+Uso:
+    python benchmark_serializacion.py --filas 10000 --repeticiones 20
+"""
+import argparse
+import json
+import random
+import time
+from datetime import date, timedelta
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, crear_engine
+import models
+import schemas
+import serializacion
+
+
+def _sembrar(db, filas: int):
+    rng = random.Random(1)
+    hoy = date.today()
+    db.execute(insert(models.Gasto), [{
+        "fecha": hoy - timedelta(days=rng.randint(0, 730)),
+        "monto": round(rng.uniform(100, 50000), 2),
+        "moneda": rng.choice(list(models.TipoMoneda)),
+        "tipo": rng.choice(list(models.TipoGasto)),
+        "categoria": rng.choice(["Supermercado", "Servicios", "Transporte", None]),
+        "descripcion": f"Gasto {i}",
+        "created_at": hoy,
+    } for i in range(filas)])
+    db.commit()
+
+
+def _clasico(db, filas: int) -> bytes:
+    """Lo que hace FastAPI con response_model=List[schemas.Gasto] y objetos ORM"""
+    gastos = db.scalars(select(models.Gasto).limit(filas)).all()
+    adaptador = TypeAdapter(List[schemas.Gasto])
+    contenido = adaptador.dump_python(adaptador.validate_python(gastos, from_attributes=True), mode="json")
+    return json.dumps(contenido, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _rapido(db, filas: int) -> bytes:
+    return serializacion.listar(db, models.Gasto, schemas.Gasto, lambda q: q.limit(filas)).body
+
+
+def medir(funcion, db, filas: int, repeticiones: int) -> float:
+    funcion(db, filas)  # calentamiento
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        db.expunge_all()
+        funcion(db, filas)
+    return filas * repeticiones / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de serialización de listados")
+    parser.add_argument("--filas", type=int, default=10000)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = crear_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine, autoflush=False)()
+    _sembrar(db, args.filas)
+
+    clasico = medir(_clasico, db, args.filas, args.repeticiones)
+    rapido = medir(_rapido, db, args.filas, args.repeticiones)
+    print(f"{args.filas} filas por respuesta")
+    print(f"  ORM + pydantic + json: {clasico:12,.0f} filas/s")
+    print(f"  tuplas + orjson:       {rapido:12,.0f} filas/s  ({rapido / clasico:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
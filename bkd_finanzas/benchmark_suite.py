@@ -0,0 +1,372 @@
+"""
+Suite de benchmarks de la API y de las funciones de reportes, alertas y PDF.
+
+Genera una base sintética (datos_sinteticos.py) en un directorio temporal y
+mide, en el mismo proceso, cada ruta GET de main.py, un ciclo de altas,
+modificaciones y bajas, la carga de PDFs y las funciones de reports, alerts,
+anomalias y pdf_processor llamadas directamente. También mide, en procesos
+nuevos, lo que tarda importar main.py y los módulos pesados (python -X
+importtime) y el arranque de la app (main.inicializar). Por caso registra los
+percentiles de latencia, las consultas SQL y el pico de memoria (una pasada
+aparte con tracemalloc). El cache de resultados se vacía antes de cada
+repetición, así que se mide siempre el cálculo completo.
+
+Con --guardar los resultados quedan como línea de base; con --comparar la
+corrida falla (código de salida 1) si algún caso empeora más que la tolerancia:
+latencia o memoria por encima de (1 + tolerancia) veces la base, o cualquier
+consulta SQL de más (la cantidad de consultas no depende de la máquina).
+
+Uso:
+    python benchmark_suite.py --filas 10000 --guardar baseline.json
+    python benchmark_suite.py --filas 10000 --comparar baseline.json --tolerancia 0.25
+    python benchmark_suite.py --solo reportes alertas
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional
+
+# Ruido que se tolera aunque supere el porcentaje (casos de fracciones de milisegundo)
+MARGEN_MS = 1.0
+MARGEN_KB = 64
+
+# Parámetros de las rutas GET que los requieren ({hoy}, {desde} se completan al correr)
+PARAMETROS = {
+    "/api/reportes/egresos-mensuales": "ano={ano}&mes={mes}",
+    "/api/reportes/saldos-positivos": "ano={ano}&mes={mes}",
+    "/api/reportes/resumen-mensual": "ano={ano}&mes={mes}",
+    "/api/reportes/gastos/pdf": "fecha_inicio={desde}&fecha_fin={hoy}",
+    "/api/reportes/gastos/excel": "fecha_inicio={desde}&fecha_fin={hoy}",
+    "/api/reportes/consolidado": "fecha_inicio={desde}&fecha_fin={hoy}",
+    "/api/alertas/tendencias": "meses=12",
+}
+# Rutas GET que no se miden (stream que no termina)
+EXCLUIDAS = {"/api/eventos"}
+# Módulos cuyo tiempo de importación se mide en un proceso nuevo (python -X importtime)
+IMPORTACIONES = ["main", "pdf_processor", "report_generator", "datos_sinteticos"]
+# Arranque de la app en un proceso nuevo: consultas y milisegundos de main.inicializar()
+_CODIGO_ARRANQUE = """
+import time, main, metricas
+medicion, _ = metricas.iniciar()
+inicio = time.perf_counter()
+main.inicializar()
+print((time.perf_counter() - inicio) * 1000, medicion.consultas)
+"""
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+
+
+def _percentil(valores: List[float], p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+class Suite:
+    def __init__(self, repeticiones: int):
+        import cache_resultados
+        import metricas
+        self._cache = cache_resultados.cache
+        self._metricas = metricas
+        self.repeticiones = repeticiones
+        self.resultados: Dict[str, Dict] = {}
+
+    def medir(self, nombre: str, funcion: Callable[[], Optional[int]]):
+        """`funcion` devuelve las consultas que hizo (o None para contarlas con metricas)"""
+        def ejecutar() -> int:
+            self._cache.limpiar()
+            medicion, token = self._metricas.iniciar(nombre)
+            try:
+                consultas = funcion()
+            finally:
+                self._metricas.cerrar(token)
+            return medicion.consultas if consultas is None else consultas
+
+        ejecutar()  # calentamiento
+        tiempos = []
+        consultas = 0
+        for _ in range(self.repeticiones):
+            inicio = time.perf_counter()
+            consultas = ejecutar()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+
+        tracemalloc.start()
+        try:
+            ejecutar()
+            pico = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.registrar(nombre, tiempos, consultas, pico / 1024)
+
+    def registrar(self, nombre: str, tiempos: List[float], consultas: int, memoria_kb: float):
+        self.resultados[nombre] = {
+            "p50_ms": round(_percentil(tiempos, 0.50), 3),
+            "p95_ms": round(_percentil(tiempos, 0.95), 3),
+            "p99_ms": round(_percentil(tiempos, 0.99), 3),
+            "consultas": consultas,
+            "memoria_pico_kb": round(memoria_kb, 1),
+        }
+        r = self.resultados[nombre]
+        print(f"  {nombre:<58} p50 {r['p50_ms']:9.2f} ms  p95 {r['p95_ms']:9.2f} ms  "
+              f"{r['consultas']:>5} consultas  {r['memoria_pico_kb']:>9.1f} KB")
+
+
+def _casos_http(suite: Suite, cliente, hoy: date, pdf: bytes, incluir: Callable[[str], bool]) -> List[str]:
+    """Mide las rutas de la API y devuelve las que quedaron sin medir"""
+    from fastapi.routing import APIRoute
+    import main
+
+    valores = {"ano": hoy.year, "mes": hoy.month, "hoy": hoy.isoformat(),
+               "desde": (hoy - timedelta(days=90)).isoformat()}
+
+    def pedir(metodo: str, url: str, **kwargs) -> int:
+        respuesta = cliente.request(metodo, url, **kwargs)
+        if respuesta.status_code >= 400:
+            raise RuntimeError(f"{metodo} {url}: {respuesta.status_code} {respuesta.text[:200]}")
+        return int(respuesta.headers.get("x-query-count", 0))
+
+    medidas = set()
+    rutas = [r for r in main.app.routes if isinstance(r, APIRoute)]
+    for ruta in rutas:
+        if "GET" not in ruta.methods or ruta.path in EXCLUIDAS:
+            continue
+        url = ruta.path
+        for parametro in ruta.param_convertors:
+            url = url.replace("{" + parametro + "}", "1")
+        if ruta.path in PARAMETROS:
+            url += "?" + PARAMETROS[ruta.path].format(**valores)
+        nombre = f"GET {ruta.path}"
+        medidas.add(("GET", ruta.path))
+        if incluir(nombre):
+            suite.medir(nombre, lambda url=url: pedir("GET", url))
+
+    # Altas, modificaciones y bajas: las altas medidas dejan una fila por pasada
+    # (calentamiento, repeticiones y memoria), que después se modifican y borran
+    fecha = hoy.isoformat()
+    recursos = {
+        "gastos": ("gasto_id", {"fecha": fecha, "monto": 1234.5, "moneda": "ARS", "tipo": "Ordinario",
+                    "categoria": "Supermercado", "descripcion": "benchmark"}, {"monto": 99.0}),
+        "ingresos": ("ingreso_id", {"fecha": fecha, "monto": 1000.0, "moneda": "ARS", "tipo": "Salario ACN"}, {"monto": 1500.0}),
+        "inversiones": ("inversion_id", {"nombre": "benchmark", "monto_inicial": 1000.0, "moneda": "USD", "fecha_inicio": fecha},
+                        {"monto_actual": 1100.0}),
+        "prestamos": ("prestamo_id", {"nombre": "benchmark", "monto_total": 1000000.0, "moneda": "ARS", "tasa_interes": 60.0,
+                       "fecha_inicio": fecha, "cantidad_cuotas": 24}, {"tasa_interes": 70.0}),
+        "proyecciones": ("proyeccion_id", {"tipo": "gasto_fijo", "fecha_vencimiento": fecha, "monto_estimado": 5000.0,
+                          "moneda": "ARS"}, None),
+    }
+    escrituras = []
+    for recurso, (parametro, cuerpo, cambios) in recursos.items():
+        ids: List[int] = []
+
+        def crear(recurso=recurso, cuerpo=cuerpo, ids=ids) -> int:
+            respuesta = cliente.post(f"/api/{recurso}", json=cuerpo)
+            if respuesta.status_code >= 400:
+                raise RuntimeError(f"POST /api/{recurso}: {respuesta.status_code} {respuesta.text[:200]}")
+            ids.append(respuesta.json()["id"])
+            return int(respuesta.headers["x-query-count"])
+
+        escrituras.append((f"POST /api/{recurso}", crear))
+        if cambios is not None:
+            escrituras.append((f"PUT /api/{recurso}/{{{parametro}}}", lambda recurso=recurso, cambios=cambios, ids=ids:
+                               pedir("PUT", f"/api/{recurso}/{ids[-1]}", json=cambios)))
+        escrituras.append((f"DELETE /api/{recurso}/{{{parametro}}}", lambda recurso=recurso, ids=ids:
+                           pedir("DELETE", f"/api/{recurso}/{ids.pop()}")))
+
+    gasto = recursos["gastos"][1]
+    archivo = {"file": ("resumen.pdf", pdf, "application/pdf")}
+    escrituras += [
+        ("POST /api/gastos/bulk", lambda: pedir("POST", "/api/gastos/bulk", json={"crear": [gasto] * 100})),
+        ("POST /api/ingresos/bulk", lambda: pedir("POST", "/api/ingresos/bulk", json={"crear": [recursos["ingresos"][1]] * 100})),
+        ("POST /api/prestamos/{prestamo_id}/cronograma", lambda: pedir("POST", "/api/prestamos/1/cronograma")),
+        ("POST /api/anomalias/recalcular", lambda: pedir("POST", "/api/anomalias/recalcular")),
+        ("POST /api/acumulados/reconstruir", lambda: pedir("POST", "/api/acumulados/reconstruir")),
+        ("POST /api/pdf/previsualizar", lambda: pedir("POST", "/api/pdf/previsualizar", files=archivo)),
+        ("POST /api/pdf/procesar-liquidacion", lambda: pedir("POST", "/api/pdf/procesar-liquidacion?tarjeta_id=1", files=archivo)),
+    ]
+    for nombre, funcion in escrituras:
+        metodo, ruta = nombre.split(" ", 1)
+        medidas.add((metodo, ruta))
+        # Las bajas y modificaciones usan las filas de las altas: esas se corren siempre
+        if incluir(nombre) or nombre.startswith("POST /api/") and any(
+            incluir(f"{m} {ruta}/") for m in ("PUT", "DELETE")
+        ):
+            suite.medir(nombre, funcion)
+
+    return sorted(
+        f"{metodo} {r.path}" for r in rutas for metodo in r.methods
+        if (metodo, r.path) not in medidas and r.path not in EXCLUIDAS
+    )
+
+
+def _casos_funciones(suite: Suite, hoy: date, pdf: bytes, pdf_largo: bytes, incluir: Callable[[str], bool]):
+    from database import SessionLectura
+    import reports
+    import alerts
+    import anomalias
+    import pdf_processor
+
+    with SessionLectura() as db:
+        casos = [
+            ("reportes.egresos_mensuales", lambda: reports.egresos_mensuales(db, hoy.year, hoy.month)),
+            ("reportes.saldos_positivos", lambda: reports.saldos_positivos(db, hoy.year, hoy.month)),
+            ("reportes.resumen_mensual", lambda: reports.resumen_mensual(db, hoy.year, hoy.month)),
+            ("alertas.obtener_alertas", lambda: alerts.obtener_alertas(db)),
+            ("alertas.obtener_alertas(real)", lambda: alerts.obtener_alertas(db, real=True)),
+            ("alertas.analizar_tendencias(12 meses)", lambda: alerts.analizar_tendencias(db, meses=12)),
+            ("alertas.analizar_tendencias(120 semanas)", lambda: alerts.analizar_tendencias(db, meses=24, granularidad="semana")),
+            ("anomalias.analizar_anomalias", lambda: anomalias.analizar_anomalias(db)),
+            ("pdf_processor.procesar_pdf_liquidacion", lambda: pdf_processor.procesar_pdf_liquidacion(io.BytesIO(pdf))),
+            ("pdf_processor.procesar_pdf_liquidacion(40 hojas legales)",
+             lambda: pdf_processor.procesar_pdf_liquidacion(io.BytesIO(pdf_largo))),
+        ]
+        for nombre, funcion in casos:
+            if incluir(nombre):
+                suite.medir(nombre, lambda funcion=funcion: (funcion(), db.rollback(), None)[-1])
+
+
+def _python(*argumentos: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *argumentos], cwd=DIRECTORIO, env=os.environ,
+                          capture_output=True, text=True, check=True)
+
+
+def _importtime(modulo: str) -> float:
+    """Milisegundos acumulados de `import modulo` según python -X importtime"""
+    salida = _python("-X", "importtime", "-c", f"import {modulo}")
+    for linea in salida.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        partes = linea.split("|")
+        if len(partes) == 3 and partes[2].strip() == modulo:
+            return int(partes[1]) / 1000
+    raise RuntimeError(f"python -X importtime no informó {modulo}")
+
+
+def _casos_arranque(suite: Suite, incluir: Callable[[str], bool]):
+    """Importación de los módulos y arranque de la app, cada uno en un proceso nuevo"""
+    repeticiones = min(suite.repeticiones, 10)
+    for modulo in IMPORTACIONES:
+        nombre = f"import {modulo}"
+        if incluir(nombre):
+            _importtime(modulo)  # calentamiento (.pyc y cache de disco)
+            suite.registrar(nombre, [_importtime(modulo) for _ in range(repeticiones)], 0, 0.0)
+    nombre = "main.inicializar"
+    if incluir(nombre):
+        tiempos = []
+        for _ in range(repeticiones + 1):
+            milisegundos, consultas = _python("-c", _CODIGO_ARRANQUE).stdout.split()
+            tiempos.append(float(milisegundos))
+        suite.registrar(nombre, tiempos[1:], int(consultas), 0.0)
+
+
+def comparar(actual: Dict, base: Dict, tolerancia: float) -> List[str]:
+    """Regresiones de `actual` respecto de la línea de base"""
+    regresiones = []
+    if actual["meta"]["filas"] != base["meta"]["filas"]:
+        regresiones.append(f"La base se generó con {base['meta']['filas']} filas y esta corrida con {actual['meta']['filas']}")
+    for nombre, previo in base["casos"].items():
+        caso = actual["casos"].get(nombre)
+        if caso is None:
+            continue
+        for campo in ("p50_ms", "p95_ms"):
+            if caso[campo] > previo[campo] * (1 + tolerancia) + MARGEN_MS:
+                regresiones.append(f"{nombre}: {campo} {previo[campo]:.2f} -> {caso[campo]:.2f}")
+        if caso["consultas"] > previo["consultas"]:
+            regresiones.append(f"{nombre}: consultas {previo['consultas']} -> {caso['consultas']}")
+        if caso["memoria_pico_kb"] > previo["memoria_pico_kb"] * (1 + tolerancia) + MARGEN_KB:
+            regresiones.append(f"{nombre}: memoria {previo['memoria_pico_kb']:.0f} KB -> {caso['memoria_pico_kb']:.0f} KB")
+    return regresiones
+
+
+def correr(filas: int, semilla: int, repeticiones: int, solo: Optional[List[str]]) -> Dict:
+    directorio = tempfile.mkdtemp(prefix="benchmark_finanzas_")
+    # La configuración se lee al importar database/main: se fija antes
+    os.environ["FINANZAS_DATABASE_URL"] = f"sqlite:///{os.path.join(directorio, 'bench.db')}"
+    os.environ["FINANZAS_TRAZAS_ARCHIVO"] = ""
+    os.environ["FINANZAS_CONSULTA_LENTA_MS"] = "0"
+    os.environ.pop("FINANZAS_CACHE_ARCHIVO", None)
+
+    from fastapi.testclient import TestClient
+    from database import SessionLocal, preparar_esquema
+    import datos_sinteticos
+    import main
+
+    hoy = date.today()
+    inicio = time.perf_counter()
+    preparar_esquema()
+    with SessionLocal() as db:
+        cantidades = datos_sinteticos.generar(db, filas, semilla, hoy=hoy)
+    print(f"Base sintética: {sum(cantidades.values()):,} filas en {time.perf_counter() - inicio:.1f} s")
+    pdf = datos_sinteticos.generar_liquidacion_pdf(60, semilla, hoy)
+    pdf_largo = datos_sinteticos.generar_liquidacion_pdf(60, semilla, hoy, paginas_legales=40)
+
+    def incluir(nombre: str) -> bool:
+        return not solo or any(filtro.lower() in nombre.lower() for filtro in solo)
+
+    suite = Suite(repeticiones)
+    try:
+        print("Arranque:")
+        _casos_arranque(suite, incluir)
+        print("Funciones:")
+        _casos_funciones(suite, hoy, pdf, pdf_largo, incluir)
+        print("API:")
+        with TestClient(main.app) as cliente:
+            sin_medir = _casos_http(suite, cliente, hoy, pdf, incluir)
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+    if sin_medir:
+        print(f"Rutas sin medir: {', '.join(sin_medir)}")
+
+    return {
+        "meta": {
+            "filas": filas,
+            "semilla": semilla,
+            "repeticiones": repeticiones,
+            "fecha": hoy.isoformat(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "maquina": platform.machine(),
+        },
+        "casos": suite.resultados,
+        "sin_medir": sin_medir,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de la API, reportes, alertas y PDF")
+    parser.add_argument("--filas", type=int, default=10000, help="Gastos + ingresos de la base sintética")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--solo", nargs="+", help="Medir solo los casos cuyo nombre contenga alguno de estos textos")
+    parser.add_argument("--guardar", help="Guardar los resultados como línea de base (JSON)")
+    parser.add_argument("--comparar", help="Línea de base contra la cual comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Empeoramiento relativo aceptado (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    resultado = correr(args.filas, args.semilla, args.repeticiones, args.solo)
+
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as archivo:
+            json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+        print(f"Línea de base guardada en {args.guardar}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            base = json.load(archivo)
+        regresiones = comparar(resultado, base, args.tolerancia)
+        if regresiones:
+            print(f"{len(regresiones)} regresiones (tolerancia {args.tolerancia:.0%}):")
+            for regresion in regresiones:
+                print(f"  {regresion}")
+            sys.exit(1)
+        print(f"Sin regresiones respecto de {args.comparar} (tolerancia {args.tolerancia:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Cache de resultados para reportes y alertas.
+
+La clave incluye la función, sus argumentos, la fecha y las versiones de las
+tablas de las que depende (ver versiones.py): cualquier escritura en esas
+tablas cambia la clave, así que nunca se sirve un resultado viejo y no hace
+falta invalidar a mano. Las entradas que ya no se piden salen por LRU.
+
+Los resultados se comparten entre requests: quien los reciba no debe modificarlos.
+"""
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence
+import atexit
+import os
+import pickle
+import threading
+import versiones
+from database import SQLALCHEMY_DATABASE_URL
+
+MAXIMO_ENTRADAS = int(os.environ.get("FINANZAS_CACHE_ENTRADAS", "256"))
+# Si se define, el cache se guarda al salir y se recupera al arrancar
+ARCHIVO_CACHE = os.environ.get("FINANZAS_CACHE_ARCHIVO")
+
+
+class CacheLRU:
+    def __init__(self, maximo: int):
+        self.maximo = maximo
+        self.entradas: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+
+    def obtener(self, clave: Hashable):
+        with self._lock:
+            if clave in self.entradas:
+                self.entradas.move_to_end(clave)
+                self.aciertos += 1
+                return True, self.entradas[clave]
+            self.fallos += 1
+            return False, None
+
+    def guardar(self, clave: Hashable, valor: Any):
+        with self._lock:
+            self.entradas[clave] = valor
+            self.entradas.move_to_end(clave)
+            while len(self.entradas) > self.maximo:
+                self.entradas.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self.entradas.clear()
+            self.aciertos = 0
+            self.fallos = 0
+
+    def estadisticas(self) -> Dict:
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "entradas": len(self.entradas),
+                "maximo": self.maximo,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": round(self.aciertos / consultas, 4) if consultas else 0.0
+            }
+
+
+cache = CacheLRU(MAXIMO_ENTRADAS)
+
+
+def _tiene_cambios_pendientes(db) -> bool:
+    """Con escrituras sin confirmar el resultado no corresponde a ninguna versión publicada"""
+    return bool(db.info.get("tablas_modificadas") or db.new or db.dirty or db.deleted)
+
+
+def cacheado(tablas: Sequence[str]):
+    """Decorador para funciones (db, *args, **kwargs) cuyo resultado depende solo de `tablas`"""
+    tablas = tuple(tablas)
+
+    def decorador(funcion: Callable):
+        nombre = f"{funcion.__module__}.{funcion.__qualname__}"
+
+        @wraps(funcion)
+        def envoltura(db, *args, **kwargs):
+            if _tiene_cambios_pendientes(db):
+                return funcion(db, *args, **kwargs)
+            clave = (
+                nombre, args, tuple(sorted(kwargs.items())),
+                date.today().isoformat(), versiones.versiones_de(tablas)
+            )
+            encontrado, valor = cache.obtener(clave)
+            if encontrado:
+                return valor
+            valor = funcion(db, *args, **kwargs)
+            cache.guardar(clave, valor)
+            return valor
+
+        return envoltura
+
+    return decorador
+
+
+def guardar(ruta: Optional[str] = None):
+    """Persiste las entradas del cache junto con la base y las versiones a las que corresponden"""
+    ruta = ruta or ARCHIVO_CACHE
+    if not ruta:
+        return
+    with cache._lock:
+        entradas = list(cache.entradas.items())
+    contenido = {"base": SQLALCHEMY_DATABASE_URL, "versiones": versiones.conocidas(), "entradas": entradas}
+    temporal = ruta + ".tmp"
+    with open(temporal, "wb") as archivo:
+        pickle.dump(contenido, archivo)
+    os.replace(temporal, ruta)
+
+
+def _misma_base(contenido: Dict) -> bool:
+    """La base es la misma y no volvió atrás (recreada o restaurada en la misma ruta)"""
+    if contenido.get("base") != SQLALCHEMY_DATABASE_URL:
+        return False
+    guardadas = contenido.get("versiones") or {}
+    actuales = versiones.conocidas()
+    if not guardadas.get(versiones.IDENTIDAD) or guardadas[versiones.IDENTIDAD] != actuales.get(versiones.IDENTIDAD):
+        return False
+    # Con versiones más bajas que las guardadas, las claves viejas podrían volver a coincidir
+    return all(actuales.get(tabla, 0) >= version for tabla, version in guardadas.items())
+
+
+def cargar(ruta: Optional[str] = None) -> int:
+    """Recupera el cache guardado (después de versiones.cargar); las claves con versiones
+    viejas simplemente no vuelven a pedirse. Si la base no es la misma, se descarta el archivo."""
+    ruta = ruta or ARCHIVO_CACHE
+    if not ruta or not os.path.exists(ruta):
+        return 0
+    try:
+        with open(ruta, "rb") as archivo:
+            contenido = pickle.load(archivo)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return 0
+    if not _misma_base(contenido):
+        os.remove(ruta)
+        return 0
+    for clave, valor in contenido["entradas"][-cache.maximo:]:
+        cache.guardar(clave, valor)
+    return len(cache.entradas)
+
+
+if ARCHIVO_CACHE:
+    atexit.register(guardar)
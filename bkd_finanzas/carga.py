@@ -0,0 +1,306 @@
+"""
+Prueba de carga con una mezcla de tráfico realista.
+
+Levanta uvicorn sobre una base sintética (datos_sinteticos.py) y reproduce
+usuarios que eligen escenarios con pesos: cargar el dashboard, el ABM de un
+gasto, proyecciones, descargar un reporte y subir una liquidación en PDF
+(fixtures generados con el mismo módulo). La concurrencia sube por escalones;
+en cada uno se informa throughput, p50/p95/p99 y tasa de errores por ruta, y
+al final el escalón donde el throughput dejó de crecer (saturación).
+
+Uso:
+    python carga.py
+    python carga.py --escalones 1 2 4 8 16 32 64 --duracion 20 --filas 100000
+    python carga.py --modo async --json carga.json
+    python carga.py --url http://127.0.0.1:8000 --escenarios dashboard gastos
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+import httpx
+
+from benchmark_async import DIRECTORIO, MODOS, _esperar_servidor, _percentil
+
+# Peso de cada escenario en la mezcla
+PESOS = {
+    "dashboard": 40,
+    "gastos": 25,
+    "proyecciones": 15,
+    "reportes": 12,
+    "pdf": 8,
+}
+# Un escalón satura si el throughput crece menos que esto respecto del anterior
+MEJORA_MINIMA = 0.10
+# Liquidaciones distintas que se generan como fixtures
+FIXTURES_PDF = 3
+
+
+class Registro:
+    """Latencias y errores por ruta de un escalón"""
+
+    def __init__(self):
+        self.latencias = defaultdict(list)
+        self.errores = defaultdict(int)
+        self.estados = defaultdict(lambda: defaultdict(int))
+
+    async def pedir(self, cliente: httpx.AsyncClient, metodo: str, ruta: str, url: str, **kwargs):
+        """Hace el request y lo anota bajo `ruta` (la plantilla, no la URL con ids)"""
+        nombre = f"{metodo} {ruta}"
+        inicio = time.perf_counter()
+        try:
+            respuesta = await cliente.request(metodo, url, **kwargs)
+            estado = respuesta.status_code
+        except httpx.HTTPError as e:
+            respuesta, estado = None, type(e).__name__
+        self.latencias[nombre].append(time.perf_counter() - inicio)
+        self.estados[nombre][str(estado)] += 1
+        if respuesta is None or respuesta.status_code >= 400:
+            self.errores[nombre] += 1
+            return None
+        return respuesta
+
+    def resumen(self, transcurrido: float) -> dict:
+        rutas = {}
+        for nombre, latencias in sorted(self.latencias.items()):
+            rutas[nombre] = {
+                "requests": len(latencias),
+                "rps": len(latencias) / transcurrido,
+                "tasa_errores": self.errores[nombre] / len(latencias),
+                "p50_ms": _percentil(latencias, 0.50) * 1000,
+                "p95_ms": _percentil(latencias, 0.95) * 1000,
+                "p99_ms": _percentil(latencias, 0.99) * 1000,
+                "estados": dict(self.estados[nombre]),
+            }
+        todas = [latencia for latencias in self.latencias.values() for latencia in latencias]
+        return {
+            "requests": len(todas),
+            "rps": len(todas) / transcurrido,
+            "tasa_errores": sum(self.errores.values()) / len(todas) if todas else 0.0,
+            "p50_ms": _percentil(todas, 0.50) * 1000,
+            "p95_ms": _percentil(todas, 0.95) * 1000,
+            "p99_ms": _percentil(todas, 0.99) * 1000,
+            "rutas": rutas,
+        }
+
+
+# ========== ESCENARIOS ==========
+# Cada escenario es lo que dispara una acción del usuario en el frontend.
+
+async def _dashboard(cliente, rng, registro, contexto):
+    hoy = date.today()
+    meses = rng.choice([6, 12, 36])
+    await asyncio.gather(
+        registro.pedir(cliente, "GET", "/api/reportes/resumen-mensual", "/api/reportes/resumen-mensual",
+                       params={"ano": hoy.year, "mes": hoy.month}),
+        registro.pedir(cliente, "GET", "/api/tarjetas", "/api/tarjetas"),
+        registro.pedir(cliente, "GET", "/api/alertas/tendencias", "/api/alertas/tendencias",
+                       params={"meses": meses, "granularidad": "trimestre" if meses > 24 else "mes"}),
+        registro.pedir(cliente, "GET", "/api/alertas", "/api/alertas"),
+        registro.pedir(cliente, "GET", "/api/prestamos", "/api/prestamos"),
+    )
+
+
+async def _gastos(cliente, rng, registro, contexto):
+    await registro.pedir(cliente, "GET", "/api/gastos", "/api/gastos", params={"limit": 100})
+    gasto = {
+        "fecha": (date.today() - timedelta(days=rng.randint(0, 60))).isoformat(),
+        "monto": round(rng.uniform(500, 80000), 2),
+        "moneda": "ARS",
+        "tipo": rng.choice(["Fijo", "Ordinario", "Extraordinario"]),
+        "categoria": rng.choice(["Supermercado", "Servicios", "Transporte", "Salud", "Restaurantes"]),
+        "descripcion": "carga",
+    }
+    respuesta = await registro.pedir(cliente, "POST", "/api/gastos", "/api/gastos", json=gasto)
+    if respuesta is None:
+        return
+    url = f"/api/gastos/{respuesta.json()['id']}"
+    await registro.pedir(cliente, "PUT", "/api/gastos/{gasto_id}", url,
+                         json={"monto": round(gasto["monto"] * rng.uniform(0.8, 1.2), 2)})
+    await registro.pedir(cliente, "DELETE", "/api/gastos/{gasto_id}", url)
+
+
+async def _proyecciones(cliente, rng, registro, contexto):
+    await asyncio.gather(
+        registro.pedir(cliente, "GET", "/api/proyecciones", "/api/proyecciones"),
+        registro.pedir(cliente, "GET", "/api/proyecciones/tarjetas", "/api/proyecciones/tarjetas",
+                       params={"meses": rng.choice([3, 6, 12])}),
+    )
+    if rng.random() < 0.3:
+        proyeccion = {
+            "tipo": "gasto_fijo",
+            "fecha_vencimiento": (date.today() + timedelta(days=rng.randint(1, 90))).isoformat(),
+            "monto_estimado": round(rng.uniform(1000, 50000), 2),
+            "moneda": "ARS",
+            "descripcion": "carga",
+        }
+        respuesta = await registro.pedir(cliente, "POST", "/api/proyecciones", "/api/proyecciones", json=proyeccion)
+        if respuesta is not None:
+            await registro.pedir(cliente, "DELETE", "/api/proyecciones/{proyeccion_id}",
+                                 f"/api/proyecciones/{respuesta.json()['id']}")
+
+
+async def _reportes(cliente, rng, registro, contexto):
+    fin = date.today()
+    inicio = fin - timedelta(days=rng.choice([30, 90, 365]))
+    params = {"fecha_inicio": inicio.isoformat(), "fecha_fin": fin.isoformat()}
+    ruta = rng.choice(["/api/reportes/gastos/pdf", "/api/reportes/gastos/excel", "/api/reportes/consolidado"])
+    await registro.pedir(cliente, "GET", ruta, ruta, params=params)
+
+
+async def _pdf(cliente, rng, registro, contexto):
+    nombre, contenido = rng.choice(contexto["pdfs"])
+    archivos = {"file": (nombre, contenido, "application/pdf")}
+    if not contexto["tarjetas"] or rng.random() < 0.3:
+        await registro.pedir(cliente, "POST", "/api/pdf/previsualizar", "/api/pdf/previsualizar", files=archivos)
+        return
+    await registro.pedir(cliente, "POST", "/api/pdf/procesar-liquidacion", "/api/pdf/procesar-liquidacion",
+                         params={"tarjeta_id": rng.choice(contexto["tarjetas"])}, files=archivos)
+
+
+ESCENARIOS = {
+    "dashboard": _dashboard,
+    "gastos": _gastos,
+    "proyecciones": _proyecciones,
+    "reportes": _reportes,
+    "pdf": _pdf,
+}
+
+
+async def _escalon(url: str, usuarios: int, duracion: float, escenarios, contexto: dict, semilla: int) -> dict:
+    pesos = [PESOS[nombre] for nombre in escenarios]
+    registro = Registro()
+    fin = time.monotonic() + duracion
+
+    # Cada usuario puede tener varios requests en vuelo (el dashboard pide 5 a la vez)
+    limites = httpx.Limits(max_connections=usuarios * 5, max_keepalive_connections=usuarios * 5)
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limites) as cliente:
+        async def usuario(numero: int):
+            rng = random.Random(semilla * 100003 + numero)
+            while time.monotonic() < fin:
+                escenario = rng.choices(escenarios, weights=pesos)[0]
+                await ESCENARIOS[escenario](cliente, rng, registro, contexto)
+
+        inicio = time.monotonic()
+        await asyncio.gather(*(usuario(i) for i in range(usuarios)))
+        transcurrido = time.monotonic() - inicio
+
+    return {"usuarios": usuarios, "duracion_s": transcurrido, **registro.resumen(transcurrido)}
+
+
+def _saturacion(escalones: list):
+    """Primer escalón donde más usuarios ya no dan más throughput"""
+    for anterior, actual in zip(escalones, escalones[1:]):
+        if actual["rps"] < anterior["rps"] * (1 + MEJORA_MINIMA):
+            return anterior["usuarios"]
+    return None
+
+
+def _fixtures(directorio: str, semilla: int) -> list:
+    pdfs = []
+    for i in range(FIXTURES_PDF):
+        ruta = os.path.join(directorio, f"liquidacion_{i + 1}.pdf")
+        subprocess.run(
+            [sys.executable, "datos_sinteticos.py", "--pdf", ruta, "--semilla", str(semilla + i),
+             "--movimientos", str(30 + 30 * i)],
+            cwd=DIRECTORIO, check=True, stdout=subprocess.DEVNULL
+        )
+        with open(ruta, "rb") as archivo:
+            pdfs.append((os.path.basename(ruta), archivo.read()))
+    return pdfs
+
+
+async def _tarjetas(url: str) -> list:
+    async with httpx.AsyncClient(base_url=url, timeout=30) as cliente:
+        respuesta = await cliente.get("/api/tarjetas")
+        respuesta.raise_for_status()
+        return [tarjeta["id"] for tarjeta in respuesta.json()]
+
+
+def _imprimir(resultado: dict):
+    print(f"\n{resultado['usuarios']:>4} usuarios: {resultado['rps']:8.1f} req/s  "
+          f"p50 {resultado['p50_ms']:7.1f} ms  p95 {resultado['p95_ms']:7.1f} ms  "
+          f"p99 {resultado['p99_ms']:7.1f} ms  errores {resultado['tasa_errores']:.1%}")
+    for nombre, ruta in resultado["rutas"].items():
+        print(f"    {nombre:<45} {ruta['rps']:7.1f} req/s  p50 {ruta['p50_ms']:8.1f}  "
+              f"p95 {ruta['p95_ms']:8.1f}  p99 {ruta['p99_ms']:8.1f} ms  errores {ruta['tasa_errores']:6.1%}")
+
+
+def correr(url: str, escalones, duracion: float, escenarios, pdfs: list, semilla: int) -> list:
+    contexto = {"pdfs": pdfs, "tarjetas": asyncio.run(_tarjetas(url))}
+    resultados = []
+    for usuarios in escalones:
+        resultado = asyncio.run(_escalon(url, usuarios, duracion, escenarios, contexto, semilla))
+        _imprimir(resultado)
+        resultados.append(resultado)
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga con mezcla de tráfico realista")
+    parser.add_argument("--escalones", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32],
+                        help="Usuarios concurrentes de cada escalón")
+    parser.add_argument("--duracion", type=float, default=15.0, help="Segundos por escalón")
+    parser.add_argument("--escenarios", nargs="+", choices=list(ESCENARIOS), default=list(ESCENARIOS))
+    parser.add_argument("--modo", choices=list(MODOS), default="sync")
+    parser.add_argument("--filas", type=int, default=20000, help="Gastos + ingresos de la base sintética")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--puerto", type=int, default=8766)
+    parser.add_argument("--url", help="Usar un servidor ya levantado en lugar de uno temporal")
+    parser.add_argument("--json", help="Archivo donde guardar los resultados")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        pdfs = _fixtures(directorio, args.semilla) if "pdf" in args.escenarios else []
+        servidor = None
+        url = args.url
+        if url is None:
+            base = f"sqlite:///{os.path.join(directorio, 'carga.db')}"
+            subprocess.run(
+                [sys.executable, "datos_sinteticos.py", "--base", base, "--filas", str(args.filas),
+                 "--semilla", str(args.semilla)],
+                cwd=DIRECTORIO, check=True, stdout=subprocess.DEVNULL
+            )
+            entorno = dict(
+                os.environ,
+                FINANZAS_DATABASE_URL=base,
+                FINANZAS_DB_ASYNC="0",
+                FINANZAS_ESCRITURA_AGRUPADA="0",
+                FINANZAS_TRAZAS_ARCHIVO="",
+            )
+            entorno.update(MODOS[args.modo])
+            servidor = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.puerto), "--log-level", "warning"],
+                cwd=DIRECTORIO, env=entorno
+            )
+            url = f"http://127.0.0.1:{args.puerto}"
+        try:
+            asyncio.run(_esperar_servidor(url))
+            resultados = correr(url, args.escalones, args.duracion, args.escenarios, pdfs, args.semilla)
+        finally:
+            if servidor is not None:
+                servidor.terminate()
+                servidor.wait()
+
+    saturacion = _saturacion(resultados)
+    if saturacion is None:
+        print(f"\nEl throughput siguió creciendo hasta {args.escalones[-1]} usuarios")
+    else:
+        print(f"\nSaturación: a partir de {saturacion} usuarios el throughput crece menos de {MEJORA_MINIMA:.0%}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as archivo:
+            json.dump({"modo": args.modo, "filas": args.filas, "saturacion_usuarios": saturacion,
+                       "escalones": resultados}, archivo, indent=2)
+
+
+if __name__ == "__main__":
+    main()
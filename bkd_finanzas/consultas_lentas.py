@@ -0,0 +1,110 @@
+"""
+Registro de consultas lentas (/api/debug/consultas-lentas).
+
+Las sentencias que tardan más de UMBRAL_MS se guardan en un buffer circular
+con sus parámetros, el request y la función de la app que las ejecutó
+(p. ej. reports.egresos_mensuales) y, en SQLite, el EXPLAIN QUERY PLAN; los
+pasos SCAN (recorrido completo de una tabla o índice) quedan marcados aparte.
+
+Los parámetros traen datos reales (montos, descripciones), así que el registro
+y sus rutas solo existen con FINANZAS_DEBUG=1.
+"""
+from sqlalchemy import event
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+import os
+import sys
+import threading
+import time
+import metricas
+
+ACTIVO = os.environ.get("FINANZAS_DEBUG", "0").lower() in ("1", "true", "si", "sí")
+UMBRAL_MS = float(os.environ.get("FINANZAS_CONSULTA_LENTA_MS", "100"))
+MAXIMO = int(os.environ.get("FINANZAS_CONSULTAS_LENTAS", "200"))
+# Largo máximo con que se guardan los parámetros
+LARGO_PARAMETROS = 500
+
+# Sentencias a las que se les pide el plan (BEGIN o PRAGMA pueden ser lentas por esperar un lock)
+_CON_PLAN = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+_DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+_registro: deque = deque(maxlen=MAXIMO)
+_lock = threading.Lock()
+
+
+def _funcion_llamadora() -> Optional[str]:
+    """Primera función de la app (fuera de SQLAlchemy y de este módulo) en la pila"""
+    marco = sys._getframe(2)
+    while marco is not None:
+        archivo = os.path.abspath(marco.f_code.co_filename)
+        if os.path.dirname(archivo) == _DIRECTORIO and archivo != os.path.abspath(__file__):
+            modulo = os.path.splitext(os.path.basename(archivo))[0]
+            return f"{modulo}.{marco.f_code.co_name}:{marco.f_lineno}"
+        marco = marco.f_back
+    return None
+
+
+def _plan(conn, statement: str, parametros) -> Optional[List[str]]:
+    """EXPLAIN QUERY PLAN con los mismos parámetros (solo SQLite)"""
+    if conn.dialect.name != "sqlite":
+        return None
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, parametros)
+        return [fila[3] for fila in cursor.fetchall()]
+    except Exception as e:
+        return [f"(sin plan: {e})"]
+    finally:
+        cursor.close()
+
+
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("inicio_consultas_lentas", []).append(time.perf_counter())
+
+
+def _despues(conn, cursor, statement, parameters, context, executemany):
+    inicios = conn.info.get("inicio_consultas_lentas")
+    if not inicios:
+        return
+    duracion_ms = (time.perf_counter() - inicios.pop()) * 1000
+    if duracion_ms < UMBRAL_MS:
+        return
+
+    parametros = parameters[0] if executemany and parameters else parameters
+    plan = _plan(conn, statement, parametros) if statement.lstrip().upper().startswith(_CON_PLAN) else None
+    medicion = metricas.actual()
+    entrada = {
+        "momento": datetime.now().isoformat(timespec="milliseconds"),
+        "duracion_ms": round(duracion_ms, 2),
+        "sql": statement,
+        "parametros": repr(parametros)[:LARGO_PARAMETROS],
+        "filas_parametros": len(parameters) if executemany else 1,
+        "ruta": medicion.ruta if medicion is not None else None,
+        "funcion": _funcion_llamadora(),
+        "plan": plan,
+        "escaneos": [paso for paso in plan or () if paso.startswith("SCAN ") and paso != "SCAN CONSTANT ROW"],
+    }
+    with _lock:
+        _registro.append(entrada)
+
+
+def instrumentar(engine):
+    """Registra los hooks en un engine (sync, o el sync_engine de uno async)"""
+    if not ACTIVO or UMBRAL_MS <= 0 or event.contains(engine, "after_cursor_execute", _despues):
+        return
+    event.listen(engine, "before_cursor_execute", _antes)
+    event.listen(engine, "after_cursor_execute", _despues)
+
+
+def listar(solo_escaneos: bool = False) -> List[Dict]:
+    """Consultas registradas, la más reciente primero"""
+    with _lock:
+        entradas = list(reversed(_registro))
+    if solo_escaneos:
+        entradas = [e for e in entradas if e["escaneos"]]
+    return entradas
+
+
+def limpiar():
+    with _lock:
+        _registro.clear()
@@ -0,0 +1,211 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, delete, func, insert, select
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+import csv
+import os
+import models
+
+# Directorio con los CSV de cotizaciones (oficial.csv, mep.csv, blue.csv)
+DIRECTORIO_COTIZACIONES = os.environ.get(
+    "FINANZAS_COTIZACIONES_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "datos", "cotizaciones")
+)
+# Fechas por DELETE ... IN (...) al reemplazar (límite de parámetros de SQLite)
+TANDA_FECHAS = 500
+
+
+def parsear_fecha(valor: str) -> date:
+    """Acepta fechas YYYY-MM-DD o DD/MM/YYYY"""
+    valor = valor.strip()
+    if "/" in valor:
+        return datetime.strptime(valor, "%d/%m/%Y").date()
+    return date.fromisoformat(valor)
+
+
+def parsear_numero(valor: Optional[str]) -> Optional[float]:
+    """Acepta números con punto decimal o en formato argentino (1.234,56)"""
+    if valor is None or not valor.strip():
+        return None
+    valor = valor.strip()
+    if "," in valor:
+        valor = valor.replace(".", "").replace(",", ".")
+    return float(valor)
+
+
+def cargar_csv(db: Session, ruta: str, serie: models.SerieCotizacion) -> int:
+    """Carga un CSV con columnas fecha,compra,venta (o fecha,valor) y reemplaza esas fechas"""
+    filas = {}
+    with open(ruta, newline="", encoding="utf-8") as archivo:
+        for registro in csv.DictReader(archivo):
+            registro = {k.strip().lower(): v for k, v in registro.items() if k}
+            venta = parsear_numero(registro.get("venta") or registro.get("valor"))
+            if venta is None:
+                continue
+            fecha = parsear_fecha(registro["fecha"])
+            filas[fecha] = {
+                "serie": serie,
+                "fecha": fecha,
+                "compra": parsear_numero(registro.get("compra")),
+                "venta": venta,
+                "created_at": date.today(),
+            }
+
+    if not filas:
+        return 0
+
+    fechas = sorted(filas)
+    # Solo las fechas del CSV: un CSV salteado no borra las que no trae
+    for inicio in range(0, len(fechas), TANDA_FECHAS):
+        db.execute(delete(models.Cotizacion).where(
+            and_(
+                models.Cotizacion.serie == serie,
+                models.Cotizacion.fecha.in_(fechas[inicio:inicio + TANDA_FECHAS])
+            )
+        ))
+    db.execute(insert(models.Cotizacion), [filas[f] for f in fechas])
+    return len(fechas)
+
+
+def cargar_directorio(db: Session, directorio: Optional[str] = None) -> Dict[str, int]:
+    """Carga todas las series presentes en el directorio (<serie>.csv)"""
+    directorio = directorio or DIRECTORIO_COTIZACIONES
+    cargadas = {}
+    for serie in models.SerieCotizacion:
+        ruta = os.path.join(directorio, f"{serie.name.lower()}.csv")
+        if os.path.exists(ruta):
+            cargadas[serie.value] = cargar_csv(db, ruta, serie)
+    db.commit()
+    return cargadas
+
+
+def subconsulta_cotizacion(columna_fecha, serie: models.SerieCotizacion):
+    """Subconsulta correlacionada con la última cotización vigente a `columna_fecha`.
+
+    Se resuelve con una búsqueda sobre el índice (serie, fecha) por fila.
+    """
+    return (
+        select(models.Cotizacion.venta)
+        .where(
+            and_(
+                models.Cotizacion.serie == serie,
+                models.Cotizacion.fecha <= columna_fecha
+            )
+        )
+        .order_by(models.Cotizacion.fecha.desc())
+        .limit(1)
+        .correlate_except(models.Cotizacion)
+        .scalar_subquery()
+    )
+
+
+def obtener_cotizacion(db: Session, fecha: date, serie: models.SerieCotizacion) -> Optional[models.Cotizacion]:
+    """Devuelve la cotización vigente a una fecha (la última publicada hasta ese día)"""
+    return db.query(models.Cotizacion).filter(
+        and_(
+            models.Cotizacion.serie == serie,
+            models.Cotizacion.fecha <= fecha
+        )
+    ).order_by(models.Cotizacion.fecha.desc()).first()
+
+
+def cotizaciones_asof(db: Session, fechas: Iterable[date], serie: models.SerieCotizacion) -> Dict[date, Optional[float]]:
+    """Resuelve la cotización vigente para muchas fechas con un merge ordenado.
+
+    Lee una sola vez el tramo de la serie que cubre las fechas pedidas.
+    """
+    fechas = sorted(set(fechas))
+    if not fechas:
+        return {}
+
+    anterior = obtener_cotizacion(db, fechas[0], serie)
+    desde = anterior.fecha if anterior else fechas[0]
+    serie_ordenada = db.query(models.Cotizacion.fecha, models.Cotizacion.venta).filter(
+        and_(
+            models.Cotizacion.serie == serie,
+            models.Cotizacion.fecha >= desde,
+            models.Cotizacion.fecha <= fechas[-1]
+        )
+    ).order_by(models.Cotizacion.fecha).all()
+
+    resultado = {}
+    vigente = None
+    j = 0
+    for fecha in fechas:
+        while j < len(serie_ordenada) and serie_ordenada[j].fecha <= fecha:
+            vigente = serie_ordenada[j].venta
+            j += 1
+        resultado[fecha] = vigente
+    return resultado
+
+
+def convertir_montos(
+    db: Session,
+    movimientos: List,
+    serie: models.SerieCotizacion,
+    moneda_destino: models.TipoMoneda = models.TipoMoneda.PESOS
+) -> Dict:
+    """Suma movimientos (con fecha, monto y moneda) convertidos a una sola moneda"""
+    a_convertir = [m for m in movimientos if m.moneda != moneda_destino]
+    tasas = cotizaciones_asof(db, (m.fecha for m in a_convertir), serie)
+
+    total = sum(m.monto for m in movimientos if m.moneda == moneda_destino)
+    sin_cotizacion = 0
+    monto_sin_cotizacion = 0.0
+    for m in a_convertir:
+        tasa = tasas.get(m.fecha)
+        if not tasa:
+            sin_cotizacion += 1
+            monto_sin_cotizacion += m.monto
+        elif moneda_destino == models.TipoMoneda.PESOS:
+            total += m.monto * tasa
+        else:
+            total += m.monto / tasa
+
+    return {
+        "total": total,
+        "moneda": moneda_destino.value,
+        "serie": serie.value,
+        "sin_cotizacion": sin_cotizacion,
+        # En la otra moneda, sin convertir (no entra en "total")
+        "monto_sin_cotizacion": monto_sin_cotizacion
+    }
+
+
+def total_consolidado(
+    db: Session,
+    modelo,
+    fecha_inicio: date,
+    fecha_fin: date,
+    serie: models.SerieCotizacion,
+    moneda_destino: models.TipoMoneda = models.TipoMoneda.PESOS
+) -> Dict:
+    """Total de un modelo con fecha/monto/moneda (Gasto, Ingreso) en una sola moneda.
+
+    La conversión se hace dentro de una única consulta de agregación.
+    """
+    tasa = subconsulta_cotizacion(modelo.fecha, serie)
+    if moneda_destino == models.TipoMoneda.PESOS:
+        convertido = modelo.monto * tasa
+    else:
+        convertido = modelo.monto / tasa
+    monto = case((modelo.moneda == moneda_destino, modelo.monto), else_=convertido)
+
+    total, cantidad, convertidos = db.query(
+        func.coalesce(func.sum(monto), 0.0),
+        func.count(modelo.id),
+        func.count(monto)
+    ).filter(
+        and_(
+            modelo.fecha >= fecha_inicio,
+            modelo.fecha <= fecha_fin
+        )
+    ).one()
+
+    return {
+        "total": total,
+        "moneda": moneda_destino.value,
+        "serie": serie.value,
+        "cantidad": cantidad,
+        "sin_cotizacion": cantidad - convertidos
+    }
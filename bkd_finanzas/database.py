@@ -1,22 +1,253 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, delete, event, insert, inspect, select, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+import hashlib
+import os
+import consultas_lentas
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./finanzas.db"
+# Configuración por variables de entorno (los valores por defecto sirven para uso local)
+SQLALCHEMY_DATABASE_URL = os.environ.get("FINANZAS_DATABASE_URL", "sqlite:///./finanzas.db")
+# URL opcional para lecturas (p. ej. una réplica de PostgreSQL); por defecto, la misma base
+SQLALCHEMY_DATABASE_URL_LECTURA = os.environ.get("FINANZAS_DATABASE_URL_LECTURA", SQLALCHEMY_DATABASE_URL)
+POOL_ESCRITURA = int(os.environ.get("FINANZAS_DB_POOL_ESCRITURA", "5"))
+POOL_LECTURA = int(os.environ.get("FINANZAS_DB_POOL_LECTURA", "10"))
+POOL_MAX_OVERFLOW = int(os.environ.get("FINANZAS_DB_MAX_OVERFLOW", "10"))
+# Conexiones que puede entregar cada pool (base para limitar sesiones concurrentes)
+CAPACIDAD_ESCRITURA = POOL_ESCRITURA + POOL_MAX_OVERFLOW
+CAPACIDAD_LECTURA = POOL_LECTURA + POOL_MAX_OVERFLOW
+POOL_TIMEOUT = int(os.environ.get("FINANZAS_DB_POOL_TIMEOUT", "30"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("FINANZAS_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_KB = int(os.environ.get("FINANZAS_SQLITE_CACHE_KB", "65536"))
+SQLITE_MMAP_BYTES = int(os.environ.get("FINANZAS_SQLITE_MMAP_BYTES", str(256 * 1024 * 1024)))
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def es_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def _es_memoria(url: str) -> bool:
+    return make_url(url).database in (None, "", ":memory:")
+
+
+# Base en memoria con cache compartido: la ven las conexiones síncronas y las de
+# aiosqlite del mismo proceso (una URL sqlite:// común sería una base distinta por conexión)
+URL_MEMORIA = "sqlite:///file:finanzas_memoria?mode=memory&cache=shared&uri=true"
+
+
+def _configurar_sqlite(engine, solo_lectura: bool):
+    """Aplica los PRAGMA de rendimiento a cada conexión nueva"""
+
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        if not solo_lectura:
+            # WAL deja leer mientras otro proceso escribe; queda persistido en el archivo
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KB}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_BYTES}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if solo_lectura:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+        if not solo_lectura:
+            # La transacción la abre el evento "begin" de abajo
+            dbapi_connection.isolation_level = None
+
+    if not solo_lectura:
+        @event.listens_for(engine, "begin")
+        def _begin(conn):
+            # Las sesiones de escritura (execution option "escritura") toman el lock al
+            # empezar: con BEGIN diferido, una transacción que leyó y después escribe falla
+            # con "database is locked" sin esperar busy_timeout. El resto (consultas sueltas
+            # sobre este engine) no bloquea a los que escriben.
+            if conn.get_execution_options().get("escritura"):
+                conn.exec_driver_sql("BEGIN IMMEDIATE")
+            else:
+                conn.exec_driver_sql("BEGIN")
+
+
+def crear_engine(url: str = None, solo_lectura: bool = False, pool_size: int = None):
+    """Crea un engine con pool dimensionado según la base.
+
+    SQLite: pool de conexiones al archivo con WAL, synchronous=NORMAL, cache,
+    mmap y busy_timeout; las de solo lectura además con query_only.
+    Otras bases (PostgreSQL): QueuePool con pool_size/max_overflow y pre-ping.
+    """
+    url = url or SQLALCHEMY_DATABASE_URL
+    pool_size = pool_size or (POOL_LECTURA if solo_lectura else POOL_ESCRITURA)
+
+    if es_sqlite(url):
+        if _es_memoria(url):
+            # Una conexión que se mantiene abierta: la base en memoria vive mientras haya alguna
+            return create_engine(URL_MEMORIA, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        nuevo = create_engine(
+            url,
+            connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+            pool_size=pool_size,
+            max_overflow=POOL_MAX_OVERFLOW,
+            pool_timeout=POOL_TIMEOUT,
+        )
+        _configurar_sqlite(nuevo, solo_lectura)
+        return nuevo
+
+    return create_engine(
+        url,
+        pool_size=pool_size,
+        max_overflow=POOL_MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_pre_ping=True,
+        pool_recycle=1800,
+    )
+
+
+engine = crear_engine()
+if _es_memoria(SQLALCHEMY_DATABASE_URL):
+    engine_lectura = engine
+else:
+    engine_lectura = crear_engine(SQLALCHEMY_DATABASE_URL_LECTURA, solo_lectura=True)
+consultas_lentas.instrumentar(engine)
+consultas_lentas.instrumentar(engine_lectura)
+
+# Sesiones para endpoints y procesos que escriben (con SQLite, BEGIN IMMEDIATE)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine.execution_options(escritura=True))
+# Sesiones para endpoints que solo consultan: no compiten por el pool de escritura
+SessionLectura = sessionmaker(autocommit=False, autoflush=False, bind=engine_lectura)
+
+# Capa asíncrona opcional (AsyncSession sobre aiosqlite / asyncpg), se elige al arrancar
+MODO_ASYNC = os.environ.get("FINANZAS_DB_ASYNC", "0").lower() in ("1", "true", "si", "sí")
+
+
+def url_async(url: str) -> str:
+    """Traduce la URL al driver asíncrono equivalente"""
+    url = make_url(url)
+    drivers = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+    return url.set(drivername=drivers.get(url.get_backend_name(), url.drivername)).render_as_string(hide_password=False)
+
+
+def crear_engine_async(url: str = None, solo_lectura: bool = False, pool_size: int = None):
+    """Versión asíncrona de crear_engine (mismos pools y PRAGMA)"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = url or SQLALCHEMY_DATABASE_URL
+    pool_size = pool_size or (POOL_LECTURA if solo_lectura else POOL_ESCRITURA)
+
+    if es_sqlite(url):
+        if _es_memoria(url):
+            return create_async_engine(url_async(URL_MEMORIA), poolclass=StaticPool)
+        nuevo = create_async_engine(
+            url_async(url),
+            connect_args={"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+            pool_size=pool_size,
+            max_overflow=POOL_MAX_OVERFLOW,
+            pool_timeout=POOL_TIMEOUT,
+        )
+        _configurar_sqlite(nuevo.sync_engine, solo_lectura)
+        return nuevo
+
+    return create_async_engine(
+        url_async(url),
+        pool_size=pool_size,
+        max_overflow=POOL_MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_pre_ping=True,
+        pool_recycle=1800,
+    )
+
+
+engine_async = None
+AsyncSessionLocal = None
+AsyncSessionLectura = None
+if MODO_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    engine_async = crear_engine_async()
+    if _es_memoria(SQLALCHEMY_DATABASE_URL):
+        engine_async_lectura = engine_async
+    else:
+        engine_async_lectura = crear_engine_async(SQLALCHEMY_DATABASE_URL_LECTURA, solo_lectura=True)
+    consultas_lentas.instrumentar(engine_async.sync_engine)
+    consultas_lentas.instrumentar(engine_async_lectura.sync_engine)
+    # Sin expirar al commit: los objetos se serializan después sin volver a la base
+    AsyncSessionLocal = async_sessionmaker(
+        engine_async.execution_options(escritura=True), autoflush=False, expire_on_commit=False
+    )
+    AsyncSessionLectura = async_sessionmaker(engine_async_lectura, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
 
+def _literal_default(columna) -> str:
+    """Devuelve el DEFAULT SQL de una columna con default escalar (o cadena vacía)"""
+    default = columna.default
+    if default is None or not default.is_scalar:
+        return ""
+    valor = default.arg
+    if isinstance(valor, bool):
+        return f" DEFAULT {int(valor)}"
+    if isinstance(valor, (int, float)):
+        return f" DEFAULT {valor}"
+    if hasattr(valor, "value"):  # Enum
+        valor = valor.name
+    return " DEFAULT '" + str(valor).replace("'", "''") + "'"
 
 
+def migrar_columnas_faltantes(bind=None):
+    """Agrega a las tablas existentes las columnas e índices nuevos de los modelos.
 
+    create_all solo crea tablas que no existen, así que las bases ya creadas
+    no reciben columnas nuevas; esto cubre el caso simple (ADD COLUMN).
+    """
+    bind = bind or engine
+    with bind.begin() as conn:
+        inspector = inspect(conn)
+        for tabla in Base.metadata.sorted_tables:
+            if not inspector.has_table(tabla.name):
+                continue
+            existentes = {c["name"] for c in inspector.get_columns(tabla.name)}
+            for columna in tabla.columns:
+                if columna.name in existentes:
+                    continue
+                tipo = columna.type.compile(dialect=bind.dialect)
+                conn.execute(text(
+                    f"ALTER TABLE {tabla.name} ADD COLUMN {columna.name} {tipo}{_literal_default(columna)}"
+                ))
+            for indice in tabla.indexes:
+                indice.create(conn, checkfirst=True)
 
 
+def version_esquema(dialect=None) -> str:
+    """Huella de las tablas, columnas e índices de los modelos"""
+    dialect = dialect or engine.dialect
+    partes = []
+    for tabla in Base.metadata.sorted_tables:
+        partes.append(tabla.name)
+        for columna in tabla.columns:
+            partes.append(f"{columna.name} {columna.type.compile(dialect=dialect)} {columna.nullable}")
+        for indice in sorted(tabla.indexes, key=lambda i: i.name or ""):
+            partes.append(f"{indice.name} {indice.unique} {','.join(c.name for c in indice.columns)}")
+    return hashlib.sha256("\n".join(partes).encode()).hexdigest()[:16]
 
 
+def preparar_esquema(bind=None) -> bool:
+    """Crea tablas, columnas e índices faltantes solo si cambió la versión del esquema.
 
+    La versión se guarda en la tabla esquema_version; si coincide con la de los
+    modelos el arranque no inspecciona la base. Devuelve True si hubo que migrar.
+    """
+    bind = bind or engine
+    version = version_esquema(bind.dialect)
+    tabla = Base.metadata.tables["esquema_version"]
+    with bind.connect() as conn:
+        if inspect(conn).has_table(tabla.name):
+            if conn.execute(select(tabla.c.version)).scalar() == version:
+                return False
+    Base.metadata.create_all(bind=bind)
+    migrar_columnas_faltantes(bind)
+    with bind.begin() as conn:
+        conn.execute(delete(tabla))
+        conn.execute(insert(tabla).values(version=version))
+    return True
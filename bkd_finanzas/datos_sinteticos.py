@@ -0,0 +1,361 @@
+"""
+Generador determinístico de datos de prueba.
+
+Con la misma semilla y la misma fecha de referencia produce siempre la misma
+base: años de gastos e ingresos en ARS y USD (con inflación en pesos y
+estacionalidad), decenas de tarjetas con sus pagos, préstamos con cronograma
+y pagos, inversiones, proyecciones, cotizaciones semanales e IPC mensual.
+`filas` es la cantidad de movimientos (gastos + ingresos); el resto de las
+entidades escala con ella. Los movimientos se insertan por tandas, así que
+sirve hasta ~10M filas sin cargarlas todas en memoria.
+
+También genera resúmenes de tarjeta en PDF con el formato que entiende
+pdf_processor (fixtures para benchmarks y pruebas de carga).
+
+Uso:
+    python datos_sinteticos.py --filas 100000 --base sqlite:///bench.db
+    python datos_sinteticos.py --filas 1000000 --anios 8 --semilla 7 --base sqlite:///grande.db
+    python datos_sinteticos.py --pdf liquidacion.pdf --movimientos 120
+    python datos_sinteticos.py --pdf largo.pdf --movimientos 120 --paginas-legales 40
+"""
+import argparse
+import io
+import math
+import random
+import time
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session, sessionmaker
+
+import models
+import acumulados
+import anomalias
+import amortizacion
+# Numera las filas generadas para /api/sync (la base puede tener clientes sincronizados)
+import sincronizacion  # noqa: F401
+
+# Filas por INSERT (executemany)
+TANDA = 20000
+
+CATEGORIAS = {
+    # categoría: (monto mediano en ARS a la fecha de referencia, dispersión, peso)
+    "Supermercado": (45000, 0.6, 30),
+    "Servicios": (30000, 0.4, 12),
+    "Transporte": (8000, 0.7, 15),
+    "Salud": (25000, 0.8, 6),
+    "Restaurantes": (20000, 0.6, 12),
+    "Educación": (60000, 0.3, 4),
+    "Indumentaria": (40000, 0.8, 8),
+    "Hogar": (35000, 0.9, 7),
+    "Viajes": (250000, 1.0, 2),
+    None: (15000, 1.0, 4),
+}
+COMERCIOS = [
+    "COTO", "CARREFOUR", "DIA", "JUMBO", "MERPAGO*KIOSCO", "YPF", "SHELL", "EDENOR",
+    "METROGAS", "PERSONAL", "FARMACITY", "OSDE", "MCDONALDS", "RAPPI", "PEDIDOSYA",
+    "NETFLIX", "SPOTIFY", "SODIMAC", "ZARA", "DESPEGAR", "UBER", "CABIFY",
+]
+BANCOS = ["Galicia", "Santander", "BBVA", "Macro", "Nación", "ICBC", "HSBC", "Ciudad"]
+# Inflación mensual de referencia de los montos en pesos
+INFLACION_MENSUAL = 0.04
+MESES_PDF = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
+# Texto de relleno de las páginas de condiciones (sin "TOTAL" ni títulos de secciones)
+PALABRAS_LEGALES = [
+    "el", "titular", "podrá", "solicitar", "la", "baja", "del", "servicio", "conforme", "ley",
+    "24.240", "tasa", "nominal", "anual", "efectiva", "mensual", "cargos", "comisiones", "seguro",
+    "de", "vida", "sobre", "saldo", "resumen", "cuenta", "reclamos", "dentro", "plazo", "días",
+]
+
+
+def _meses_atras(hoy: date, fecha: date) -> int:
+    return (hoy.year - fecha.year) * 12 + hoy.month - fecha.month
+
+
+def _ajuste(hoy: date, fecha: date, moneda: models.TipoMoneda) -> float:
+    """Deflacta los montos en pesos hacia el pasado; los dólares casi no cambian"""
+    if moneda == models.TipoMoneda.DOLARES:
+        return 1.0
+    return (1 + INFLACION_MENSUAL) ** -_meses_atras(hoy, fecha)
+
+
+def _fecha(rng: random.Random, hoy: date, dias: int) -> date:
+    # Diciembre y enero con algo más de movimiento
+    while True:
+        fecha = hoy - timedelta(days=rng.randrange(dias))
+        if fecha.month in (12, 1) or rng.random() < 0.85:
+            return fecha
+
+
+def _gastos(rng: random.Random, hoy: date, dias: int, cantidad: int) -> Iterator[Dict]:
+    categorias = list(CATEGORIAS)
+    pesos = [CATEGORIAS[c][2] for c in categorias]
+    tipos = [models.TipoGasto.ORDINARIO, models.TipoGasto.FIJO, models.TipoGasto.EXTRAORDINARIO]
+    for _ in range(cantidad):
+        fecha = _fecha(rng, hoy, dias)
+        categoria = rng.choices(categorias, pesos)[0]
+        mediana, dispersion, _ = CATEGORIAS[categoria]
+        moneda = models.TipoMoneda.DOLARES if rng.random() < 0.08 else models.TipoMoneda.PESOS
+        monto = mediana * math.exp(rng.gauss(0, dispersion)) * _ajuste(hoy, fecha, moneda)
+        if moneda == models.TipoMoneda.DOLARES:
+            monto /= 1200
+        yield {
+            "fecha": fecha,
+            "monto": round(monto, 2),
+            "moneda": moneda,
+            "tipo": rng.choices(tipos, (70, 20, 10))[0],
+            "categoria": categoria,
+            "descripcion": f"{rng.choice(COMERCIOS)} {rng.randrange(1, 99999):05d}" if rng.random() < 0.97 else "",
+            "created_at": fecha,
+        }
+
+
+def _ingresos(rng: random.Random, hoy: date, dias: int, cantidad: int) -> Iterator[Dict]:
+    tipos = list(models.TipoIngreso)
+    for i in range(cantidad):
+        fecha = _fecha(rng, hoy, dias)
+        tipo = tipos[0] if i % 3 == 0 else rng.choice(tipos)
+        moneda = models.TipoMoneda.DOLARES if tipo == models.TipoIngreso.AUDITORIAS and rng.random() < 0.5 else models.TipoMoneda.PESOS
+        base = 1800000 if tipo == tipos[0] else 350000
+        monto = base * math.exp(rng.gauss(0, 0.3)) * _ajuste(hoy, fecha, moneda)
+        if moneda == models.TipoMoneda.DOLARES:
+            monto /= 1200
+        yield {
+            "fecha": fecha,
+            "monto": round(monto, 2),
+            "moneda": moneda,
+            "tipo": tipo,
+            "descripcion": tipo.value,
+            "created_at": fecha,
+        }
+
+
+def _insertar(db: Session, modelo, filas) -> int:
+    total = 0
+    tanda: List[Dict] = []
+    for fila in filas:
+        tanda.append(fila)
+        if len(tanda) == TANDA:
+            db.execute(insert(modelo), tanda)
+            total += len(tanda)
+            tanda = []
+    if tanda:
+        db.execute(insert(modelo), tanda)
+        total += len(tanda)
+    return total
+
+
+def _primer_dia(fecha: date, meses_atras: int) -> date:
+    mes = fecha.month - meses_atras
+    ano = fecha.year
+    while mes <= 0:
+        mes += 12
+        ano -= 1
+    return date(ano, mes, 1)
+
+
+def generar(db: Session, filas: int = 10000, semilla: int = 1, anios: int = 5, hoy: Optional[date] = None) -> Dict[str, int]:
+    """Carga los datos en una base vacía y devuelve cuántas filas insertó por tabla"""
+    if db.scalar(select(func.count()).select_from(models.Gasto)):
+        raise ValueError("La base ya tiene gastos; el generador necesita una base vacía")
+    rng = random.Random(semilla)
+    hoy = hoy or date.today()
+    dias = 365 * anios
+    meses = 12 * anios
+    cantidades: Dict[str, int] = {}
+
+    ingresos = max(1, filas // 12)
+    cantidades["gastos"] = _insertar(db, models.Gasto, _gastos(rng, hoy, dias, filas - ingresos))
+    cantidades["ingresos"] = _insertar(db, models.Ingreso, _ingresos(rng, hoy, dias, ingresos))
+
+    # Tarjetas (decenas en las bases grandes) con un pago por mes
+    cantidad_tarjetas = min(60, max(3, filas // 2000))
+    tarjetas = [{
+        "nombre": f"{rng.choice(['Visa', 'Mastercard', 'Amex'])} {rng.choice(BANCOS)} {i + 1}",
+        "banco": rng.choice(BANCOS),
+        "limite": float(rng.choice([500000, 1000000, 3000000, 8000000])),
+        "moneda": models.TipoMoneda.DOLARES if i % 7 == 6 else models.TipoMoneda.PESOS,
+        "fecha_cierre": rng.randint(1, 28),
+        "fecha_vencimiento": rng.randint(1, 28),
+        "saldo_actual": round(rng.uniform(0, 900000), 2) if i % 4 else 0.0,
+    } for i in range(cantidad_tarjetas)]
+    cantidades["tarjetas_credito"] = _insertar(db, models.TarjetaCredito, tarjetas)
+    ids_tarjetas = db.scalars(select(models.TarjetaCredito.id).order_by(models.TarjetaCredito.id)).all()
+    cantidades["pagos_tarjeta"] = _insertar(db, models.PagoTarjeta, ({
+        "tarjeta_id": tarjeta_id,
+        "fecha_pago": _primer_dia(hoy, m) + timedelta(days=9),
+        "monto": round(rng.uniform(50000, 600000) * _ajuste(hoy, _primer_dia(hoy, m), models.TipoMoneda.PESOS), 2),
+        "descripcion": "Pago resumen",
+    } for tarjeta_id in ids_tarjetas for m in range(1, min(meses, 36) + 1)))
+    cantidades["proyecciones_pago"] = _insertar(db, models.ProyeccionPago, ({
+        "tipo": "tarjeta",
+        "entidad_id": tarjeta_id,
+        "fecha_vencimiento": hoy + timedelta(days=7 + 30 * m),
+        "monto_estimado": round(rng.uniform(50000, 600000), 2),
+        "moneda": models.TipoMoneda.PESOS,
+        "descripcion": "Proyección resumen",
+        "pagado": False,
+    } for tarjeta_id in ids_tarjetas for m in range(6)))
+
+    # Préstamos con cronograma persistido y las cuotas vencidas pagadas
+    cantidad_prestamos = min(40, max(2, filas // 5000))
+    sistemas = list(models.SistemaAmortizacion)
+    prestamos = []
+    for i in range(cantidad_prestamos):
+        cuotas = rng.choice([12, 24, 36, 60])
+        prestamo = models.Prestamo(
+            nombre=f"Préstamo {i + 1}",
+            prestamista=rng.choice(BANCOS),
+            monto_total=float(rng.choice([500000, 2000000, 5000000, 15000000])),
+            moneda=models.TipoMoneda.PESOS,
+            tasa_interes=float(rng.choice([45, 60, 80, 110])),
+            sistema_amortizacion=sistemas[i % len(sistemas)],
+            cantidad_cuotas=cuotas,
+            valor_uva_inicial=350.0 if sistemas[i % len(sistemas)] == models.SistemaAmortizacion.UVA else None,
+            fecha_inicio=_primer_dia(hoy, rng.randint(1, cuotas - 1)),
+            activo=True,
+        )
+        db.add(prestamo)
+        prestamos.append(prestamo)
+    db.flush()
+    pagos_prestamo = []
+    for prestamo in prestamos:
+        for cuota in amortizacion.calcular_cronograma(prestamo):
+            if cuota["fecha_vencimiento"] < hoy:
+                pagos_prestamo.append({
+                    "prestamo_id": prestamo.id,
+                    "fecha_pago": cuota["fecha_vencimiento"],
+                    "monto": cuota["monto_total"],
+                    "descripcion": f"Cuota {cuota['numero_cuota']}",
+                })
+    cantidades["pagos_prestamo"] = _insertar(db, models.PagoPrestamo, pagos_prestamo)
+    cantidades["desglose_cuota_prestamo"] = sum(amortizacion.generar_cronograma(db, p) for p in prestamos)
+    cantidades["prestamos"] = len(prestamos)
+
+    cantidades["inversiones"] = _insertar(db, models.Inversion, ({
+        "nombre": f"Inversión {i + 1}",
+        "tipo": rng.choice(["Plazo fijo", "Acciones", "Bonos", "FCI"]),
+        "monto_inicial": round(rng.uniform(100000, 5000000), 2),
+        "monto_actual": None,
+        "moneda": rng.choice(list(models.TipoMoneda)),
+        "fecha_inicio": hoy - timedelta(days=rng.randrange(dias)),
+        "tasa_rendimiento": float(rng.choice([30, 45, 70])),
+        "activa": True,
+    } for i in range(min(30, max(3, filas // 10000)))))
+
+    # Cotizaciones semanales de las tres series e IPC mensual
+    semanas = dias // 7 + 1
+    cotizaciones = []
+    for serie, prima in ((models.SerieCotizacion.OFICIAL, 1.0), (models.SerieCotizacion.MEP, 1.3), (models.SerieCotizacion.BLUE, 1.35)):
+        for s in range(semanas):
+            fecha = hoy - timedelta(days=7 * s)
+            venta = round(1200 * prima * (1 + INFLACION_MENSUAL) ** (-s / 4.345), 2)
+            cotizaciones.append({"serie": serie, "fecha": fecha, "compra": round(venta * 0.96, 2), "venta": venta})
+    cantidades["cotizaciones"] = _insertar(db, models.Cotizacion, cotizaciones)
+    cantidades["indice_precios"] = _insertar(db, models.IndicePrecios, ({
+        "periodo": _primer_dia(hoy, m).strftime("%Y-%m"),
+        "valor": round(10000 * (1 + INFLACION_MENSUAL) ** -m, 4),
+    } for m in range(meses + 1)))
+    db.commit()
+
+    # Tablas derivadas: acumulados mensuales y línea de base de anomalías
+    cantidades["acumulados_mensuales"] = acumulados.reconstruir(db)
+    cantidades["estadisticas_gasto"] = anomalias.recalcular_estadisticas(db)
+    db.commit()
+    return cantidades
+
+
+def generar_liquidacion_pdf(
+    movimientos: int = 60, semilla: int = 1, hoy: Optional[date] = None, destino=None, paginas_legales: int = 0
+):
+    """Resumen de tarjeta en PDF con el formato Mastercard de pdf_processor.
+
+    `paginas_legales` agrega al final páginas de condiciones y avisos, como
+    los resúmenes reales. Escribe en `destino` (ruta o archivo) o devuelve los bytes.
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    rng = random.Random(semilla)
+    hoy = hoy or date.today()
+    salida = destino if destino is not None else io.BytesIO()
+    hoja = canvas.Canvas(salida, pagesize=A4, invariant=1)
+    alto = A4[1]
+
+    def fecha_pdf(fecha: date) -> str:
+        return f"{fecha.day:02d}-{MESES_PDF[fecha.month - 1]}-{fecha.strftime('%y')}"
+
+    lineas = [
+        "MASTERCARD - RESUMEN DE CUENTA",
+        # Cierre anterior, vencimiento anterior, cierre actual, vencimiento actual
+        " ".join(fecha_pdf(hoy + timedelta(days=d)) for d in (-40, -30, -10, 0)),
+        "TOTAL A PAGAR {total}   0,00",
+        "PAGO MINIMO {minimo}",
+        "DETALLE DEL CONSUMO",
+    ]
+    total = 0.0
+    for _ in range(movimientos):
+        fecha = hoy - timedelta(days=rng.randint(10, 40))
+        monto = round(math.exp(rng.gauss(9.5, 1.0)), 2)
+        total += monto
+        cuotas = f" {rng.randint(1, 6):02d}/06" if rng.random() < 0.2 else ""
+        entero, decimales = f"{monto:.2f}".split(".")
+        monto_ar = f"{int(entero):,}".replace(",", ".") + "," + decimales
+        lineas.append(f"{fecha_pdf(fecha)} {rng.choice(COMERCIOS)}{cuotas} {rng.randrange(10000, 99999)} {monto_ar}")
+    lineas.append("SUBTOTAL")
+
+    def formato(valor: float) -> str:
+        entero, decimales = f"{valor:.2f}".split(".")
+        return f"{int(entero):,}".replace(",", ".") + "," + decimales
+
+    y = alto - 40
+    for linea in lineas:
+        hoja.drawString(40, y, linea.format(total=formato(total), minimo=formato(total * 0.05)))
+        y -= 14
+        if y < 40:
+            hoja.showPage()
+            y = alto - 40
+    for numero in range(paginas_legales):
+        hoja.showPage()
+        y = alto - 40
+        hoja.drawString(40, y, f"CONDICIONES GENERALES - HOJA {numero + 1}")
+        while y > 60:
+            y -= 12
+            hoja.drawString(40, y, " ".join(rng.choice(PALABRAS_LEGALES) for _ in range(14)))
+    hoja.save()
+    if destino is None:
+        return salida.getvalue()
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera una base de datos sintética determinística")
+    parser.add_argument("--base", default="sqlite:///sinteticos.db", help="URL de la base (debe estar vacía)")
+    parser.add_argument("--filas", type=int, default=10000, help="Gastos + ingresos a generar")
+    parser.add_argument("--anios", type=int, default=5, help="Años de historia")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--hoy", type=date.fromisoformat, default=None, help="Fecha de referencia (YYYY-MM-DD)")
+    parser.add_argument("--pdf", help="En lugar de la base, genera un resumen de tarjeta en este PDF")
+    parser.add_argument("--movimientos", type=int, default=60, help="Movimientos del PDF")
+    parser.add_argument("--paginas-legales", type=int, default=0, help="Páginas de condiciones al final del PDF")
+    args = parser.parse_args()
+
+    if args.pdf:
+        generar_liquidacion_pdf(args.movimientos, args.semilla, args.hoy, args.pdf, args.paginas_legales)
+        print(f"PDF con {args.movimientos} movimientos en {args.pdf}")
+        return
+
+    from database import crear_engine, preparar_esquema
+    engine = crear_engine(args.base)
+    preparar_esquema(engine)
+    inicio = time.perf_counter()
+    with sessionmaker(bind=engine, autoflush=False)() as db:
+        cantidades = generar(db, args.filas, args.semilla, args.anios, args.hoy)
+    for tabla, cantidad in cantidades.items():
+        print(f"  {tabla:<26} {cantidad:>10,}")
+    print(f"{sum(cantidades.values()):,} filas en {time.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Group commit para las altas individuales de gastos e ingresos
+(FINANZAS_ESCRITURA_AGRUPADA=1).
+
+Cada POST deja su fila en una cola y espera; una única tarea escritora junta
+lo que llegó durante unos milisegundos y lo inserta en una sola transacción
+(mismo camino que /bulk), y después resuelve el futuro de cada request con su
+fila. Las consultas del lote se reparten entre las mediciones de sus
+requests (metricas.repartir), que corren en otra tarea. Con muchas altas concurrentes se paga un commit (y un fsync) por lote en
+lugar de uno por request, y los requests no compiten por el lock de escritura
+de SQLite.
+"""
+from fastapi import APIRouter
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import os
+
+from database import SessionLocal
+import models
+import schemas
+import anomalias
+import acumulados
+import lotes
+import metricas
+import serializacion
+
+ACTIVA = os.environ.get("FINANZAS_ESCRITURA_AGRUPADA", "0").lower() in ("1", "true", "si", "sí")
+# Tiempo que espera la escritora a que se sumen más filas antes de confirmar
+VENTANA_MS = float(os.environ.get("FINANZAS_ESCRITURA_VENTANA_MS", "2"))
+MAXIMO_LOTE = 500
+
+# tipo -> (modelo, schema de respuesta, schema del lote, origen de acumulados, hook de estadísticas)
+TIPOS = {
+    "gasto": (models.Gasto, schemas.Gasto, schemas.GastosLote, acumulados.ORIGEN_GASTO, anomalias.registrar_gastos),
+    "ingreso": (models.Ingreso, schemas.Ingreso, schemas.IngresosLote, acumulados.ORIGEN_INGRESO, None),
+}
+
+# (tipo, fila, futuro, medición del request que la encoló)
+Pendiente = Tuple[str, object, asyncio.Future, Optional[metricas.Medicion]]
+
+
+def _insertar(db, tipo: str, filas: List) -> List[Dict]:
+    modelo, schema, lote, origen, al_registrar = TIPOS[tipo]
+    return lotes.aplicar(db, modelo, schema, origen, lote(crear=filas), al_registrar=al_registrar)["creados"]
+
+
+def _aplicar(pendientes: List[Pendiente]) -> List:
+    """Inserta el lote en una transacción; si falla, reintenta fila por fila para aislar el error"""
+    por_tipo: Dict[str, List[int]] = {}
+    for i, (tipo, *_) in enumerate(pendientes):
+        por_tipo.setdefault(tipo, []).append(i)
+    resultados: List = [None] * len(pendientes)
+    try:
+        with SessionLocal() as db:
+            for tipo, indices in por_tipo.items():
+                creados = _insertar(db, tipo, [pendientes[i][1] for i in indices])
+                for i, creado in zip(indices, creados):
+                    resultados[i] = creado
+            db.commit()
+        return resultados
+    except Exception:
+        if len(pendientes) == 1:
+            raise
+    for i, (tipo, fila, *_) in enumerate(pendientes):
+        try:
+            with SessionLocal() as db:
+                resultados[i] = _insertar(db, tipo, [fila])[0]
+                db.commit()
+        except Exception as e:
+            resultados[i] = e
+    return resultados
+
+
+def _aplicar_medido(pendientes: List[Pendiente]) -> List:
+    """_aplicar con su propia medición, repartida después entre los requests del lote"""
+    medicion, token = metricas.iniciar()
+    try:
+        return _aplicar(pendientes)
+    finally:
+        metricas.cerrar(token)
+        metricas.repartir(medicion, [pendiente[3] for pendiente in pendientes])
+
+
+class EscritorAgrupado:
+    def __init__(self):
+        self._cola: asyncio.Queue = None
+        self._tarea: asyncio.Task = None
+        self._loop = None
+
+    def _asegurar_iniciado(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._tarea is None or self._tarea.done():
+            self._loop = loop
+            self._cola = asyncio.Queue()
+            self._tarea = loop.create_task(self._escribir())
+
+    async def insertar(self, tipo: str, fila) -> Dict:
+        """Encola la fila y espera a que se confirme el lote que la contiene"""
+        self._asegurar_iniciado()
+        futuro = self._loop.create_future()
+        self._cola.put_nowait((tipo, fila, futuro, metricas.actual()))
+        return await futuro
+
+    async def _escribir(self):
+        while True:
+            pendientes = [await self._cola.get()]
+            await asyncio.sleep(VENTANA_MS / 1000)
+            while len(pendientes) < MAXIMO_LOTE and not self._cola.empty():
+                pendientes.append(self._cola.get_nowait())
+            try:
+                resultados = await self._loop.run_in_executor(None, _aplicar_medido, pendientes)
+            except Exception as e:
+                resultados = [e] * len(pendientes)
+            for (_, _, futuro, _), resultado in zip(pendientes, resultados):
+                if futuro.done():
+                    continue
+                if isinstance(resultado, Exception):
+                    futuro.set_exception(resultado)
+                else:
+                    futuro.set_result(resultado)
+
+
+escritor = EscritorAgrupado()
+router = APIRouter()
+
+
+@router.post("/api/ingresos", response_model=schemas.Ingreso)
+async def create_ingreso(ingreso: schemas.IngresoCreate):
+    return serializacion.ORJSONResponse(await escritor.insertar("ingreso", ingreso))
+
+
+@router.post("/api/gastos", response_model=schemas.Gasto)
+async def create_gasto(gasto: schemas.GastoCreate):
+    return serializacion.ORJSONResponse(await escritor.insertar("gasto", gasto))
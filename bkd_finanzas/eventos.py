@@ -0,0 +1,197 @@
+"""
+Eventos en tiempo real para la UI (Server-Sent Events en /api/eventos).
+
+Un pub/sub en memoria reparte a cada cliente conectado:
+- "estado": al conectarse, las alertas actuales y los saldos de las tarjetas
+- "alertas": diferencias contra las últimas alertas (nuevas, modificadas, resueltas);
+  una alerta se identifica por (tipo, titulo)
+- "saldo_tarjeta": cambio de saldo de una tarjeta
+- "importacion": una liquidación terminó de importarse (por la API, la CLI o la
+  bandeja de entrada: se detecta por las filas nuevas de liquidaciones_importadas)
+
+Las alertas y saldos se recalculan solo cuando cambia alguna tabla (aviso de
+versiones.py, también para escrituras de otros workers) y hay clientes
+conectados, agrupando las escrituras de DEMORA_MS; sin clientes no hay
+ninguna consulta extra.
+"""
+from sqlalchemy import func, select
+from typing import Dict, Optional, Set, Tuple
+import asyncio
+import itertools
+import os
+import threading
+import orjson
+
+from database import SessionLectura
+import models
+import alerts
+import versiones
+
+DEMORA_MS = float(os.environ.get("FINANZAS_EVENTOS_DEMORA_MS", "500"))
+# Eventos pendientes por cliente (si no los consume, se descartan los más viejos)
+MAXIMO_PENDIENTES = 100
+# Cada cuánto se revisan escrituras de otros workers y se manda un comentario keep-alive
+INTERVALO_S = 1.0
+LATIDO_S = 15.0
+
+Evento = Tuple[str, object]
+
+
+class Bus:
+    """Pub/sub en memoria; publicar() se puede llamar desde cualquier hilo"""
+
+    def __init__(self):
+        self._clientes: Dict[asyncio.Queue, asyncio.AbstractEventLoop] = {}
+        self._lock = threading.Lock()
+
+    def suscribir(self) -> asyncio.Queue:
+        cola = asyncio.Queue(maxsize=MAXIMO_PENDIENTES)
+        with self._lock:
+            self._clientes[cola] = asyncio.get_running_loop()
+        return cola
+
+    def desuscribir(self, cola: asyncio.Queue):
+        with self._lock:
+            self._clientes.pop(cola, None)
+
+    def hay_clientes(self) -> bool:
+        return bool(self._clientes)
+
+    def loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        with self._lock:
+            return next(iter(self._clientes.values()), None)
+
+    def publicar(self, tipo: str, datos):
+        with self._lock:
+            clientes = list(self._clientes.items())
+        for cola, loop in clientes:
+            loop.call_soon_threadsafe(self._entregar, cola, (tipo, datos))
+
+    @staticmethod
+    def _entregar(cola: asyncio.Queue, evento: Evento):
+        if cola.full():
+            cola.get_nowait()
+        cola.put_nowait(evento)
+
+
+def _clave_alerta(alerta: Dict) -> Tuple[str, str]:
+    return (alerta.get("tipo", ""), alerta.get("titulo", ""))
+
+
+class Monitor:
+    """Última foto de alertas y saldos; publica las diferencias cuando cambian los datos"""
+
+    def __init__(self, bus: Bus):
+        self.bus = bus
+        self._alertas: Optional[Dict[Tuple[str, str], Dict]] = None
+        self._saldos: Optional[Dict[int, Dict]] = None
+        self._ultima_liquidacion: Optional[int] = None
+        self._lock = threading.Lock()
+        self._tablas_pendientes: Set[str] = set()
+        self._tarea: Optional[asyncio.Task] = None
+
+    def _leer_saldos(self, db) -> Dict[int, Dict]:
+        tarjetas = db.query(
+            models.TarjetaCredito.id, models.TarjetaCredito.nombre,
+            models.TarjetaCredito.moneda, models.TarjetaCredito.saldo_actual
+        ).all()
+        return {t.id: {"tarjeta_id": t.id, "nombre": t.nombre, "moneda": t.moneda, "saldo_actual": t.saldo_actual} for t in tarjetas}
+
+    def _publicar_importaciones(self, db, tablas: Optional[Set[str]]):
+        """Publica las liquidaciones registradas desde la última foto (la primera vez solo la toma)"""
+        if self._ultima_liquidacion is None or tablas is None:
+            self._ultima_liquidacion = db.scalar(select(func.max(models.LiquidacionImportada.id))) or 0
+            return
+        if models.LiquidacionImportada.__tablename__ not in tablas:
+            return
+        nuevas = db.scalars(
+            select(models.LiquidacionImportada)
+            .where(models.LiquidacionImportada.id > self._ultima_liquidacion)
+            .order_by(models.LiquidacionImportada.id)
+        ).all()
+        for liquidacion in nuevas:
+            self.bus.publicar("importacion", {
+                "tarjeta_id": liquidacion.tarjeta_id,
+                "archivo": liquidacion.archivo,
+                "fecha_liquidacion": liquidacion.fecha_liquidacion,
+                "gastos_creados": liquidacion.gastos,
+                "monto_total": liquidacion.monto_total,
+            })
+            self._ultima_liquidacion = liquidacion.id
+
+    def actualizar(self, tablas: Optional[Set[str]] = None) -> Dict:
+        """Recalcula (todo si `tablas` es None), publica las diferencias y devuelve la foto actual"""
+        with self._lock, SessionLectura() as db:
+            self._publicar_importaciones(db, tablas)
+            if tablas is None or self._saldos is None or models.TarjetaCredito.__tablename__ in tablas:
+                saldos = self._leer_saldos(db)
+                if self._saldos is not None:
+                    for tarjeta_id, actual in saldos.items():
+                        anterior = self._saldos.get(tarjeta_id)
+                        if anterior is None or anterior["saldo_actual"] != actual["saldo_actual"]:
+                            self.bus.publicar("saldo_tarjeta", {
+                                **actual, "saldo_anterior": anterior["saldo_actual"] if anterior else None
+                            })
+                self._saldos = saldos
+
+            actuales = {_clave_alerta(a): a for a in alerts.obtener_alertas(db)}
+            if self._alertas is not None:
+                diferencias = {
+                    "nuevas": [a for clave, a in actuales.items() if clave not in self._alertas],
+                    "modificadas": [a for clave, a in actuales.items() if clave in self._alertas and self._alertas[clave] != a],
+                    "resueltas": [{"tipo": t, "titulo": titulo} for t, titulo in self._alertas if (t, titulo) not in actuales],
+                }
+                if any(diferencias.values()):
+                    self.bus.publicar("alertas", diferencias)
+            self._alertas = actuales
+
+            return {"alertas": list(actuales.values()), "tarjetas": list(self._saldos.values())}
+
+    def al_cambiar(self, tablas: Set[str]):
+        """Aviso de versiones.py (desde el hilo que confirmó): agenda un recálculo si hay clientes"""
+        loop = self.bus.loop()
+        if loop is not None:
+            loop.call_soon_threadsafe(self._agendar, tablas)
+
+    def _agendar(self, tablas: Set[str]):
+        self._tablas_pendientes |= tablas
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.get_running_loop().create_task(self._recalcular())
+
+    async def _recalcular(self):
+        await asyncio.sleep(DEMORA_MS / 1000)
+        tablas, self._tablas_pendientes = self._tablas_pendientes, set()
+        await asyncio.get_running_loop().run_in_executor(None, self.actualizar, tablas)
+
+
+bus = Bus()
+monitor = Monitor(bus)
+versiones.al_cambiar(monitor.al_cambiar)
+_ids = itertools.count(1)
+
+
+def formatear(tipo: str, datos) -> bytes:
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (next(_ids), tipo.encode(), orjson.dumps(datos, option=orjson.OPT_NON_STR_KEYS))
+
+
+async def flujo(request):
+    """Generador del stream SSE de un cliente"""
+    cola = bus.suscribir()
+    loop = asyncio.get_running_loop()
+    try:
+        yield formatear("estado", await loop.run_in_executor(None, monitor.actualizar, None))
+        espera = 0.0
+        while not await request.is_disconnected():
+            try:
+                tipo, datos = await asyncio.wait_for(cola.get(), INTERVALO_S)
+            except asyncio.TimeoutError:
+                # Escrituras de otros workers (O(1) si no hubo ninguna)
+                versiones.revalidar()
+                espera += INTERVALO_S
+                if espera >= LATIDO_S:
+                    espera = 0.0
+                    yield b": latido\n\n"
+                continue
+            yield formatear(tipo, datos)
+    finally:
+        bus.desuscribir(cola)
@@ -0,0 +1,199 @@
+"""
+Línea de comandos del backend (trabaja directo sobre la base, sin pasar por la API).
+
+import procesa liquidaciones de tarjeta en PDF: acepta archivos, directorios
+y patrones glob, parsea los PDFs en un pool de procesos y escribe todo en
+una sola transacción con importacion.importar(). Los PDFs ya importados
+(mismo contenido) se omiten, así que se puede correr las veces que haga
+falta sobre la misma carpeta. Con --dry-run hace todo y al final deshace la
+transacción.
+
+bandeja vigila un directorio (p. ej. el de descargas) e importa cada PDF que
+aparece, moviéndolo a procesados/ o fallidos/ (ver bandeja.py).
+
+tarjetas lista las tarjetas con su saldo; con --consolidar une las tarjetas
+repetidas del mismo banco en la de mayor saldo.
+
+Uso:
+    python finanzas.py import ~/Descargas/Resumen*.pdf
+    python finanzas.py import resumenes/ --dry-run
+    python finanzas.py import resumenes/ "otros/**/*.pdf" --tarjeta 3 --procesos 4
+    python finanzas.py bandeja ~/Descargas/resumenes
+    python finanzas.py bandeja ~/Descargas/resumenes --procesos 4 --espera 5 --sondeo
+    python finanzas.py tarjetas
+    python finanzas.py tarjetas --consolidar
+"""
+import argparse
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List
+
+import importacion
+
+
+def _parsear_todos(rutas: List[str], procesos: int) -> List[Dict]:
+    """Parsea los PDFs (en paralelo si hay más de uno) mostrando el avance"""
+    resultados: Dict[str, Dict] = {}
+
+    def avance(resultado: Dict):
+        resultados[resultado["archivo"]] = resultado
+        nombre = os.path.basename(resultado["archivo"])
+        if resultado["error"]:
+            detalle = f"ERROR {resultado['error']}"
+        else:
+            datos = resultado["datos"]
+            detalle = f"{datos.get('banco') or 'banco desconocido'}, {len(datos.get('movimientos', []))} movimientos"
+        print(f"  [{len(resultados)}/{len(rutas)}] {nombre}: {detalle}", flush=True)
+
+    if procesos <= 1 or len(rutas) <= 1:
+        for ruta in rutas:
+            avance(importacion.parsear(ruta))
+    else:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            for futuro in as_completed([pool.submit(importacion.parsear, ruta) for ruta in rutas]):
+                avance(futuro.result())
+    return [resultados[ruta] for ruta in rutas]
+
+
+def comando_import(args) -> int:
+    from database import SessionLocal, preparar_esquema
+
+    rutas = importacion.expandir(args.entradas)
+    if not rutas:
+        print("No se encontraron PDFs")
+        return 1
+    print(f"Procesando {len(rutas)} PDF(s) con {min(args.procesos, len(rutas))} proceso(s)...")
+    inicio = time.perf_counter()
+    parseadas = _parsear_todos(rutas, args.procesos)
+    validas = [p for p in parseadas if not p["error"]]
+    errores = len(parseadas) - len(validas)
+
+    preparar_esquema()
+    with SessionLocal() as db:
+        try:
+            totales = importacion.importar(db, validas, args.tarjeta, not args.sin_crear_tarjetas)
+        except LookupError as e:
+            print(f"Error: {e}")
+            return 1
+        print("\nLiquidaciones:")
+        for liquidacion in validas:
+            nombre = os.path.basename(liquidacion["archivo"])
+            if liquidacion["estado"] == "importada":
+                tarjeta = liquidacion["tarjeta"]
+                print(f"  {nombre}: {len(liquidacion['datos'].get('movimientos', []))} gastos -> "
+                      f"{tarjeta.nombre} (ID {tarjeta.id})")
+            elif liquidacion["estado"] == "duplicada":
+                print(f"  {nombre}: ya importada, se omite")
+            else:
+                print(f"  {nombre}: no se pudo identificar el banco (usar --tarjeta)")
+        if args.dry_run:
+            db.rollback()
+        else:
+            db.commit()
+
+    accion = "Se importarían" if args.dry_run else "Importadas"
+    print(f"\n{accion} {totales['liquidaciones']} liquidación(es): {totales['gastos']} gastos, "
+          f"{totales['pagos']} pagos, {totales['tarjetas_nuevas']} tarjeta(s) nueva(s) "
+          f"en {time.perf_counter() - inicio:.1f} s")
+    if args.dry_run:
+        print("(--dry-run: no se guardó nada)")
+    if errores:
+        print(f"{errores} PDF(s) con errores")
+    return 1 if errores else 0
+
+
+def comando_bandeja(args) -> int:
+    from database import preparar_esquema
+    import bandeja
+
+    preparar_esquema()
+    vigilante = bandeja.Bandeja(
+        args.directorio,
+        args.procesos or bandeja.PROCESOS,
+        bandeja.ESPERA_S if args.espera is None else args.espera,
+        args.tarjeta,
+        args.sondeo,
+    )
+    # Como servicio (systemd, docker) se detiene con SIGTERM
+    signal.signal(signal.SIGTERM, lambda *_: vigilante.detener())
+    try:
+        vigilante.correr(una_vez=args.una_vez)
+    except KeyboardInterrupt:
+        pass
+    contadores = vigilante.contadores
+    print(f"\n{contadores['importados']} importado(s), {contadores['repetidos']} repetido(s), "
+          f"{contadores['fallidos']} fallido(s)")
+    return 1 if contadores["fallidos"] and args.una_vez else 0
+
+
+def comando_tarjetas(args) -> int:
+    from database import SessionLocal, preparar_esquema
+    import models
+
+    preparar_esquema()
+    with SessionLocal() as db:
+        tarjetas = db.query(models.TarjetaCredito).order_by(models.TarjetaCredito.id).all()
+        if args.consolidar:
+            por_banco: Dict[str, List[models.TarjetaCredito]] = {}
+            for tarjeta in tarjetas:
+                por_banco.setdefault((tarjeta.banco or tarjeta.nombre).upper(), []).append(tarjeta)
+            for banco, grupo in por_banco.items():
+                if len(grupo) < 2:
+                    continue
+                principal, *repetidas = sorted(grupo, key=lambda t: t.saldo_actual or 0, reverse=True)
+                ids = [t.id for t in repetidas]
+                print(f"{banco}: se conserva ID {principal.id}, se unen {ids}")
+                # Los pagos y las liquidaciones importadas pasan a la tarjeta que queda
+                for modelo in (models.PagoTarjeta, models.LiquidacionImportada):
+                    db.query(modelo).filter(modelo.tarjeta_id.in_(ids)).update(
+                        {modelo.tarjeta_id: principal.id}, synchronize_session=False
+                    )
+                for tarjeta in repetidas:
+                    db.delete(tarjeta)
+                    tarjetas.remove(tarjeta)
+            db.commit()
+
+        total = 0.0
+        for tarjeta in sorted(tarjetas, key=lambda t: (t.banco or "") + t.nombre):
+            print(f"ID {tarjeta.id}: {tarjeta.nombre} ({tarjeta.banco or 'N/A'}) - Saldo: ${tarjeta.saldo_actual or 0:,.2f}")
+            total += tarjeta.saldo_actual or 0
+        print(f"\nTOTAL A PAGAR: ${total:,.2f}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="finanzas", description="Herramientas de línea de comandos del backend")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    importar = subparsers.add_parser("import", help="Importa liquidaciones de tarjeta en PDF")
+    importar.add_argument("entradas", nargs="+", help="PDFs, directorios o patrones glob")
+    importar.add_argument("--tarjeta", type=int, help="Asociar todas las liquidaciones a esta tarjeta")
+    importar.add_argument("--sin-crear-tarjetas", action="store_true",
+                          help="No crear tarjetas para bancos que no tienen una")
+    importar.add_argument("--procesos", type=int, default=os.cpu_count() or 1, help="Procesos para parsear los PDFs")
+    importar.add_argument("--dry-run", action="store_true", help="Mostrar lo que se importaría sin guardar nada")
+    importar.set_defaults(funcion=comando_import)
+
+    vigilar = subparsers.add_parser("bandeja", help="Vigila un directorio e importa los PDFs que aparecen")
+    vigilar.add_argument("directorio", help="Directorio de entrada (se crean procesados/ y fallidos/ adentro)")
+    vigilar.add_argument("--tarjeta", type=int, help="Asociar todas las liquidaciones a esta tarjeta")
+    vigilar.add_argument("--procesos", type=int, help="Procesos para parsear (FINANZAS_BANDEJA_PROCESOS)")
+    vigilar.add_argument("--espera", type=float,
+                         help="Segundos sin cambios antes de tomar un archivo (FINANZAS_BANDEJA_ESPERA_S)")
+    vigilar.add_argument("--sondeo", action="store_true", help="Revisar el directorio periódicamente en lugar de usar inotify")
+    vigilar.add_argument("--una-vez", action="store_true", help="Procesar lo que haya y terminar")
+    vigilar.set_defaults(funcion=comando_bandeja)
+
+    tarjetas = subparsers.add_parser("tarjetas", help="Lista las tarjetas y sus saldos")
+    tarjetas.add_argument("--consolidar", action="store_true", help="Unir tarjetas repetidas del mismo banco")
+    tarjetas.set_defaults(funcion=comando_tarjetas)
+
+    args = parser.parse_args()
+    sys.exit(args.funcion(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Importación de liquidaciones de tarjeta en lote, dentro del proceso.
+
+parsear() lee un PDF, calcula su hash y lo procesa con pdf_processor; es una
+función de módulo para poder correrla en un pool de procesos. importar()
+escribe en una sola transacción todas las liquidaciones parseadas: omite las
+que ya se importaron (mismo hash), resuelve las tarjetas con una sola
+consulta (creando las que falten) y registra gastos, pagos y saldos con
+registrar(), que es el mismo camino que usa /api/pdf/procesar-liquidacion.
+"""
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+import glob
+import hashlib
+import io
+import os
+import models
+import schemas
+import lotes
+import acumulados
+import anomalias
+import pdf_processor
+# Registra los hooks de sesión: las importaciones de otro proceso también incrementan
+# las versiones de las tablas y el servidor invalida sus ETags y su cache
+import versiones  # noqa: F401
+# y numeran sus filas para /api/sync
+import sincronizacion  # noqa: F401
+
+# Días de cierre y vencimiento de una tarjeta nueva si el PDF no los trae
+CIERRE_POR_DEFECTO = 20
+VENCIMIENTO_POR_DEFECTO = 25
+
+
+def huella(contenido: bytes) -> str:
+    return hashlib.sha256(contenido).hexdigest()
+
+
+def expandir(entradas: Iterable[str]) -> List[str]:
+    """PDFs de una lista de archivos, directorios (recursivo) y patrones glob, sin repetir"""
+    rutas = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            rutas += glob.glob(os.path.join(entrada, "**", "*.pdf"), recursive=True)
+            rutas += glob.glob(os.path.join(entrada, "**", "*.PDF"), recursive=True)
+        elif glob.has_magic(entrada):
+            rutas += [r for r in glob.glob(entrada, recursive=True) if os.path.isfile(r)]
+        else:
+            rutas.append(entrada)
+    vistas = set()
+    unicas = []
+    for ruta in rutas:
+        absoluta = os.path.abspath(ruta)
+        if absoluta not in vistas:
+            vistas.add(absoluta)
+            unicas.append(ruta)
+    return sorted(unicas)
+
+
+def parsear(ruta: str) -> Dict:
+    """Lee y procesa un PDF; los errores quedan en la clave "error" en lugar de propagarse"""
+    resultado = {"archivo": ruta, "hash": None, "datos": None, "error": None}
+    try:
+        with open(ruta, "rb") as archivo:
+            contenido = archivo.read()
+        resultado["hash"] = huella(contenido)
+        resultado["datos"] = pdf_processor.procesar_pdf_liquidacion(io.BytesIO(contenido))
+    except Exception as e:
+        resultado["error"] = str(e)
+    return resultado
+
+
+def _dia(fecha_iso: Optional[str], defecto: int) -> int:
+    return date.fromisoformat(fecha_iso).day if fecha_iso else defecto
+
+
+def _limite_estimado(monto_total: Optional[float]) -> float:
+    monto_total = monto_total or 0
+    if monto_total > 1000000:
+        return 5000000.0
+    if monto_total > 100000:
+        return 1000000.0
+    return 500000.0
+
+
+def resolver_tarjetas(
+    db: Session, liquidaciones: List[Dict], tarjeta_id: Optional[int] = None, crear: bool = True
+) -> Tuple[Dict[str, models.TarjetaCredito], List[models.TarjetaCredito]]:
+    """Tarjeta de cada liquidación (por hash) y tarjetas creadas, con una sola consulta de tarjetas.
+
+    Con `tarjeta_id` todas van a esa tarjeta. Las tarjetas que no existen se
+    crean una vez por banco (si `crear`); las liquidaciones sin banco
+    identificado quedan sin tarjeta. Se buscan por banco o nombre.
+    """
+    if tarjeta_id is not None:
+        tarjeta = db.get(models.TarjetaCredito, tarjeta_id)
+        if tarjeta is None:
+            raise LookupError(f"No existe la tarjeta {tarjeta_id}")
+        return {liquidacion["hash"]: tarjeta for liquidacion in liquidaciones}, []
+
+    por_clave = {}
+    for tarjeta in db.scalars(select(models.TarjetaCredito).order_by(models.TarjetaCredito.id)):
+        for clave in (tarjeta.banco, tarjeta.nombre):
+            if clave:
+                por_clave.setdefault(clave.upper(), tarjeta)
+
+    asignadas = {}
+    creadas = []
+    for liquidacion in liquidaciones:
+        datos = liquidacion["datos"]
+        banco = datos.get("banco")
+        if not banco:
+            continue
+        tarjeta = por_clave.get(banco.upper())
+        if tarjeta is None and crear:
+            tarjeta = models.TarjetaCredito(
+                nombre=banco,
+                banco=banco,
+                limite=_limite_estimado(datos.get("monto_total")),
+                moneda=models.TipoMoneda.PESOS,
+                fecha_cierre=_dia(datos.get("fecha_cierre"), CIERRE_POR_DEFECTO),
+                fecha_vencimiento=_dia(datos.get("fecha_vencimiento"), VENCIMIENTO_POR_DEFECTO),
+                saldo_actual=0.0,
+            )
+            db.add(tarjeta)
+            creadas.append(tarjeta)
+            por_clave[banco.upper()] = tarjeta
+        if tarjeta is not None:
+            asignadas[liquidacion["hash"]] = tarjeta
+    db.flush()
+    return asignadas, creadas
+
+
+def registrar(db: Session, liquidaciones: List[Tuple[models.TarjetaCredito, Dict]]) -> Dict[str, int]:
+    """Escribe liquidaciones ya procesadas sin confirmar la transacción.
+
+    Los movimientos de todas se insertan como gastos con lotes.aplicar (por
+    tandas de lotes.MAXIMO_FILAS, con anomalías y acumulados en lote), se
+    registra un pago por liquidación con fecha y cada tarjeta queda con el
+    saldo de su liquidación más reciente.
+    """
+    gastos = [
+        schemas.GastoCreate(
+            fecha=movimiento["fecha"],
+            monto=movimiento["monto"],
+            moneda=tarjeta.moneda,
+            tipo=models.TipoGasto.ORDINARIO,
+            descripcion=movimiento.get("descripcion", "Compra en tarjeta"),
+        )
+        for tarjeta, datos in liquidaciones
+        for movimiento in datos.get("movimientos", [])
+    ]
+    creados = 0
+    for inicio in range(0, len(gastos), lotes.MAXIMO_FILAS):
+        lote = schemas.GastosLote(crear=gastos[inicio:inicio + lotes.MAXIMO_FILAS])
+        resultado = lotes.aplicar(
+            db, models.Gasto, schemas.Gasto, acumulados.ORIGEN_GASTO, lote,
+            al_registrar=anomalias.registrar_gastos
+        )
+        creados += len(resultado["creados"])
+
+    pagos = [
+        models.PagoTarjeta(
+            tarjeta_id=tarjeta.id,
+            fecha_pago=date.fromisoformat(datos["fecha_liquidacion"]),
+            monto=datos.get("monto_total", 0),
+            descripcion="Liquidación procesada automáticamente",
+        )
+        for tarjeta, datos in liquidaciones if datos.get("fecha_liquidacion")
+    ]
+    db.add_all(pagos)
+    acumulados.registrar_varios(db, acumulados.ORIGEN_PAGO_TARJETA, pagos)
+
+    # Sin fecha cuenta como la más vieja; entre iguales gana la última de la lista
+    for tarjeta, datos in sorted(liquidaciones, key=lambda par: par[1].get("fecha_liquidacion") or ""):
+        if datos.get("monto_total"):
+            tarjeta.saldo_actual = datos["monto_total"]
+    return {"gastos": creados, "pagos": len(pagos)}
+
+
+def importar(
+    db: Session, liquidaciones: List[Dict], tarjeta_id: Optional[int] = None, crear_tarjetas: bool = True
+) -> Dict[str, int]:
+    """Importa las liquidaciones parseadas (sin error) en la transacción de `db`, sin confirmarla.
+
+    Cada liquidación recibe "estado" (importada, duplicada o sin_tarjeta) y,
+    si se importa, "tarjeta". Devuelve los totales.
+    """
+    hashes = {liquidacion["hash"] for liquidacion in liquidaciones}
+    importadas = set(db.scalars(
+        select(models.LiquidacionImportada.hash).where(models.LiquidacionImportada.hash.in_(hashes))
+    )) if hashes else set()
+
+    nuevas = []
+    for liquidacion in liquidaciones:
+        if liquidacion["hash"] in importadas:
+            liquidacion["estado"] = "duplicada"
+            continue
+        importadas.add(liquidacion["hash"])
+        nuevas.append(liquidacion)
+
+    tarjetas, creadas = resolver_tarjetas(db, nuevas, tarjeta_id, crear_tarjetas)
+    pares = []
+    for liquidacion in nuevas:
+        tarjeta = tarjetas.get(liquidacion["hash"])
+        if tarjeta is None:
+            liquidacion["estado"] = "sin_tarjeta"
+            continue
+        liquidacion["estado"] = "importada"
+        liquidacion["tarjeta"] = tarjeta
+        pares.append((tarjeta, liquidacion["datos"]))
+
+    totales = registrar(db, pares)
+    db.add_all([
+        models.LiquidacionImportada(
+            hash=liquidacion["hash"],
+            archivo=os.path.basename(liquidacion["archivo"]),
+            tarjeta_id=liquidacion["tarjeta"].id,
+            fecha_liquidacion=date.fromisoformat(liquidacion["datos"]["fecha_liquidacion"])
+            if liquidacion["datos"].get("fecha_liquidacion") else None,
+            gastos=len(liquidacion["datos"].get("movimientos", [])),
+            monto_total=liquidacion["datos"].get("monto_total"),
+        )
+        for liquidacion in nuevas if liquidacion["estado"] == "importada"
+    ])
+    return {"liquidaciones": len(pares), "tarjetas_nuevas": len(creadas), **totales}
@@ -0,0 +1,121 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import delete, insert
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import csv
+import os
+import models
+import versiones
+from cotizaciones import parsear_numero
+
+# CSV con la serie mensual del IPC (columnas periodo,valor; periodo en formato YYYY-MM)
+ARCHIVO_IPC = os.environ.get(
+    "FINANZAS_IPC_ARCHIVO",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "datos", "ipc.csv")
+)
+
+# Deflactores ya calculados, (periodo_base, periodo) -> factor, válidos para la versión
+# de indice_precios en _version_cache (si otro worker recarga el IPC, la versión avanza
+# al revalidar y el cache se descarta). Los períodos sin IPC no se guardan.
+MAXIMO_DEFLACTORES = 10000
+_deflactores: Dict[Tuple[str, str], float] = {}
+_version_cache: Optional[Tuple[int, ...]] = None
+
+
+def invalidar_cache():
+    """Descarta los deflactores calculados (llamar después de recargar el IPC)"""
+    global _version_cache
+    _deflactores.clear()
+    _version_cache = None
+
+
+def _normalizar_periodo(valor: str) -> str:
+    """Acepta YYYY-MM, YYYY-MM-DD o MM/YYYY y devuelve YYYY-MM"""
+    valor = valor.strip()
+    if "/" in valor:
+        mes, ano = valor.split("/")[-2:]
+        return f"{int(ano):04d}-{int(mes):02d}"
+    ano, mes = valor.split("-")[:2]
+    return f"{int(ano):04d}-{int(mes):02d}"
+
+
+def cargar_csv(db: Session, ruta: Optional[str] = None) -> int:
+    """Carga la serie del IPC desde un CSV local, reemplazando los períodos presentes"""
+    ruta = ruta or ARCHIVO_IPC
+    filas = {}
+    with open(ruta, newline="", encoding="utf-8") as archivo:
+        for registro in csv.DictReader(archivo):
+            registro = {k.strip().lower(): v for k, v in registro.items() if k}
+            valor = parsear_numero(registro.get("valor") or registro.get("indice"))
+            if not valor:
+                continue
+            periodo = _normalizar_periodo(registro.get("periodo") or registro["fecha"])
+            filas[periodo] = {"periodo": periodo, "valor": valor, "created_at": date.today()}
+
+    if filas:
+        db.execute(delete(models.IndicePrecios).where(
+            models.IndicePrecios.periodo.in_(list(filas))
+        ))
+        db.execute(insert(models.IndicePrecios), list(filas.values()))
+    db.commit()
+    invalidar_cache()
+    return len(filas)
+
+
+def deflactores(db: Session, base: str, periodos: Iterable[str]) -> Dict[str, Optional[float]]:
+    """Factores para expresar montos de cada período en pesos del período base.
+
+    Los pares (base, período) ya calculados salen del cache; el resto se
+    resuelve con una sola consulta indexada por período.
+    """
+    global _version_cache
+    version = versiones.versiones_de((models.IndicePrecios.__tablename__,))
+    if version != _version_cache or len(_deflactores) > MAXIMO_DEFLACTORES:
+        _deflactores.clear()
+        _version_cache = version
+
+    periodos = set(periodos)
+    resultado = {p: _deflactores.get((base, p)) for p in periodos}
+    faltantes = [p for p, factor in resultado.items() if factor is None]
+    if faltantes:
+        indices = dict(db.query(models.IndicePrecios.periodo, models.IndicePrecios.valor).filter(
+            models.IndicePrecios.periodo.in_(faltantes + [base])
+        ).all())
+        indice_base = indices.get(base)
+        for periodo in faltantes:
+            indice = indices.get(periodo)
+            if indice_base and indice:
+                resultado[periodo] = _deflactores[(base, periodo)] = indice_base / indice
+    return resultado
+
+
+def deflactar_serie(
+    db: Session,
+    serie: List[Dict],
+    base: Optional[str] = None,
+    campos: Sequence[str] = ("total",),
+    clave: str = "mes"
+) -> List[Dict]:
+    """Reexpresa una serie mensual agregada en términos reales (pesos del período base).
+
+    Cada elemento debe tener `clave` con el período "YYYY-MM". Si no se indica
+    base se usa el período más reciente de la serie. Los períodos sin IPC
+    quedan en valores nominales con "ajustado": False.
+    """
+    if not serie:
+        return []
+    base = base or max(item[clave] for item in serie)
+    factores = deflactores(db, base, (item[clave] for item in serie))
+
+    resultado = []
+    for item in serie:
+        factor = factores.get(item[clave])
+        nuevo = dict(item)
+        if factor is not None:
+            for campo in campos:
+                if nuevo.get(campo) is not None:
+                    nuevo[campo] = nuevo[campo] * factor
+        nuevo["ajustado"] = factor is not None
+        nuevo["base"] = base
+        resultado.append(nuevo)
+    return resultado
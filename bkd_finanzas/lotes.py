@@ -0,0 +1,90 @@
+"""
+Altas, modificaciones y bajas en lote (gastos e ingresos).
+
+El lote entero se valida antes de escribir y se aplica en una sola
+transacción: un INSERT ... RETURNING (executemany), un UPDATE por clave
+primaria (executemany) y un DELETE ... IN. Las filas modificadas se arman con
+los valores leídos al validar más los cambios, sin volver a consultarlas.
+"""
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+import acumulados
+import serializacion
+
+# Filas por lote (el DELETE/SELECT ... IN lleva un parámetro por id)
+MAXIMO_FILAS = 5000
+
+
+class LoteInvalido(ValueError):
+    pass
+
+
+class FilasInexistentes(LookupError):
+    def __init__(self, ids: List[int]):
+        super().__init__(f"No existen los ids: {ids}")
+        self.ids = ids
+
+
+def aplicar(
+    db: Session,
+    modelo,
+    schema,
+    origen: str,
+    lote,
+    al_quitar: Optional[Callable] = None,
+    al_registrar: Optional[Callable] = None
+) -> Dict:
+    """Aplica el lote sin confirmar la transacción y devuelve creados, modificados y eliminados.
+
+    `al_quitar` / `al_registrar` (db, filas) reciben las filas viejas / nuevas,
+    además de ajustar los acumulados mensuales de `origen`.
+    """
+    if len(lote.crear) + len(lote.modificar) + len(lote.eliminar) > MAXIMO_FILAS:
+        raise LoteInvalido(f"El lote supera las {MAXIMO_FILAS} filas")
+    cambios = {m.id: m.model_dump(exclude_unset=True, exclude={"id"}) for m in lote.modificar}
+    if len(cambios) != len(lote.modificar):
+        raise LoteInvalido("Hay ids repetidos en 'modificar'")
+    eliminar = set(lote.eliminar)
+    if eliminar & cambios.keys():
+        raise LoteInvalido("Un mismo id no puede modificarse y eliminarse en el mismo lote")
+
+    campos, consulta = serializacion.consulta_columnas(modelo, schema)
+    ids = cambios.keys() | eliminar
+    viejas = {}
+    if ids:
+        filas = db.execute(consulta.where(modelo.id.in_(ids)))
+        viejas = {fila["id"]: fila for fila in serializacion.a_diccionarios(campos, filas)}
+    faltantes = sorted(ids - viejas.keys())
+    if faltantes:
+        raise FilasInexistentes(faltantes)
+
+    quitadas = [SimpleNamespace(**viejas[i]) for i in ids]
+    acumulados.registrar_varios(db, origen, quitadas, -1)
+    if al_quitar:
+        al_quitar(db, quitadas)
+
+    if eliminar:
+        db.execute(delete(modelo).where(modelo.id.in_(eliminar)))
+    parametros = [{"id": i, **valores} for i, valores in cambios.items() if valores]
+    if parametros:
+        db.execute(update(modelo), parametros)
+    creados = []
+    if lote.crear:
+        # RETURNING solo de lo que genera la base; el resto ya está validado en el lote.
+        # Los id se asignan en el orden de los VALUES pero RETURNING no garantiza ese orden
+        # (pedirlo con sort_by_parameter_order hace que SQLite inserte fila por fila)
+        valores = [c.model_dump() for c in lote.crear]
+        generados = [c for c in campos if c not in valores[0]]
+        filas = db.execute(insert(modelo).returning(*(getattr(modelo, c) for c in generados)), valores)
+        filas = sorted(serializacion.a_diccionarios(generados, filas), key=lambda f: f["id"])
+        creados = [{**v, **f} for v, f in zip(valores, filas)]
+    modificados = [{**viejas[i], **valores} for i, valores in cambios.items()]
+
+    registradas = [SimpleNamespace(**fila) for fila in (*creados, *modificados)]
+    acumulados.registrar_varios(db, origen, registradas)
+    if al_registrar:
+        al_registrar(db, registradas)
+
+    return {"creados": creados, "modificados": modificados, "eliminados": sorted(eliminar)}
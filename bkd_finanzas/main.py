@@ -1,23 +1,113 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Query
-from fastapi.responses import Response
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, select
 from typing import List, Optional
-from datetime import date
-
-from database import SessionLocal, engine, Base
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+import asyncio
+import time
+
+from database import (
+    SessionLocal, SessionLectura, engine, engine_lectura, MODO_ASYNC,
+    CAPACIDAD_ESCRITURA, CAPACIDAD_LECTURA, preparar_esquema
+)
 import models
 import schemas
 import reports
 import alerts
+import amortizacion
+import cotizaciones
+import inflacion
+import anomalias
+import acumulados
 import pdf_processor
 import report_generator
-
-# Crear tablas
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="Finanzas Personales API")
+import importacion
+import serializacion
+import versiones
+import lotes
+import escritura_agrupada
+import sincronizacion
+import cache_resultados
+import eventos
+import metricas
+import consultas_lentas
+import trazas
+
+_inicializado = False
+
+
+def inicializar():
+    """Arranque: esquema (solo si cambió su versión), tablas derivadas, versiones y cache.
+
+    Se llama desde el lifespan de la app, no al importar el módulo.
+    """
+    global _inicializado
+    if _inicializado:
+        return
+    preparar_esquema(engine)
+    with SessionLocal() as db_inicial:
+        acumulados.asegurar_inicializado(db_inicial)
+        anomalias.asegurar_inicializado(db_inicial)
+        amortizacion.generar_faltantes(db_inicial)
+        versiones.identidad(db_inicial)
+        versiones.cargar(db_inicial)
+        sincronizacion.inicializar(db_inicial)
+    versiones.iniciar_monitor(engine_lectura)
+    cache_resultados.cargar()
+    _inicializado = True
+
+
+@asynccontextmanager
+async def ciclo_de_vida(app: FastAPI):
+    inicializar()
+    yield
+
+
+app = FastAPI(title="Finanzas Personales API", lifespan=ciclo_de_vida)
+
+# GET condicional: el cliente revalida con If-None-Match y recibe 304 sin tocar la base
+# si no cambió ninguna tabla de la que depende la ruta (se registra antes que CORS
+# para que los 304 también lleven los encabezados CORS)
+CACHE_CONTROL = "private, no-cache"
+# Rutas cuya respuesta no depende de los datos (no se versionan)
+RUTAS_SIN_ETAG = ("/api/cache/", "/api/eventos", "/api/debug/")
+
+@app.middleware("http")
+async def get_condicional(request: Request, call_next):
+    ruta = request.url.path
+    if request.method != "GET" or not ruta.startswith("/api/") or ruta.startswith(RUTAS_SIN_ETAG):
+        return await call_next(request)
+    # Incorpora las escrituras de otros workers antes de armar el ETag (y de usar el cache)
+    versiones.revalidar()
+    etag = versiones.etag(ruta, request.url.query)
+    if etag in [e.strip() for e in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    response = await call_next(request)
+    if response.status_code == 200:
+        response.headers["ETag"] = etag
+        response.headers.setdefault("Cache-Control", CACHE_CONTROL)
+    return response
+
+# Latencia, consultas SQL, tiempo en la base y filas por ruta (ver metricas.py); se registra
+# después del GET condicional para medir también los 304
+@app.middleware("http")
+async def medir(request: Request, call_next):
+    if request.url.path == "/metrics":
+        return await call_next(request)
+    medicion, token = metricas.iniciar(f"{request.method} {request.url.path}")
+    inicio = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        metricas.cerrar(token)
+    segundos = time.perf_counter() - inicio
+    metricas.registro.observar(request.method, metricas.ruta_de(request), response.status_code, segundos, medicion)
+    response.headers["X-Query-Count"] = str(medicion.consultas)
+    response.headers["Server-Timing"] = metricas.server_timing(segundos, medicion)
+    return response
 
 # CORS
 app.add_middleware(
@@ -26,25 +116,63 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Query-Count", "Server-Timing"],
 )
 
+# Con FINANZAS_ESCRITURA_AGRUPADA=1 las altas individuales de gastos e ingresos se
+# confirman en lotes por una única tarea escritora (group commit)
+if escritura_agrupada.ACTIVA:
+    app.include_router(escritura_agrupada.router)
+
+# Con FINANZAS_DB_ASYNC=1 el CRUD, los reportes JSON y las alertas se sirven con
+# AsyncSession (ver api_async.py); al registrarse antes, esas rutas tienen prioridad
+if MODO_ASYNC:
+    import api_async
+    app.include_router(api_async.router)
+
 # Dependency
-def get_db():
-    db = SessionLocal()
+# Los requests esperan su sesión en el event loop y no dentro del threadpool: como
+# FastAPI serializa la respuesta de los endpoints sync en otro hilo (con la conexión
+# todavía tomada), esperar el pool desde un hilo bloquea a los que ya terminaron
+_cupo_escritura = asyncio.Semaphore(CAPACIDAD_ESCRITURA)
+_cupo_lectura = asyncio.Semaphore(CAPACIDAD_LECTURA)
+
+async def get_db():
+    async with _cupo_escritura:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+async def get_db_lectura():
+    """Sesión del pool de solo lectura (endpoints que no escriben)"""
+    async with _cupo_lectura:
+        db = SessionLectura()
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+def _aplicar_lote(db: Session, modelo, schema, origen: str, lote, **kwargs):
     try:
-        yield db
-    finally:
-        db.close()
+        resultado = lotes.aplicar(db, modelo, schema, origen, lote, **kwargs)
+    except lotes.FilasInexistentes as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except lotes.LoteInvalido as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    db.commit()
+    return serializacion.ORJSONResponse(resultado)
 
 
 # ========== INGRESOS ==========
 @app.get("/api/ingresos", response_model=List[schemas.Ingreso])
-def get_ingresos(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    ingresos = db.query(models.Ingreso).offset(skip).limit(limit).all()
-    return ingresos
+def get_ingresos(skip: int = 0, limit: int = 100, db: Session = Depends(get_db_lectura)):
+    return serializacion.listar(db, models.Ingreso, schemas.Ingreso, lambda q: q.offset(skip).limit(limit))
 
 @app.get("/api/ingresos/{ingreso_id}", response_model=schemas.Ingreso)
-def get_ingreso(ingreso_id: int, db: Session = Depends(get_db)):
+def get_ingreso(ingreso_id: int, db: Session = Depends(get_db_lectura)):
     ingreso = db.query(models.Ingreso).filter(models.Ingreso.id == ingreso_id).first()
     if not ingreso:
         raise HTTPException(status_code=404, detail="Ingreso no encontrado")
@@ -54,6 +182,7 @@ def get_ingreso(ingreso_id: int, db: Session = Depends(get_db)):
 def create_ingreso(ingreso: schemas.IngresoCreate, db: Session = Depends(get_db)):
     db_ingreso = models.Ingreso(**ingreso.model_dump())
     db.add(db_ingreso)
+    acumulados.registrar(db, acumulados.ORIGEN_INGRESO, db_ingreso)
     db.commit()
     db.refresh(db_ingreso)
     return db_ingreso
@@ -64,9 +193,11 @@ def update_ingreso(ingreso_id: int, ingreso: schemas.IngresoUpdate, db: Session
     if not db_ingreso:
         raise HTTPException(status_code=404, detail="Ingreso no encontrado")
     
+    acumulados.quitar(db, acumulados.ORIGEN_INGRESO, db_ingreso)
     update_data = ingreso.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_ingreso, field, value)
+    acumulados.registrar(db, acumulados.ORIGEN_INGRESO, db_ingreso)
     
     db.commit()
     db.refresh(db_ingreso)
@@ -77,19 +208,24 @@ def delete_ingreso(ingreso_id: int, db: Session = Depends(get_db)):
     db_ingreso = db.query(models.Ingreso).filter(models.Ingreso.id == ingreso_id).first()
     if not db_ingreso:
         raise HTTPException(status_code=404, detail="Ingreso no encontrado")
+    acumulados.quitar(db, acumulados.ORIGEN_INGRESO, db_ingreso)
     db.delete(db_ingreso)
     db.commit()
     return {"message": "Ingreso eliminado"}
 
+@app.post("/api/ingresos/bulk", response_model=schemas.IngresosLoteResultado)
+def bulk_ingresos(lote: schemas.IngresosLote, db: Session = Depends(get_db)):
+    """Crea, modifica y elimina ingresos en una sola transacción"""
+    return _aplicar_lote(db, models.Ingreso, schemas.Ingreso, acumulados.ORIGEN_INGRESO, lote)
+
 
 # ========== GASTOS ==========
 @app.get("/api/gastos", response_model=List[schemas.Gasto])
-def get_gastos(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    gastos = db.query(models.Gasto).offset(skip).limit(limit).all()
-    return gastos
+def get_gastos(skip: int = 0, limit: int = 100, db: Session = Depends(get_db_lectura)):
+    return serializacion.listar(db, models.Gasto, schemas.Gasto, lambda q: q.offset(skip).limit(limit))
 
 @app.get("/api/gastos/{gasto_id}", response_model=schemas.Gasto)
-def get_gasto(gasto_id: int, db: Session = Depends(get_db)):
+def get_gasto(gasto_id: int, db: Session = Depends(get_db_lectura)):
     gasto = db.query(models.Gasto).filter(models.Gasto.id == gasto_id).first()
     if not gasto:
         raise HTTPException(status_code=404, detail="Gasto no encontrado")
@@ -99,6 +235,9 @@ def get_gasto(gasto_id: int, db: Session = Depends(get_db)):
 def create_gasto(gasto: schemas.GastoCreate, db: Session = Depends(get_db)):
     db_gasto = models.Gasto(**gasto.model_dump())
     db.add(db_gasto)
+    db.flush()
+    anomalias.registrar_gasto(db, db_gasto)
+    acumulados.registrar(db, acumulados.ORIGEN_GASTO, db_gasto)
     db.commit()
     db.refresh(db_gasto)
     return db_gasto
@@ -109,9 +248,13 @@ def update_gasto(gasto_id: int, gasto: schemas.GastoUpdate, db: Session = Depend
     if not db_gasto:
         raise HTTPException(status_code=404, detail="Gasto no encontrado")
     
+    anomalias.quitar_gasto(db, db_gasto)
+    acumulados.quitar(db, acumulados.ORIGEN_GASTO, db_gasto)
     update_data = gasto.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_gasto, field, value)
+    anomalias.registrar_gasto(db, db_gasto)
+    acumulados.registrar(db, acumulados.ORIGEN_GASTO, db_gasto)
     
     db.commit()
     db.refresh(db_gasto)
@@ -122,19 +265,28 @@ def delete_gasto(gasto_id: int, db: Session = Depends(get_db)):
     db_gasto = db.query(models.Gasto).filter(models.Gasto.id == gasto_id).first()
     if not db_gasto:
         raise HTTPException(status_code=404, detail="Gasto no encontrado")
+    anomalias.quitar_gasto(db, db_gasto)
+    acumulados.quitar(db, acumulados.ORIGEN_GASTO, db_gasto)
     db.delete(db_gasto)
     db.commit()
     return {"message": "Gasto eliminado"}
 
+@app.post("/api/gastos/bulk", response_model=schemas.GastosLoteResultado)
+def bulk_gastos(lote: schemas.GastosLote, db: Session = Depends(get_db)):
+    """Crea, modifica y elimina gastos en una sola transacción"""
+    return _aplicar_lote(
+        db, models.Gasto, schemas.Gasto, acumulados.ORIGEN_GASTO, lote,
+        al_quitar=anomalias.quitar_gastos, al_registrar=anomalias.registrar_gastos
+    )
+
 
 # ========== TARJETAS ==========
 @app.get("/api/tarjetas", response_model=List[schemas.TarjetaCredito])
-def get_tarjetas(db: Session = Depends(get_db)):
-    tarjetas = db.query(models.TarjetaCredito).all()
-    return tarjetas
+def get_tarjetas(db: Session = Depends(get_db_lectura)):
+    return serializacion.listar(db, models.TarjetaCredito, schemas.TarjetaCredito)
 
 @app.get("/api/tarjetas/{tarjeta_id}", response_model=schemas.TarjetaCredito)
-def get_tarjeta(tarjeta_id: int, db: Session = Depends(get_db)):
+def get_tarjeta(tarjeta_id: int, db: Session = Depends(get_db_lectura)):
     tarjeta = db.query(models.TarjetaCredito).filter(models.TarjetaCredito.id == tarjeta_id).first()
     if not tarjeta:
         raise HTTPException(status_code=404, detail="Tarjeta no encontrada")
@@ -174,12 +326,11 @@ def delete_tarjeta(tarjeta_id: int, db: Session = Depends(get_db)):
 
 # ========== PRESTAMOS ==========
 @app.get("/api/prestamos", response_model=List[schemas.Prestamo])
-def get_prestamos(db: Session = Depends(get_db)):
-    prestamos = db.query(models.Prestamo).all()
-    return prestamos
+def get_prestamos(db: Session = Depends(get_db_lectura)):
+    return serializacion.listar(db, models.Prestamo, schemas.Prestamo)
 
 @app.get("/api/prestamos/{prestamo_id}", response_model=schemas.Prestamo)
-def get_prestamo(prestamo_id: int, db: Session = Depends(get_db)):
+def get_prestamo(prestamo_id: int, db: Session = Depends(get_db_lectura)):
     prestamo = db.query(models.Prestamo).filter(models.Prestamo.id == prestamo_id).first()
     if not prestamo:
         raise HTTPException(status_code=404, detail="Préstamo no encontrado")
@@ -189,6 +340,8 @@ def get_prestamo(prestamo_id: int, db: Session = Depends(get_db)):
 def create_prestamo(prestamo: schemas.PrestamoCreate, db: Session = Depends(get_db)):
     db_prestamo = models.Prestamo(**prestamo.model_dump())
     db.add(db_prestamo)
+    db.flush()
+    amortizacion.generar_cronograma(db, db_prestamo)
     db.commit()
     db.refresh(db_prestamo)
     return db_prestamo
@@ -203,6 +356,10 @@ def update_prestamo(prestamo_id: int, prestamo: schemas.PrestamoUpdate, db: Sess
     for field, value in update_data.items():
         setattr(db_prestamo, field, value)
     
+    # Si cambian las condiciones o lo pagado, recalcular solo las cuotas impagas
+    if amortizacion.CAMPOS_CRONOGRAMA.intersection(update_data) or "monto_pagado" in update_data:
+        amortizacion.regenerar_pendientes(db, db_prestamo)
+    
     db.commit()
     db.refresh(db_prestamo)
     return db_prestamo
@@ -212,13 +369,16 @@ def delete_prestamo(prestamo_id: int, db: Session = Depends(get_db)):
     db_prestamo = db.query(models.Prestamo).filter(models.Prestamo.id == prestamo_id).first()
     if not db_prestamo:
         raise HTTPException(status_code=404, detail="Préstamo no encontrado")
+    db.query(models.DesgloseCuotaPrestamo).filter(
+        models.DesgloseCuotaPrestamo.prestamo_id == prestamo_id
+    ).delete(synchronize_session=False)
     db.delete(db_prestamo)
     db.commit()
     return {"message": "Préstamo eliminado"}
 
 @app.get("/api/prestamos/{prestamo_id}/desglose-cuota")
-def get_desglose_cuota_prestamo(prestamo_id: int, db: Session = Depends(get_db)):
-    """Calcula el desglose de la próxima cuota de un préstamo"""
+def get_desglose_cuota_prestamo(prestamo_id: int, db: Session = Depends(get_db_lectura)):
+    """Devuelve el desglose de la próxima cuota impaga según el cronograma persistido"""
     prestamo = db.query(models.Prestamo).filter(models.Prestamo.id == prestamo_id).first()
     if not prestamo:
         raise HTTPException(status_code=404, detail="Préstamo no encontrado")
@@ -226,97 +386,70 @@ def get_desglose_cuota_prestamo(prestamo_id: int, db: Session = Depends(get_db))
     if not prestamo.activo:
         raise HTTPException(status_code=400, detail="El préstamo no está activo")
     
-    # Calcular monto pendiente
-    monto_pendiente = prestamo.monto_total - prestamo.monto_pagado
-    
-    if monto_pendiente <= 0:
+    desglose = amortizacion.desglose_proxima_cuota(db, prestamo)
+    if desglose is None:
         raise HTTPException(status_code=400, detail="El préstamo está completamente pagado")
+    return desglose
+
+@app.get("/api/prestamos/{prestamo_id}/cronograma", response_model=List[schemas.CuotaPrestamo])
+def get_cronograma_prestamo(prestamo_id: int, db: Session = Depends(get_db_lectura)):
+    """Devuelve el cronograma completo de cuotas del préstamo"""
+    prestamo = db.query(models.Prestamo).filter(models.Prestamo.id == prestamo_id).first()
+    if not prestamo:
+        raise HTTPException(status_code=404, detail="Préstamo no encontrado")
     
-    # Valores por defecto (típicos en Argentina)
-    tasa_interes_anual = prestamo.tasa_interes if prestamo.tasa_interes else 0.0
-    tasa_interes_mensual = tasa_interes_anual / 12.0 if tasa_interes_anual > 0 else 0.0
-    impuesto_iva = 21.0  # IVA estándar en Argentina
-    impuesto_ganancias = 0.0  # Por defecto, puede variar
-    gastos_administrativos = 500.0  # Valor por defecto
-    seguro = 0.0  # Por defecto
-    impuesto_sellos = 0.0  # Por defecto
-    
-    # Calcular intereses sobre el saldo pendiente
-    intereses = (monto_pendiente * tasa_interes_mensual / 100.0) if tasa_interes_mensual > 0 else 0.0
-    
-    # IVA sobre intereses
-    iva_intereses = (intereses * impuesto_iva / 100.0) if intereses > 0 else 0.0
-    
-    # IVA sobre gastos administrativos
-    iva_gastos_admin = (gastos_administrativos * impuesto_iva / 100.0) if gastos_administrativos > 0 else 0.0
-    
-    # IVA sobre seguro
-    iva_seguro = (seguro * impuesto_iva / 100.0) if seguro > 0 else 0.0
-    
-    # Calcular capital (si hay cuota mensual, usar ese valor menos los cargos)
-    if prestamo.cuota_mensual and prestamo.cuota_mensual > 0:
-        # El capital es la cuota menos todos los cargos
-        total_cargos = intereses + iva_intereses + gastos_administrativos + iva_gastos_admin + seguro + iva_seguro + impuesto_ganancias + impuesto_sellos
-        capital = max(0, prestamo.cuota_mensual - total_cargos)
-        monto_total = prestamo.cuota_mensual
-    else:
-        # Si no hay cuota mensual definida, calcular aproximado
-        # Capital aproximado: 70% del monto pendiente (ajustable)
-        capital = monto_pendiente * 0.7
-        total_cargos = intereses + iva_intereses + gastos_administrativos + iva_gastos_admin + seguro + iva_seguro + impuesto_ganancias + impuesto_sellos
-        monto_total = capital + total_cargos
+    return db.query(models.DesgloseCuotaPrestamo).filter(
+        models.DesgloseCuotaPrestamo.prestamo_id == prestamo_id
+    ).order_by(models.DesgloseCuotaPrestamo.numero_cuota).all()
+
+@app.post("/api/prestamos/{prestamo_id}/cronograma", response_model=List[schemas.CuotaPrestamo])
+def regenerar_cronograma_prestamo(prestamo_id: int, db: Session = Depends(get_db)):
+    """Regenera el cronograma completo del préstamo"""
+    prestamo = db.query(models.Prestamo).filter(models.Prestamo.id == prestamo_id).first()
+    if not prestamo:
+        raise HTTPException(status_code=404, detail="Préstamo no encontrado")
     
-    # Calcular totales
-    total_impuestos = iva_intereses + iva_gastos_admin + iva_seguro + impuesto_ganancias + impuesto_sellos
-    total_cargos_calc = intereses + gastos_administrativos + seguro + total_impuestos
+    amortizacion.generar_cronograma(db, prestamo)
+    db.commit()
+    return db.query(models.DesgloseCuotaPrestamo).filter(
+        models.DesgloseCuotaPrestamo.prestamo_id == prestamo_id
+    ).order_by(models.DesgloseCuotaPrestamo.numero_cuota).all()
+
+@app.post("/api/prestamos/{prestamo_id}/pagos", response_model=schemas.PagoPrestamo)
+def create_pago_prestamo(prestamo_id: int, pago: schemas.PagoPrestamoCreate, db: Session = Depends(get_db)):
+    """Registra un pago del préstamo, marca las cuotas que cubre y recalcula las pendientes"""
+    prestamo = db.query(models.Prestamo).filter(models.Prestamo.id == prestamo_id).first()
+    if not prestamo:
+        raise HTTPException(status_code=404, detail="Préstamo no encontrado")
+    if pago.prestamo_id != prestamo_id:
+        raise HTTPException(status_code=400, detail="El pago no corresponde al préstamo")
     
-    # Calcular número de cuota aproximado
-    if prestamo.cuota_mensual and prestamo.cuota_mensual > 0:
-        numero_cuota = int((prestamo.monto_total - monto_pendiente) / prestamo.cuota_mensual) + 1
-    else:
-        numero_cuota = 1
+    db_pago = models.PagoPrestamo(**pago.model_dump())
+    db.add(db_pago)
+    acumulados.registrar(db, acumulados.ORIGEN_PAGO_PRESTAMO, db_pago)
+    prestamo.monto_pagado = (prestamo.monto_pagado or 0.0) + pago.monto
     
-    # Fecha de vencimiento (usar la del préstamo o calcular próxima)
-    fecha_vencimiento = prestamo.fecha_vencimiento if prestamo.fecha_vencimiento else date.today()
+    # Lo que sobra después de cubrir cuotas enteras se aplica como adelanto de capital
+    amortizacion.regenerar_pendientes(db, prestamo)
     
-    return {
-        "prestamo_id": prestamo.id,
-        "prestamo_nombre": prestamo.nombre,
-        "fecha_vencimiento": fecha_vencimiento.isoformat(),
-        "numero_cuota": numero_cuota,
-        "moneda": prestamo.moneda.value,
-        "monto_pendiente": monto_pendiente,
-        "desglose": {
-            "monto_total": monto_total,
-            "capital": capital,
-            "intereses": intereses,
-            "iva_intereses": iva_intereses,
-            "impuesto_ganancias": impuesto_ganancias,
-            "gastos_administrativos": gastos_administrativos,
-            "iva_gastos_admin": iva_gastos_admin,
-            "seguro": seguro,
-            "iva_seguro": iva_seguro,
-            "otros_impuestos": impuesto_sellos,
-            "total_impuestos": total_impuestos,
-            "total_cargos": total_cargos_calc
-        },
-        "porcentajes": {
-            "tasa_interes_anual": tasa_interes_anual,
-            "tasa_interes_mensual": tasa_interes_mensual,
-            "impuesto_iva": impuesto_iva,
-            "impuesto_ganancias": impuesto_ganancias
-        }
-    }
+    db.commit()
+    db.refresh(db_pago)
+    return db_pago
+
+@app.get("/api/prestamos/{prestamo_id}/pagos", response_model=List[schemas.PagoPrestamo])
+def get_pagos_prestamo(prestamo_id: int, db: Session = Depends(get_db_lectura)):
+    return serializacion.listar(db, models.PagoPrestamo, schemas.PagoPrestamo, lambda q: q.where(
+        models.PagoPrestamo.prestamo_id == prestamo_id
+    ).order_by(models.PagoPrestamo.fecha_pago))
 
 
 # ========== INVERSIONES ==========
 @app.get("/api/inversiones", response_model=List[schemas.Inversion])
-def get_inversiones(db: Session = Depends(get_db)):
-    inversiones = db.query(models.Inversion).all()
-    return inversiones
+def get_inversiones(db: Session = Depends(get_db_lectura)):
+    return serializacion.listar(db, models.Inversion, schemas.Inversion)
 
 @app.get("/api/inversiones/{inversion_id}", response_model=schemas.Inversion)
-def get_inversion(inversion_id: int, db: Session = Depends(get_db)):
+def get_inversion(inversion_id: int, db: Session = Depends(get_db_lectura)):
     inversion = db.query(models.Inversion).filter(models.Inversion.id == inversion_id).first()
     if not inversion:
         raise HTTPException(status_code=404, detail="Inversión no encontrada")
@@ -356,9 +489,8 @@ def delete_inversion(inversion_id: int, db: Session = Depends(get_db)):
 
 # ========== PROYECCIONES ==========
 @app.get("/api/proyecciones", response_model=List[schemas.ProyeccionPago])
-def get_proyecciones(db: Session = Depends(get_db)):
-    proyecciones = db.query(models.ProyeccionPago).all()
-    return proyecciones
+def get_proyecciones(db: Session = Depends(get_db_lectura)):
+    return serializacion.listar(db, models.ProyeccionPago, schemas.ProyeccionPago)
 
 @app.post("/api/proyecciones", response_model=schemas.ProyeccionPago)
 def create_proyeccion(proyeccion: schemas.ProyeccionPagoCreate, db: Session = Depends(get_db)):
@@ -378,188 +510,29 @@ def delete_proyeccion(proyeccion_id: int, db: Session = Depends(get_db)):
     return {"message": "Proyección eliminada"}
 
 @app.get("/api/proyecciones/tarjetas")
-def get_proyecciones_tarjetas(meses: int = Query(default=6, ge=1, le=24), db: Session = Depends(get_db)):
+def get_proyecciones_tarjetas(meses: int = Query(default=6, ge=1, le=24), db: Session = Depends(get_db_lectura)):
     """Calcula las proyecciones de pagos de tarjetas para los próximos N meses"""
-    from calendar import monthrange
-    from datetime import timedelta
-    
-    hoy = date.today()
-    tarjetas = db.query(models.TarjetaCredito).filter(models.TarjetaCredito.saldo_actual > 0).all()
-    
-    if not tarjetas:
-        return []
-    
-    proyecciones_por_mes = {}
-    
-    for mes_offset in range(meses):
-        # Calcular fecha del mes objetivo
-        mes_objetivo = hoy.month + mes_offset
-        ano_objetivo = hoy.year
-        
-        while mes_objetivo > 12:
-            mes_objetivo -= 12
-            ano_objetivo += 1
-        
-        mes_key = f"{ano_objetivo}-{mes_objetivo:02d}"
-        
-        if mes_key not in proyecciones_por_mes:
-            proyecciones_por_mes[mes_key] = {
-                "mes": mes_key,
-                "fecha_vencimiento": None,
-                "cantidad_cuotas": 0,
-                "total_ars": 0,
-                "total_usd": 0,
-                "detalle": []
-            }
-        
-        for tarjeta in tarjetas:
-            # Calcular fecha de cierre para este mes
-            ultimo_dia_mes = monthrange(ano_objetivo, mes_objetivo)[1]
-            dia_cierre = min(tarjeta.fecha_cierre, ultimo_dia_mes)
-            fecha_cierre = date(ano_objetivo, mes_objetivo, dia_cierre)
-            
-            # Calcular fecha de vencimiento (días después del cierre)
-            dias_hasta_vencimiento = tarjeta.fecha_vencimiento - tarjeta.fecha_cierre
-            if dias_hasta_vencimiento < 0:
-                # Si el vencimiento es antes del cierre, es del mes siguiente
-                if mes_objetivo == 12:
-                    fecha_vencimiento = date(ano_objetivo + 1, 1, min(tarjeta.fecha_vencimiento, 31))
-                else:
-                    ultimo_dia_sig = monthrange(ano_objetivo, mes_objetivo + 1)[1]
-                    fecha_vencimiento = date(ano_objetivo, mes_objetivo + 1, min(tarjeta.fecha_vencimiento, ultimo_dia_sig))
-            else:
-                fecha_vencimiento = fecha_cierre + timedelta(days=dias_hasta_vencimiento)
-                # Ajustar si se pasa del mes
-                if fecha_vencimiento.month != mes_objetivo:
-                    if mes_objetivo == 12:
-                        ultimo_dia_sig = monthrange(ano_objetivo + 1, 1)[1]
-                        fecha_vencimiento = date(ano_objetivo + 1, 1, min(tarjeta.fecha_vencimiento, ultimo_dia_sig))
-                    else:
-                        ultimo_dia_sig = monthrange(ano_objetivo, mes_objetivo + 1)[1]
-                        fecha_vencimiento = date(ano_objetivo, mes_objetivo + 1, min(tarjeta.fecha_vencimiento, ultimo_dia_sig))
-            
-            # Obtener gastos del período (desde el cierre anterior hasta el cierre actual)
-            if mes_offset == 0:
-                # Para el mes actual, usar gastos desde el inicio del mes
-                fecha_inicio_periodo = date(ano_objetivo, mes_objetivo, 1)
-            else:
-                # Para meses futuros, calcular desde el cierre del mes anterior
-                mes_anterior = mes_objetivo - 1
-                ano_anterior = ano_objetivo
-                if mes_anterior == 0:
-                    mes_anterior = 12
-                    ano_anterior -= 1
-                ultimo_dia_ant = monthrange(ano_anterior, mes_anterior)[1]
-                dia_cierre_ant = min(tarjeta.fecha_cierre, ultimo_dia_ant)
-                fecha_inicio_periodo = date(ano_anterior, mes_anterior, dia_cierre_ant) + timedelta(days=1)
-            
-            fecha_fin_periodo = fecha_cierre
-            
-            # Obtener gastos del período (asumiendo que los gastos tienen una relación con las tarjetas)
-            # Por ahora, usaremos el saldo actual como estimación
-            gastos_periodo = db.query(models.Gasto).filter(
-                models.Gasto.fecha >= fecha_inicio_periodo,
-                models.Gasto.fecha <= fecha_fin_periodo
-            ).all()
-            
-            # Filtrar gastos que podrían ser de esta tarjeta (por ahora todos)
-            gastos_tarjeta = [g for g in gastos_periodo if g.moneda == tarjeta.moneda]
-            total_gastos_periodo = sum(g.monto for g in gastos_tarjeta)
-            
-            # Calcular desglose de cuota (similar al de préstamos)
-            # Valores por defecto para tarjetas
-            tasa_interes_anual = 90.0  # Tasa típica en Argentina
-            tasa_interes_mensual = 7.5
-            impuesto_iva = 21.0
-            gastos_administrativos = 1000.0
-            
-            # Calcular intereses sobre el saldo pendiente
-            saldo_para_calculo = tarjeta.saldo_actual + total_gastos_periodo
-            intereses = (saldo_para_calculo * tasa_interes_mensual / 100.0) if tasa_interes_mensual > 0 else 0.0
-            iva_intereses = (intereses * impuesto_iva / 100.0) if intereses > 0 else 0.0
-            iva_gastos_admin = (gastos_administrativos * impuesto_iva / 100.0) if gastos_administrativos > 0 else 0.0
-            
-            # Calcular monto total de la cuota
-            capital = saldo_para_calculo
-            total_impuestos = iva_intereses + iva_gastos_admin
-            total_cargos = intereses + gastos_administrativos + total_impuestos
-            monto_total = capital + total_cargos
-            
-            # Solo agregar si hay algo que pagar
-            if monto_total > 0:
-                detalle = {
-                    "tarjeta_id": tarjeta.id,
-                    "tarjeta_nombre": tarjeta.nombre,
-                    "tarjeta_banco": tarjeta.banco,
-                    "fecha_cierre": fecha_cierre.isoformat(),
-                    "fecha_vencimiento": fecha_vencimiento.isoformat(),
-                    "monto_estimado": monto_total,
-                    "moneda": tarjeta.moneda.value,
-                    "periodo_cierre": {
-                        "fecha_inicio": fecha_inicio_periodo.isoformat(),
-                        "fecha_fin": fecha_fin_periodo.isoformat()
-                    },
-                    "gastos": [{
-                        "id": g.id,
-                        "fecha": g.fecha.isoformat(),
-                        "monto": g.monto,
-                        "tipo": g.tipo.value,
-                        "categoria": g.categoria,
-                        "descripcion": g.descripcion
-                    } for g in gastos_tarjeta],
-                    "total_gastos_periodo": total_gastos_periodo,
-                    "cantidad_gastos": len(gastos_tarjeta),
-                    "desglose": {
-                        "monto_total": monto_total,
-                        "capital": capital,
-                        "intereses": intereses,
-                        "iva_intereses": iva_intereses,
-                        "impuesto_ganancias": 0.0,
-                        "gastos_administrativos": gastos_administrativos,
-                        "iva_gastos_admin": iva_gastos_admin,
-                        "otros_impuestos": 0.0,
-                        "total_impuestos": total_impuestos,
-                        "total_cargos": total_cargos
-                    }
-                }
-                
-                proyecciones_por_mes[mes_key]["detalle"].append(detalle)
-                proyecciones_por_mes[mes_key]["cantidad_cuotas"] += 1
-                
-                if tarjeta.moneda == models.TipoMoneda.PESOS:
-                    proyecciones_por_mes[mes_key]["total_ars"] += monto_total
-                else:
-                    proyecciones_por_mes[mes_key]["total_usd"] += monto_total
-                
-                # Establecer fecha de vencimiento (la más temprana del mes)
-                if not proyecciones_por_mes[mes_key]["fecha_vencimiento"] or fecha_vencimiento < date.fromisoformat(proyecciones_por_mes[mes_key]["fecha_vencimiento"]):
-                    proyecciones_por_mes[mes_key]["fecha_vencimiento"] = fecha_vencimiento.isoformat()
-    
-    # Convertir a lista y ordenar por mes
-    resultado = list(proyecciones_por_mes.values())
-    resultado.sort(key=lambda x: x["mes"])
-    
-    return resultado
+    return reports.proyecciones_tarjetas(db, meses)
 
 
 # ========== REPORTES ==========
 @app.get("/api/reportes/egresos-mensuales")
-def get_egresos_mensuales(ano: int = Query(...), mes: int = Query(...), db: Session = Depends(get_db)):
+def get_egresos_mensuales(ano: int = Query(...), mes: int = Query(...), db: Session = Depends(get_db_lectura)):
     return reports.egresos_mensuales(db, ano, mes)
 
 @app.get("/api/reportes/saldos-positivos")
-def get_saldos_positivos(ano: int = Query(...), mes: int = Query(...), db: Session = Depends(get_db)):
+def get_saldos_positivos(ano: int = Query(...), mes: int = Query(...), db: Session = Depends(get_db_lectura)):
     return reports.saldos_positivos(db, ano, mes)
 
 @app.get("/api/reportes/resumen-mensual")
-def get_resumen_mensual(ano: int = Query(...), mes: int = Query(...), db: Session = Depends(get_db)):
+def get_resumen_mensual(ano: int = Query(...), mes: int = Query(...), db: Session = Depends(get_db_lectura)):
     return reports.resumen_mensual(db, ano, mes)
 
 @app.get("/api/reportes/gastos/pdf")
 def generar_reporte_pdf_gastos(
     fecha_inicio: str = Query(..., description="Fecha inicio (YYYY-MM-DD)"),
     fecha_fin: str = Query(..., description="Fecha fin (YYYY-MM-DD)"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_lectura)
 ):
     """Genera un reporte PDF de gastos por rango de fechas"""
     try:
@@ -596,7 +569,8 @@ def generar_reporte_pdf_gastos(
 def generar_reporte_excel_gastos(
     fecha_inicio: str = Query(..., description="Fecha inicio (YYYY-MM-DD)"),
     fecha_fin: str = Query(..., description="Fecha fin (YYYY-MM-DD)"),
-    db: Session = Depends(get_db)
+    serie: models.SerieCotizacion = Query(default=models.SerieCotizacion.MEP, description="Serie de dólar para el total consolidado"),
+    db: Session = Depends(get_db_lectura)
 ):
     """Genera un reporte Excel de gastos por rango de fechas"""
     try:
@@ -614,8 +588,11 @@ def generar_reporte_excel_gastos(
             )
         ).all()
         
+        # Total consolidado en pesos (merge ordenado contra la serie de cotizaciones)
+        total_consolidado = cotizaciones.convertir_montos(db, gastos, serie)
+        
         # Generar Excel
-        excel_buffer = report_generator.generar_reporte_excel_gastos(gastos, fecha_ini, fecha_f)
+        excel_buffer = report_generator.generar_reporte_excel_gastos(gastos, fecha_ini, fecha_f, total_consolidado)
         
         return Response(
             content=excel_buffer.read(),
@@ -630,14 +607,168 @@ def generar_reporte_excel_gastos(
         raise HTTPException(status_code=500, detail=f"Error al generar el reporte Excel: {str(e)}")
 
 
+@app.get("/api/reportes/consolidado")
+def get_reporte_consolidado(
+    fecha_inicio: date = Query(...),
+    fecha_fin: date = Query(...),
+    serie: models.SerieCotizacion = Query(default=models.SerieCotizacion.MEP),
+    moneda: models.TipoMoneda = Query(default=models.TipoMoneda.PESOS),
+    db: Session = Depends(get_db_lectura)
+):
+    """Ingresos, gastos y saldo del período convertidos a una sola moneda"""
+    if fecha_inicio > fecha_fin:
+        raise HTTPException(status_code=400, detail="La fecha de inicio debe ser anterior a la fecha de fin")
+    
+    gastos = cotizaciones.total_consolidado(db, models.Gasto, fecha_inicio, fecha_fin, serie, moneda)
+    ingresos = cotizaciones.total_consolidado(db, models.Ingreso, fecha_inicio, fecha_fin, serie, moneda)
+    return {
+        "fecha_inicio": fecha_inicio.isoformat(),
+        "fecha_fin": fecha_fin.isoformat(),
+        "moneda": moneda.value,
+        "serie": serie.value,
+        "gastos": gastos,
+        "ingresos": ingresos,
+        "saldo": ingresos["total"] - gastos["total"]
+    }
+
+
+# ========== COTIZACIONES ==========
+@app.get("/api/cotizaciones")
+def get_cotizacion(
+    serie: models.SerieCotizacion = Query(default=models.SerieCotizacion.MEP),
+    fecha: Optional[date] = Query(default=None),
+    db: Session = Depends(get_db_lectura)
+):
+    """Cotización vigente a una fecha (por defecto hoy)"""
+    fecha = fecha or date.today()
+    cotizacion = cotizaciones.obtener_cotizacion(db, fecha, serie)
+    if not cotizacion:
+        raise HTTPException(status_code=404, detail="No hay cotizaciones cargadas para esa fecha")
+    return {
+        "serie": cotizacion.serie.value,
+        "fecha": cotizacion.fecha.isoformat(),
+        "compra": cotizacion.compra,
+        "venta": cotizacion.venta
+    }
+
+@app.post("/api/cotizaciones/cargar")
+def cargar_cotizaciones(db: Session = Depends(get_db)):
+    """Recarga las series de cotizaciones desde los CSV locales"""
+    try:
+        cargadas = cotizaciones.cargar_directorio(db)
+    except (OSError, ValueError, KeyError) as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Error al cargar cotizaciones: {str(e)}")
+    return {"directorio": cotizaciones.DIRECTORIO_COTIZACIONES, "cargadas": cargadas}
+
+
 # ========== ALERTAS ==========
 @app.get("/api/alertas")
-def get_alertas(db: Session = Depends(get_db)):
-    return alerts.obtener_alertas(db)
+def get_alertas(real: bool = Query(default=False), db: Session = Depends(get_db_lectura)):
+    return alerts.obtener_alertas(db, real)
+
+@app.get("/api/eventos")
+async def get_eventos(request: Request):
+    """Stream SSE con cambios de alertas, saldos de tarjetas e importaciones (reemplaza el polling)"""
+    return StreamingResponse(
+        eventos.flujo(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.get("/api/alertas/tendencias")
-def get_tendencias(db: Session = Depends(get_db)):
-    return alerts.analizar_tendencias(db)
+def get_tendencias(
+    meses: int = Query(default=6, ge=1, le=600, description="Horizonte en meses"),
+    granularidad: str = Query(default="mes", pattern="^(semana|mes|trimestre)$"),
+    ventana: int = Query(default=3, ge=1, le=52, description="Períodos de la media móvil"),
+    real: bool = Query(default=False, description="Totales en términos reales (ajustados por IPC)"),
+    base: Optional[str] = Query(default=None, pattern=r"^\d{4}-\d{2}$", description="Mes base YYYY-MM"),
+    db: Session = Depends(get_db_lectura)
+):
+    return alerts.analizar_tendencias(db, real, base, meses, granularidad, ventana)
+
+
+# ========== INFLACIÓN ==========
+@app.post("/api/ipc/cargar")
+def cargar_ipc(db: Session = Depends(get_db)):
+    """Recarga la serie del IPC desde el CSV local"""
+    try:
+        cargados = inflacion.cargar_csv(db)
+    except (OSError, ValueError, KeyError) as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Error al cargar el IPC: {str(e)}")
+    return {"archivo": inflacion.ARCHIVO_IPC, "periodos": cargados}
+
+
+# ========== ANOMALÍAS ==========
+@app.post("/api/anomalias/recalcular")
+def recalcular_anomalias(meses: int = Query(default=anomalias.VENTANA_MESES, ge=1, le=120), db: Session = Depends(get_db)):
+    """Reconstruye la línea de base de gastos con los últimos N meses"""
+    categorias = anomalias.recalcular_estadisticas(db, meses)
+    return {"categorias": categorias, "meses": meses}
+
+
+# ========== ACUMULADOS ==========
+@app.post("/api/acumulados/reconstruir")
+def reconstruir_acumulados(db: Session = Depends(get_db)):
+    """Recalcula los totales mensuales desde el detalle"""
+    filas = acumulados.reconstruir(db)
+    return {"filas": filas}
+
+@app.get("/api/acumulados/verificar")
+def verificar_acumulados(db: Session = Depends(get_db_lectura)):
+    """Compara los totales mensuales con el detalle"""
+    return acumulados.verificar(db)
+
+
+# ========== SINCRONIZACIÓN ==========
+@app.get("/api/sync")
+def sincronizar(
+    since: Optional[str] = Query(default=None, description="Cursor devuelto por la sincronización anterior"),
+    limite: int = Query(default=sincronizacion.PAGINA, ge=1, le=50000, description="Filas por página"),
+    db: Session = Depends(get_db_lectura)
+):
+    """Filas cambiadas y eliminadas desde el cursor (sin cursor, todas las filas), por páginas"""
+    try:
+        cursor = sincronizacion.leer_cursor(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return serializacion.ORJSONResponse(sincronizacion.cambios(db, cursor, limite))
+
+
+# ========== CACHE DE RESULTADOS ==========
+@app.get("/api/cache/estadisticas")
+def get_estadisticas_cache():
+    """Entradas, aciertos y fallos del cache de reportes y tendencias"""
+    return cache_resultados.cache.estadisticas()
+
+@app.post("/api/cache/limpiar")
+def limpiar_cache():
+    cache_resultados.cache.limpiar()
+    return {"message": "Cache vaciado"}
+
+
+# ========== MÉTRICAS ==========
+@app.get("/metrics", include_in_schema=False)
+def get_metricas():
+    """Métricas por ruta en formato de texto de Prometheus"""
+    return Response(metricas.registro.exportar(), media_type="text/plain; version=0.0.4")
+
+
+# ========== DEBUG ==========
+# Devuelven parámetros SQL con datos reales: solo se registran con FINANZAS_DEBUG=1
+if consultas_lentas.ACTIVO:
+    @app.get("/api/debug/consultas-lentas")
+    def get_consultas_lentas(
+        solo_escaneos: bool = Query(default=False, description="Solo las que recorren una tabla completa (SCAN)")
+    ):
+        """Últimas consultas que superaron FINANZAS_CONSULTA_LENTA_MS, con su plan"""
+        return {"umbral_ms": consultas_lentas.UMBRAL_MS, "consultas": consultas_lentas.listar(solo_escaneos)}
+
+    @app.delete("/api/debug/consultas-lentas")
+    def limpiar_consultas_lentas():
+        consultas_lentas.limpiar()
+        return {"message": "Registro de consultas lentas vaciado"}
 
 
 # ========== PDF PROCESSING ==========
@@ -657,66 +788,69 @@ async def previsualizar_pdf(file: UploadFile = File(...)):
 async def procesar_liquidacion(
     tarjeta_id: int = Query(...),
     file: UploadFile = File(...),
+    debug: bool = Query(default=False, description="Incluye la traza por etapas en la respuesta"),
     db: Session = Depends(get_db)
 ):
+    with trazas.traza("procesar_liquidacion", tarjeta_id=tarjeta_id, archivo=file.filename) as traza:
+        resultado = await _procesar_liquidacion(tarjeta_id, file, db)
+    if debug:
+        resultado["traza"] = traza.a_diccionario()
+    return resultado
+
+
+async def _procesar_liquidacion(tarjeta_id: int, file: UploadFile, db: Session):
     try:
         # Verificar que la tarjeta existe
         tarjeta = db.query(models.TarjetaCredito).filter(models.TarjetaCredito.id == tarjeta_id).first()
         if not tarjeta:
             raise HTTPException(status_code=404, detail="Tarjeta no encontrada")
         
-        # Procesar PDF
-        contenido = await file.read()
+        # Procesar PDF (salvo que ya se haya importado: mismo hash que la CLI y la bandeja)
+        with trazas.span("leer_archivo") as etapa:
+            contenido = await file.read()
+            etapa.anotar(bytes=len(contenido))
+        hash_pdf = importacion.huella(contenido)
+        if db.scalar(select(models.LiquidacionImportada.id).where(models.LiquidacionImportada.hash == hash_pdf)):
+            raise HTTPException(status_code=409, detail="La liquidación ya fue importada")
         import io
         archivo_pdf = io.BytesIO(contenido)
-        datos = pdf_processor.procesar_pdf_liquidacion(archivo_pdf)
+        with trazas.span("procesar_pdf"):
+            datos = pdf_processor.procesar_pdf_liquidacion(archivo_pdf)
         
-        # Actualizar saldo de la tarjeta
-        if datos.get('monto_total'):
-            tarjeta.saldo_actual = datos['monto_total']
+        # Gastos de cada movimiento, pago de la liquidación, saldo de la tarjeta (en lote) y su
+        # registro en liquidaciones_importadas (de ahí sale el evento "importacion")
+        with trazas.span("registrar_liquidacion") as etapa:
+            liquidacion = {"archivo": file.filename or "", "hash": hash_pdf, "datos": datos, "error": None}
+            registrados = importacion.importar(db, [liquidacion], tarjeta_id=tarjeta_id, crear_tarjetas=False)
+            if liquidacion["estado"] == "duplicada":
+                raise HTTPException(status_code=409, detail="La liquidación ya fue importada")
+            etapa.anotar(gastos=registrados["gastos"])
         
-        # Crear gastos para cada movimiento
-        movimientos_creados = []
-        for mov in datos.get('movimientos', []):
-            fecha_str = mov.get('fecha')
-            if isinstance(fecha_str, str):
-                fecha = date.fromisoformat(fecha_str)
-            else:
-                fecha = fecha_str
-            
-            gasto = models.Gasto(
-                fecha=fecha,
-                monto=mov['monto'],
-                moneda=tarjeta.moneda,
-                tipo=models.TipoGasto.ORDINARIO,
-                descripcion=mov.get('descripcion', 'Compra en tarjeta')
-            )
-            db.add(gasto)
-            movimientos_creados.append(gasto)
-        
-        # Registrar el pago de la liquidación
-        if datos.get('fecha_liquidacion'):
-            fecha_liquidacion = date.fromisoformat(datos['fecha_liquidacion'])
-            pago = models.PagoTarjeta(
-                tarjeta_id=tarjeta_id,
-                fecha_pago=fecha_liquidacion,
-                monto=datos.get('monto_total', 0),
-                descripcion=f"Liquidación procesada automáticamente"
-            )
-            db.add(pago)
-        
-        db.commit()
+        with trazas.span("commit"):
+            db.commit()
         
         return {
             "message": "Liquidación procesada exitosamente",
             "datos": datos,
-            "gastos_creados": len(movimientos_creados)
+            "gastos_creados": registrados["gastos"]
         }
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Error al procesar liquidación: {str(e)}")
 
-
 if __name__ == "__main__":
+    # FINANZAS_WORKERS > 1 levanta varios procesos sobre la misma base; cada uno revalida
+    # sus versiones (y con ellas ETags y cache de resultados) al recibir cada GET
+    import os
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    workers = int(os.environ.get("FINANZAS_WORKERS", "1"))
+    uvicorn.run(
+        "main:app" if workers > 1 else app,
+        host=os.environ.get("FINANZAS_HOST", "0.0.0.0"),
+        port=int(os.environ.get("FINANZAS_PORT", "8000")),
+        workers=workers,
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+    )
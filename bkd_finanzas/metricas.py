@@ -0,0 +1,198 @@
+"""
+Métricas de rendimiento por ruta (/metrics, formato de texto de Prometheus).
+
+Un middleware mide cada request y los hooks before/after_cursor_execute de
+SQLAlchemy (en todos los engines, sync y async) suman a la medición del request
+en curso la cantidad de consultas, el tiempo en la base y las filas afectadas
+(rowcount). Las filas devueltas se cuentan en do_orm_execute, sobre el resultado
+de los SELECT hechos con una sesión (los de connection.execute y los que se leen
+en streaming no suman). La medición viaja en una ContextVar, así que también
+alcanza a los endpoints sync que corren en el threadpool.
+
+Las métricas son por proceso: con varios workers cada uno expone las suyas.
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from starlette.routing import Match
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+import threading
+import time
+
+# Límites (segundos) de los buckets del histograma de latencia
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Medicion:
+    """Consultas hechas durante un request"""
+    __slots__ = ("ruta", "consultas", "tiempo_sql", "filas")
+
+    def __init__(self, ruta: str = ""):
+        self.ruta = ruta
+        self.consultas = 0
+        self.tiempo_sql = 0.0
+        self.filas = 0
+
+
+_actual: ContextVar[Optional[Medicion]] = ContextVar("medicion", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _antes_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    if _actual.get() is not None:
+        conn.info.setdefault("inicio_consultas", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _despues_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    medicion = _actual.get()
+    inicios = conn.info.get("inicio_consultas")
+    if medicion is None or not inicios:
+        return
+    medicion.consultas += 1
+    medicion.tiempo_sql += time.perf_counter() - inicios.pop()
+    if cursor.description is None:
+        medicion.filas += max(cursor.rowcount, 0)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _contar_filas(estado):
+    """Filas que devuelven los SELECT de la sesión (el rowcount del cursor no las cuenta)"""
+    medicion = _actual.get()
+    opciones = estado.execution_options
+    if medicion is None or not estado.is_select or opciones.get("yield_per") or opciones.get("stream_results"):
+        return None
+    # Devolver el resultado saltea los demás hooks do_orm_execute, que solo miran INSERT/UPDATE/DELETE
+    congelado = estado.invoke_statement().freeze()
+    medicion.filas += len(congelado.data)
+    return congelado()
+
+
+class _Ruta:
+    __slots__ = ("buckets", "requests", "segundos", "consultas", "tiempo_sql", "filas")
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.requests = 0
+        self.segundos = 0.0
+        self.consultas = 0
+        self.tiempo_sql = 0.0
+        self.filas = 0
+
+
+class Registro:
+    """Acumulados por (método, ruta, status)"""
+
+    def __init__(self):
+        self._rutas: Dict[Tuple[str, str, int], _Ruta] = {}
+        self._lock = threading.Lock()
+
+    def observar(self, metodo: str, ruta: str, status: int, segundos: float, medicion: Medicion):
+        with self._lock:
+            datos = self._rutas.get((metodo, ruta, status))
+            if datos is None:
+                datos = self._rutas[(metodo, ruta, status)] = _Ruta()
+            for i, limite in enumerate(BUCKETS):
+                if segundos <= limite:
+                    datos.buckets[i] += 1
+                    break
+            datos.requests += 1
+            datos.segundos += segundos
+            datos.consultas += medicion.consultas
+            datos.tiempo_sql += medicion.tiempo_sql
+            datos.filas += medicion.filas
+
+    def limpiar(self):
+        with self._lock:
+            self._rutas.clear()
+
+    def exportar(self) -> str:
+        """Texto en formato de exposición de Prometheus"""
+        lineas: List[str] = [
+            "# HELP finanzas_request_duration_seconds Latencia de los requests por ruta",
+            "# TYPE finanzas_request_duration_seconds histogram",
+        ]
+        contadores = (
+            ("finanzas_sql_queries_total", "Consultas SQL ejecutadas", "consultas"),
+            ("finanzas_sql_seconds_total", "Tiempo total en la base", "tiempo_sql"),
+            ("finanzas_sql_rows_total", "Filas devueltas o afectadas", "filas"),
+        )
+        with self._lock:
+            rutas = sorted(self._rutas.items())
+            for (metodo, ruta, status), datos in rutas:
+                etiquetas = f'method="{metodo}",route="{ruta}",status="{status}"'
+                acumulado = 0
+                for limite, cantidad in zip(BUCKETS, datos.buckets):
+                    acumulado += cantidad
+                    lineas.append(f'finanzas_request_duration_seconds_bucket{{{etiquetas},le="{limite}"}} {acumulado}')
+                lineas.append(f'finanzas_request_duration_seconds_bucket{{{etiquetas},le="+Inf"}} {datos.requests}')
+                lineas.append(f"finanzas_request_duration_seconds_sum{{{etiquetas}}} {datos.segundos:.6f}")
+                lineas.append(f"finanzas_request_duration_seconds_count{{{etiquetas}}} {datos.requests}")
+            for nombre, ayuda, atributo in contadores:
+                lineas.append(f"# HELP {nombre} {ayuda}")
+                lineas.append(f"# TYPE {nombre} counter")
+                for (metodo, ruta, status), datos in rutas:
+                    valor = getattr(datos, atributo)
+                    valor = f"{valor:.6f}" if isinstance(valor, float) else valor
+                    lineas.append(f'{nombre}{{method="{metodo}",route="{ruta}",status="{status}"}} {valor}')
+        return "\n".join(lineas) + "\n"
+
+
+registro = Registro()
+
+
+def iniciar(ruta: str = "") -> Tuple[Medicion, object]:
+    """Abre la medición del request actual; devuelve el token para cerrar()"""
+    medicion = Medicion(ruta)
+    return medicion, _actual.set(medicion)
+
+
+def cerrar(token):
+    _actual.reset(token)
+
+
+def actual() -> Optional[Medicion]:
+    return _actual.get()
+
+
+def repartir(medicion: Medicion, destinos: List[Optional[Medicion]]):
+    """Suma a cada destino su parte de una medición compartida (p. ej. un lote de group commit)"""
+    if not destinos:
+        return
+    for i, destino in enumerate(destinos):
+        if destino is None:
+            continue
+        # Enteros repartidos sin perder el resto: los totales de /metrics siguen cuadrando
+        destino.consultas += medicion.consultas // len(destinos) + (i < medicion.consultas % len(destinos))
+        destino.filas += medicion.filas // len(destinos) + (i < medicion.filas % len(destinos))
+        destino.tiempo_sql += medicion.tiempo_sql / len(destinos)
+
+
+def _buscar_ruta(rutas, scope):
+    for candidata in rutas:
+        # Routers incluidos (FastAPI los guarda sin aplanar)
+        hijas = getattr(getattr(candidata, "original_router", None), "routes", None)
+        if hijas is not None:
+            encontrada = _buscar_ruta(hijas, scope)
+            if encontrada is not None:
+                return encontrada
+        elif candidata.matches(scope)[0] == Match.FULL:
+            return candidata
+    return None
+
+
+def ruta_de(request) -> str:
+    """Plantilla de la ruta (/api/gastos/{gasto_id}) para no abrir una serie por id"""
+    ruta = request.scope.get("route")
+    if ruta is None:
+        # Respondido antes del ruteo (p. ej. 304 del GET condicional)
+        ruta = _buscar_ruta(request.app.router.routes, request.scope)
+    return getattr(ruta, "path", None) or "sin_ruta"
+
+
+def server_timing(segundos: float, medicion: Medicion) -> str:
+    return (
+        f'app;dur={segundos * 1000:.1f}, '
+        f'db;dur={medicion.tiempo_sql * 1000:.1f};desc="{medicion.consultas} consultas, {medicion.filas} filas"'
+    )
@@ -1,10 +1,21 @@
-from sqlalchemy import Column, Integer, String, Float, Date, Boolean, Enum, Text
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, Enum, Text, Index, text
 from sqlalchemy.orm import relationship
 import enum
-from datetime import date
+from datetime import date, datetime, timezone
 from database import Base
 
 
+def ahora() -> datetime:
+    """Marca de tiempo UTC (sin zona) para updated_at y las bajas"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# Número de sincronización: cada transacción que escribe filas sincronizables toma el
+# siguiente valor de este contador (ver sincronizacion.py) y lo deja en version_sync
+SECUENCIA_SYNC = "_sync"
+VERSION_SYNC = text(f"(SELECT version FROM versiones_tablas WHERE tabla = '{SECUENCIA_SYNC}')")
+
+
 class TipoIngreso(str, enum.Enum):
     SALARIO_ACN = "Salario ACN"
     VENTAS_TURISMO = "Ventas Turismo Volá Barato"
@@ -24,6 +35,19 @@ class TipoMoneda(str, enum.Enum):
     DOLARES = "USD"
 
 
+class SerieCotizacion(str, enum.Enum):
+    OFICIAL = "Oficial"
+    MEP = "MEP"
+    BLUE = "Blue"
+    UVA = "UVA"  # Pesos por UVA (ajuste de los préstamos UVA), no es un dólar
+
+
+class SistemaAmortizacion(str, enum.Enum):
+    FRANCES = "Francés"  # Cuota constante
+    ALEMAN = "Alemán"  # Amortización de capital constante
+    UVA = "UVA"  # Francés en UVAs, ajustado por el valor de la UVA
+
+
 class Ingreso(Base):
     __tablename__ = "ingresos"
 
@@ -34,6 +58,8 @@ class Ingreso(Base):
     tipo = Column(Enum(TipoIngreso), nullable=False)
     descripcion = Column(String(500))
     created_at = Column(Date, default=date.today)
+    updated_at = Column(DateTime, default=ahora, onupdate=ahora, index=True)
+    version_sync = Column(Integer, default=VERSION_SYNC, onupdate=VERSION_SYNC, index=True)
 
 
 class Gasto(Base):
@@ -47,6 +73,8 @@ class Gasto(Base):
     categoria = Column(String(100))
     descripcion = Column(String(500))
     created_at = Column(Date, default=date.today)
+    updated_at = Column(DateTime, default=ahora, onupdate=ahora, index=True)
+    version_sync = Column(Integer, default=VERSION_SYNC, onupdate=VERSION_SYNC, index=True)
 
 
 class TarjetaCredito(Base):
@@ -68,6 +96,8 @@ class TarjetaCredito(Base):
     # gastos_administrativos = Column(Float, default=1000.0)  # Gastos administrativos mensuales (ARS) - Típico: $500-2000
     # impuesto_sellos = Column(Float, default=0.0)  # Impuesto a los sellos provincial (%) - Variable por provincia
     created_at = Column(Date, default=date.today)
+    updated_at = Column(DateTime, default=ahora, onupdate=ahora, index=True)
+    version_sync = Column(Integer, default=VERSION_SYNC, onupdate=VERSION_SYNC, index=True)
 
 
 class PagoTarjeta(Base):
@@ -79,6 +109,8 @@ class PagoTarjeta(Base):
     monto = Column(Float, nullable=False)
     descripcion = Column(String(500))
     created_at = Column(Date, default=date.today)
+    updated_at = Column(DateTime, default=ahora, onupdate=ahora, index=True)
+    version_sync = Column(Integer, default=VERSION_SYNC, onupdate=VERSION_SYNC, index=True)
 
 
 class DesgloseCuotaTarjeta(Base):
@@ -97,6 +129,8 @@ class DesgloseCuotaTarjeta(Base):
     moneda = Column(Enum(TipoMoneda), nullable=False)
     descripcion = Column(String(500))
     created_at = Column(Date, default=date.today)
+    updated_at = Column(DateTime, default=ahora, onupdate=ahora, index=True)
+    version_sync = Column(Integer, default=VERSION_SYNC, onupdate=VERSION_SYNC, index=True)
 
 
 class Prestamo(Base):
@@ -109,18 +143,22 @@ class Prestamo(Base):
     monto_pagado = Column(Float, default=0.0)
     moneda = Column(Enum(TipoMoneda), nullable=False)
     tasa_interes = Column(Float, default=0.0)  # Tasa de interés anual (%)
-    # Campos nuevos - descomentar después de migrar la BD
-    # impuesto_iva = Column(Float, default=21.0)  # IVA (%) - Obligatorio en Argentina
-    # impuesto_ganancias = Column(Float, default=0.0)  # Impuesto a las ganancias (%) - Puede aplicarse
-    # gastos_administrativos = Column(Float, default=500.0)  # Gastos administrativos mensuales (ARS) - Variable
-    # seguro = Column(Float, default=0.0)  # Seguro mensual (ARS) - Si aplica
-    # impuesto_sellos = Column(Float, default=0.0)  # Impuesto a los sellos provincial (%) - Variable por provincia
+    impuesto_iva = Column(Float, default=21.0)  # IVA (%) - Obligatorio en Argentina
+    impuesto_ganancias = Column(Float, default=0.0)  # Impuesto a las ganancias (%) - Puede aplicarse
+    gastos_administrativos = Column(Float, default=500.0)  # Gastos administrativos mensuales (ARS) - Variable
+    seguro = Column(Float, default=0.0)  # Seguro mensual (ARS) - Si aplica
+    impuesto_sellos = Column(Float, default=0.0)  # Impuesto a los sellos provincial (%) - Variable por provincia
+    sistema_amortizacion = Column(Enum(SistemaAmortizacion), default=SistemaAmortizacion.FRANCES)
+    cantidad_cuotas = Column(Integer)  # Si falta, se deduce de fecha_inicio/fecha_vencimiento
+    valor_uva_inicial = Column(Float)  # Valor de la UVA al otorgamiento (solo sistema UVA)
     fecha_inicio = Column(Date, nullable=False)
     fecha_vencimiento = Column(Date)
     cuota_mensual = Column(Float)
     descripcion = Column(String(500))
     activo = Column(Boolean, default=True)
     created_at = Column(Date, default=date.today)
+    updated_at = Column(DateTime, default=ahora, onupdate=ahora, index=True)
+    version_sync = Column(Integer, default=VERSION_SYNC, onupdate=VERSION_SYNC, index=True)
 
 
 class PagoPrestamo(Base):
@@ -132,10 +170,15 @@ class PagoPrestamo(Base):
     monto = Column(Float, nullable=False)
     descripcion = Column(String(500))
     created_at = Column(Date, default=date.today)
+    updated_at = Column(DateTime, default=ahora, onupdate=ahora, index=True)
+    version_sync = Column(Integer, default=VERSION_SYNC, onupdate=VERSION_SYNC, index=True)
 
 
 class DesgloseCuotaPrestamo(Base):
     __tablename__ = "desglose_cuota_prestamo"
+    __table_args__ = (
+        Index("ix_desglose_cuota_prestamo_prestamo_cuota", "prestamo_id", "numero_cuota"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     prestamo_id = Column(Integer, nullable=False)
@@ -149,9 +192,14 @@ class DesgloseCuotaPrestamo(Base):
     gastos_administrativos = Column(Float, default=0.0)  # Gastos administrativos
     seguro = Column(Float, default=0.0)  # Seguro
     otros_impuestos = Column(Float, default=0.0)  # Otros impuestos
+    saldo_capital = Column(Float, default=0.0)  # Capital pendiente luego de pagar la cuota
+    adelanto_capital = Column(Float, default=0.0)  # Capital adelantado antes de esta cuota (reduce las siguientes)
     moneda = Column(Enum(TipoMoneda), nullable=False)
     descripcion = Column(String(500))
+    pagada = Column(Boolean, default=False)
     created_at = Column(Date, default=date.today)
+    updated_at = Column(DateTime, default=ahora, onupdate=ahora, index=True)
+    version_sync = Column(Integer, default=VERSION_SYNC, onupdate=VERSION_SYNC, index=True)
 
 
 class Inversion(Base):
@@ -169,6 +217,8 @@ class Inversion(Base):
     descripcion = Column(String(500))
     activa = Column(Boolean, default=True)
     created_at = Column(Date, default=date.today)
+    updated_at = Column(DateTime, default=ahora, onupdate=ahora, index=True)
+    version_sync = Column(Integer, default=VERSION_SYNC, onupdate=VERSION_SYNC, index=True)
 
 
 class ProyeccionPago(Base):
@@ -183,4 +233,132 @@ class ProyeccionPago(Base):
     descripcion = Column(String(500))
     pagado = Column(Boolean, default=False)
     created_at = Column(Date, default=date.today)
+    updated_at = Column(DateTime, default=ahora, onupdate=ahora, index=True)
+    version_sync = Column(Integer, default=VERSION_SYNC, onupdate=VERSION_SYNC, index=True)
+
+
+class Cotizacion(Base):
+    __tablename__ = "cotizaciones"
+    __table_args__ = (
+        Index("ix_cotizaciones_serie_fecha", "serie", "fecha", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    serie = Column(Enum(SerieCotizacion), nullable=False)
+    fecha = Column(Date, nullable=False)
+    compra = Column(Float)
+    venta = Column(Float, nullable=False)  # Pesos por dólar (se usa para convertir)
+    created_at = Column(Date, default=date.today)
+    updated_at = Column(DateTime, default=ahora, onupdate=ahora, index=True)
+    version_sync = Column(Integer, default=VERSION_SYNC, onupdate=VERSION_SYNC, index=True)
+
+
+class IndicePrecios(Base):
+    __tablename__ = "indice_precios"
+    __table_args__ = (
+        Index("ix_indice_precios_periodo", "periodo", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    periodo = Column(String(7), nullable=False)  # "YYYY-MM"
+    valor = Column(Float, nullable=False)  # Nivel del IPC (base arbitraria)
+    created_at = Column(Date, default=date.today)
+    updated_at = Column(DateTime, default=ahora, onupdate=ahora, index=True)
+    version_sync = Column(Integer, default=VERSION_SYNC, onupdate=VERSION_SYNC, index=True)
+
+
+class EstadisticaGasto(Base):
+    __tablename__ = "estadisticas_gasto"
+    __table_args__ = (
+        Index("ix_estadisticas_gasto_categoria_moneda", "categoria", "moneda", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    categoria = Column(String(100), nullable=False)  # Categoría del gasto o, si falta, su tipo
+    moneda = Column(Enum(TipoMoneda), nullable=False)
+    # Meses de la línea de base móvil (JSON, ver anomalias.py); las columnas siguientes se derivan de ella
+    ventana = Column(Text)
+    # Welford sobre montos individuales de la ventana
+    n = Column(Integer, default=0)
+    media = Column(Float, default=0.0)
+    m2 = Column(Float, default=0.0)
+    # Welford sobre totales de meses cerrados de la ventana
+    n_meses = Column(Integer, default=0)
+    media_mes = Column(Float, default=0.0)
+    m2_mes = Column(Float, default=0.0)
+    periodo = Column(String(7))  # Mes abierto ("YYYY-MM")
+    total_periodo = Column(Float, default=0.0)
+    updated_at = Column(DateTime, default=ahora, onupdate=ahora, index=True)
+
+
+class AnomaliaGasto(Base):
+    __tablename__ = "anomalias_gasto"
+
+    id = Column(Integer, primary_key=True, index=True)
+    gasto_id = Column(Integer, nullable=False, index=True)
+    categoria = Column(String(100), nullable=False)
+    moneda = Column(Enum(TipoMoneda), nullable=False)
+    fecha = Column(Date, nullable=False, index=True)
+    monto = Column(Float, nullable=False)
+    media = Column(Float, nullable=False)
+    desvio = Column(Float, nullable=False)
+    z_score = Column(Float, nullable=False)
+    created_at = Column(Date, default=date.today)
+    updated_at = Column(DateTime, default=ahora, onupdate=ahora, index=True)
+
+
+class AcumuladoMensual(Base):
+    __tablename__ = "acumulados_mensuales"
+    __table_args__ = (
+        Index("ix_acumulados_mensuales_clave", "ano", "mes", "moneda", "tipo", "categoria", "origen", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    ano = Column(Integer, nullable=False)
+    mes = Column(Integer, nullable=False)
+    moneda = Column(Enum(TipoMoneda), nullable=False)
+    tipo = Column(String(100), nullable=False, default="")  # Valor de TipoGasto/TipoIngreso ("" en pagos)
+    categoria = Column(String(100), nullable=False, default="")
+    origen = Column(String(20), nullable=False)  # "gasto", "ingreso", "pago_tarjeta", "pago_prestamo"
+    total = Column(Float, nullable=False, default=0.0)
+    cantidad = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=ahora, onupdate=ahora, index=True)
+
+
+class VersionTabla(Base):
+    __tablename__ = "versiones_tablas"
+
+    tabla = Column(String(100), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class VersionEsquema(Base):
+    """Huella del esquema de los modelos con que se migró la base (ver database.preparar_esquema)"""
+    __tablename__ = "esquema_version"
+
+    version = Column(String(64), primary_key=True)
+
+
+class LiquidacionImportada(Base):
+    """PDF de liquidación ya importado (por hash del contenido), para no cargarlo dos veces"""
+    __tablename__ = "liquidaciones_importadas"
+
+    id = Column(Integer, primary_key=True)
+    hash = Column(String(64), nullable=False, unique=True)
+    archivo = Column(String(500))
+    tarjeta_id = Column(Integer, nullable=False)
+    fecha_liquidacion = Column(Date)
+    gastos = Column(Integer, nullable=False, default=0)
+    monto_total = Column(Float)
+    importado_at = Column(DateTime, nullable=False, default=ahora)
+
+
+class Eliminacion(Base):
+    """Baja de una fila (tombstone), para que /api/sync informe lo borrado"""
+    __tablename__ = "eliminaciones"
 
+    id = Column(Integer, primary_key=True)
+    tabla = Column(String(100), nullable=False)
+    fila_id = Column(Integer, nullable=False)
+    eliminado_at = Column(DateTime, nullable=False, default=ahora, index=True)
+    version_sync = Column(Integer, default=VERSION_SYNC, onupdate=VERSION_SYNC, index=True)
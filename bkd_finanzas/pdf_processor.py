@@ -1,8 +1,8 @@
-import pdfplumber
 import re
 from datetime import datetime, date
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
 from decimal import Decimal
+import trazas
 
 # Mapeo de meses en español
 MESES_ESPANOL = {
@@ -12,19 +12,83 @@ MESES_ESPANOL = {
 }
 
 
-def extraer_texto_pdf(archivo_pdf) -> str:
-    """Extrae todo el texto de un PDF"""
-    texto_completo = ""
+def iterar_paginas(archivo_pdf) -> Iterator[str]:
+    """Texto de cada página, de a una.
+
+    pdf.pages solo arma los objetos Page (el layout se analiza en
+    extract_text); al pasar a la siguiente se libera la cache de la anterior,
+    así que la memoria no crece con el largo del resumen.
+    """
+    # pdfplumber (y pdfminer) tardan en importarse: se cargan recién al leer el primer PDF
+    import pdfplumber
+
+    with pdfplumber.open(archivo_pdf) as pdf:
+        for pagina in pdf.pages:
+            try:
+                yield pagina.extract_text() or ""
+            finally:
+                pagina.close()
+
+
+class _FinDeLectura:
+    """Decide, página por página, si ya están el total a pagar y todo el detalle de consumos.
+
+    Sigue las mismas secciones que extraer_movimientos. Cuando hay total y
+    ninguna sección abierta (y al menos una cerrada) se lee una página más,
+    por si ahí empieza el detalle de otra tarjeta (adicionales); si no
+    empieza ninguno, se deja de leer.
+    """
+
+    def __init__(self):
+        self.total = False
+        self.dentro_detalle = False
+        self.detalle_cerrado = False
+        self.completo_en_anterior = False
+
+    def terminado(self, texto: str) -> bool:
+        """Procesa una página; True si ya no hace falta leer las siguientes"""
+        abre_seccion = False
+        if not self.total and re.search(r'TOTAL\s+A\s+PAGAR\s+[\d.,]+', texto, re.IGNORECASE):
+            self.total = True
+        for linea in texto.split('\n'):
+            mayusculas = linea.upper()
+            if 'DETALLE DEL CONSUMO' in mayusculas or 'CUOTAS DEL MES' in mayusculas:
+                self.dentro_detalle = True
+                abre_seccion = True
+            elif self.dentro_detalle and 'TOTAL' in mayusculas and 'TOTAL A PAGAR' not in mayusculas:
+                self.dentro_detalle = False
+                self.detalle_cerrado = True
+        if self.completo_en_anterior and not abre_seccion:
+            return True
+        self.completo_en_anterior = self.total and self.detalle_cerrado and not self.dentro_detalle
+        return False
+
+
+def extraer_texto_pdf(archivo_pdf, hasta_fin_detalle: bool = False) -> str:
+    """Extrae el texto de un PDF.
+
+    Con `hasta_fin_detalle` deja de leer páginas cuando ya aparecieron el
+    total a pagar y el detalle de consumos completo (lo que sigue suelen ser
+    condiciones legales y publicidad).
+    """
+    partes = []
+    fin = _FinDeLectura() if hasta_fin_detalle else None
+    leidas = 0
+    paginas = iterar_paginas(archivo_pdf)
     try:
-        with pdfplumber.open(archivo_pdf) as pdf:
-            for pagina in pdf.pages:
-                texto = pagina.extract_text()
-                if texto:
-                    texto_completo += texto + "\n"
+        for texto in paginas:
+            leidas += 1
+            if texto:
+                partes.append(texto + "\n")
+            if fin is not None and fin.terminado(texto):
+                break
     except Exception as e:
         raise Exception(f"Error al leer el PDF: {str(e)}")
-    
-    return texto_completo
+    finally:
+        paginas.close()
+    trazas.anotar(paginas=leidas)
+
+    return "".join(partes)
 
 
 def parsear_fecha_mastercard(fecha_str: str) -> Optional[date]:
@@ -360,12 +424,17 @@ def extraer_datos_tarjeta(texto: str) -> Dict:
 
 def procesar_pdf_liquidacion(archivo_pdf) -> Dict:
     """Procesa un PDF de liquidación de tarjeta y extrae la información"""
-    texto = extraer_texto_pdf(archivo_pdf)
+    with trazas.span("extraer_texto_pdf"):
+        texto = extraer_texto_pdf(archivo_pdf, hasta_fin_detalle=True)
+        trazas.anotar(caracteres=len(texto))
     
-    datos_tarjeta = extraer_datos_tarjeta(texto)
-    fecha_liquidacion = extraer_fecha_liquidacion(texto)
-    monto_total = extraer_monto_total(texto)
-    movimientos = extraer_movimientos(texto)
+    with trazas.span("extraer_datos_tarjeta"):
+        datos_tarjeta = extraer_datos_tarjeta(texto)
+        fecha_liquidacion = extraer_fecha_liquidacion(texto)
+        monto_total = extraer_monto_total(texto)
+    with trazas.span("extraer_movimientos"):
+        movimientos = extraer_movimientos(texto)
+        trazas.anotar(movimientos=len(movimientos))
     
     # Si no encontramos monto total pero tenemos movimientos, calcularlo
     if not monto_total and movimientos:
@@ -1,19 +1,23 @@
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from openpyxl.utils import get_column_letter
+"""
+Reportes de gastos en PDF (reportlab) y Excel (openpyxl).
+
+Las dos librerías se importan dentro de cada función: son las más pesadas del
+backend y así solo las carga el worker que genera un reporte.
+"""
 from datetime import date, datetime
-from typing import List, Dict
+from typing import List, Dict, Optional
 from io import BytesIO
 import models
 
 
 def generar_reporte_pdf_gastos(gastos: List[models.Gasto], fecha_inicio: date, fecha_fin: date) -> BytesIO:
     """Genera un reporte PDF de gastos por rango de fechas"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4)
     story = []
@@ -116,8 +120,15 @@ def generar_reporte_pdf_gastos(gastos: List[models.Gasto], fecha_inicio: date, f
     return buffer
 
 
-def generar_reporte_excel_gastos(gastos: List[models.Gasto], fecha_inicio: date, fecha_fin: date) -> BytesIO:
-    """Genera un reporte Excel de gastos por rango de fechas"""
+def generar_reporte_excel_gastos(gastos: List[models.Gasto], fecha_inicio: date, fecha_fin: date, total_consolidado: Optional[Dict] = None) -> BytesIO:
+    """Genera un reporte Excel de gastos por rango de fechas
+
+    total_consolidado: resultado de cotizaciones.convertir_montos, para mostrar un total en una sola moneda
+    """
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+    from openpyxl.utils import get_column_letter
+
     wb = Workbook()
     ws = wb.active
     ws.title = "Reporte de Gastos"
@@ -191,12 +202,37 @@ def generar_reporte_excel_gastos(gastos: List[models.Gasto], fecha_inicio: date,
             ws.cell(row=row, column=6, value=gasto.moneda.value).border = border
             row += 1
         
-        # Fila de totales
-        ws.cell(row=row, column=4, value="TOTAL:").font = Font(bold=True)
-        ws.cell(row=row, column=4).alignment = Alignment(horizontal='right')
-        ws.cell(row=row, column=5, value=total_ars + total_usd).font = Font(bold=True)
-        ws.cell(row=row, column=5).number_format = '"$"#,##0.00'
-        ws.cell(row=row, column=5).alignment = Alignment(horizontal='right')
+        # Filas de totales (una por moneda; sumar ARS + USD sin convertir no tiene sentido)
+        totales = [("TOTAL ARS:", total_ars, "ARS"), ("TOTAL USD:", total_usd, "USD")]
+        if total_consolidado:
+            sin_cotizacion = total_consolidado.get('sin_cotizacion', 0)
+            if not sin_cotizacion:
+                totales.append((
+                    f"TOTAL (dólar {total_consolidado['serie']}):",
+                    total_consolidado['total'],
+                    total_consolidado['moneda']
+                ))
+            else:
+                # Los gastos sin cotización para su fecha no entran: el total se marca como parcial
+                otra_moneda = "USD" if total_consolidado['moneda'] == "ARS" else "ARS"
+                totales.append((
+                    f"TOTAL PARCIAL (dólar {total_consolidado['serie']}):",
+                    total_consolidado['total'],
+                    total_consolidado['moneda']
+                ))
+                totales.append((
+                    f"Sin cotización ({sin_cotizacion} gastos):",
+                    total_consolidado.get('monto_sin_cotizacion', 0.0),
+                    otra_moneda
+                ))
+        for etiqueta, total, moneda in totales:
+            ws.cell(row=row, column=4, value=etiqueta).font = Font(bold=True)
+            ws.cell(row=row, column=4).alignment = Alignment(horizontal='right')
+            ws.cell(row=row, column=5, value=total).font = Font(bold=True)
+            ws.cell(row=row, column=5).number_format = '"$"#,##0.00'
+            ws.cell(row=row, column=5).alignment = Alignment(horizontal='right')
+            ws.cell(row=row, column=6, value=moneda).font = Font(bold=True)
+            row += 1
     else:
         ws.merge_cells(f'A{row}:F{row}')
         ws.cell(row=row, column=1, value="No hay gastos registrados en el período seleccionado.")
@@ -1,49 +1,59 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, extract, func
-from datetime import date
+from datetime import date, timedelta
+from calendar import monthrange
 from typing import Dict, List
 import models
+import acumulados
+import cache_resultados
 
+# Tablas de las que dependen los reportes (claves del cache de resultados)
+TABLAS_EGRESOS = ("acumulados_mensuales", "gastos", "pagos_tarjeta", "pagos_prestamo")
+TABLAS_SALDOS = TABLAS_EGRESOS + ("ingresos",)
+TABLAS_RESUMEN = TABLAS_SALDOS + ("proyecciones_pago",)
 
-def egresos_mensuales(db: Session, ano: int, mes: int) -> Dict:
-    """Genera reporte de egresos mensuales"""
-    gastos = db.query(models.Gasto).filter(
-        and_(
-            extract('year', models.Gasto.fecha) == ano,
-            extract('month', models.Gasto.fecha) == mes
-        )
-    ).all()
-    
-    pagos_tarjetas = db.query(models.PagoTarjeta).filter(
-        and_(
-            extract('year', models.PagoTarjeta.fecha_pago) == ano,
-            extract('month', models.PagoTarjeta.fecha_pago) == mes
-        )
-    ).all()
-    
-    pagos_prestamos = db.query(models.PagoPrestamo).filter(
-        and_(
-            extract('year', models.PagoPrestamo.fecha_pago) == ano,
-            extract('month', models.PagoPrestamo.fecha_pago) == mes
-        )
-    ).all()
+
+def _rango_mes(ano: int, mes: int):
+    """Primer y último día del mes (filtros por rango usan el índice de fecha)"""
+    return date(ano, mes, 1), date(ano, mes, monthrange(ano, mes)[1])
+
+
+def _sumar(filas, origen: str, moneda: models.TipoMoneda, tipo: str = None) -> float:
+    return sum(f.total for f in filas if f.origen == origen and f.moneda == moneda and (tipo is None or f.tipo == tipo))
+
+
+def _contar(filas, origen: str, tipo: str) -> int:
+    return sum(f.cantidad for f in filas if f.origen == origen and f.tipo == tipo)
+
+
+@cache_resultados.cacheado(TABLAS_EGRESOS)
+def egresos_mensuales(db: Session, ano: int, mes: int, incluir_detalle: bool = True) -> Dict:
+    """Genera reporte de egresos mensuales
+
+    Los totales salen de los acumulados mensuales; el detalle se lee solo si se pide.
+    """
+    filas = acumulados.filas_mes(db, ano, mes)
     
     # Calcular totales por moneda
-    total_gastos_ars = sum(g.monto for g in gastos if g.moneda == models.TipoMoneda.PESOS)
-    total_gastos_usd = sum(g.monto for g in gastos if g.moneda == models.TipoMoneda.DOLARES)
+    total_gastos_ars = _sumar(filas, acumulados.ORIGEN_GASTO, models.TipoMoneda.PESOS)
+    total_gastos_usd = _sumar(filas, acumulados.ORIGEN_GASTO, models.TipoMoneda.DOLARES)
     
-    total_tarjetas_ars = sum(p.monto for p in pagos_tarjetas)
+    total_tarjetas_ars = _sumar(filas, acumulados.ORIGEN_PAGO_TARJETA, models.TipoMoneda.PESOS)
     total_tarjetas_usd = 0  # Asumiendo que los pagos de tarjeta están en la misma moneda de la tarjeta
     
-    total_prestamos_ars = sum(p.monto for p in pagos_prestamos)
+    total_prestamos_ars = _sumar(filas, acumulados.ORIGEN_PAGO_PRESTAMO, models.TipoMoneda.PESOS)
     total_prestamos_usd = 0
     
     # Agrupar por tipo de gasto
-    gastos_fijos = [g for g in gastos if g.tipo == models.TipoGasto.FIJO]
-    gastos_ordinarios = [g for g in gastos if g.tipo == models.TipoGasto.ORDINARIO]
-    gastos_extraordinarios = [g for g in gastos if g.tipo == models.TipoGasto.EXTRAORDINARIO]
+    por_tipo = {}
+    for clave, tipo in (("fijos", models.TipoGasto.FIJO), ("ordinarios", models.TipoGasto.ORDINARIO), ("extraordinarios", models.TipoGasto.EXTRAORDINARIO)):
+        por_tipo[clave] = {
+            "cantidad": _contar(filas, acumulados.ORIGEN_GASTO, tipo.value),
+            "total_ars": _sumar(filas, acumulados.ORIGEN_GASTO, models.TipoMoneda.PESOS, tipo.value),
+            "total_usd": _sumar(filas, acumulados.ORIGEN_GASTO, models.TipoMoneda.DOLARES, tipo.value)
+        }
     
-    return {
+    resultado = {
         "ano": ano,
         "mes": mes,
         "totales": {
@@ -54,44 +64,37 @@ def egresos_mensuales(db: Session, ano: int, mes: int) -> Dict:
             "total_egresos_ars": total_gastos_ars + total_tarjetas_ars + total_prestamos_ars,
             "total_egresos_usd": total_gastos_usd + total_tarjetas_usd + total_prestamos_usd
         },
-        "por_tipo": {
-            "fijos": {
-                "cantidad": len(gastos_fijos),
-                "total_ars": sum(g.monto for g in gastos_fijos if g.moneda == models.TipoMoneda.PESOS),
-                "total_usd": sum(g.monto for g in gastos_fijos if g.moneda == models.TipoMoneda.DOLARES)
-            },
-            "ordinarios": {
-                "cantidad": len(gastos_ordinarios),
-                "total_ars": sum(g.monto for g in gastos_ordinarios if g.moneda == models.TipoMoneda.PESOS),
-                "total_usd": sum(g.monto for g in gastos_ordinarios if g.moneda == models.TipoMoneda.DOLARES)
-            },
-            "extraordinarios": {
-                "cantidad": len(gastos_extraordinarios),
-                "total_ars": sum(g.monto for g in gastos_extraordinarios if g.moneda == models.TipoMoneda.PESOS),
-                "total_usd": sum(g.monto for g in gastos_extraordinarios if g.moneda == models.TipoMoneda.DOLARES)
-            }
-        },
-        "detalle": {
+        "por_tipo": por_tipo
+    }
+    
+    if incluir_detalle:
+        inicio, fin = _rango_mes(ano, mes)
+        gastos = db.query(models.Gasto).filter(
+            and_(models.Gasto.fecha >= inicio, models.Gasto.fecha <= fin)
+        ).all()
+        pagos_tarjetas = db.query(models.PagoTarjeta).filter(
+            and_(models.PagoTarjeta.fecha_pago >= inicio, models.PagoTarjeta.fecha_pago <= fin)
+        ).all()
+        pagos_prestamos = db.query(models.PagoPrestamo).filter(
+            and_(models.PagoPrestamo.fecha_pago >= inicio, models.PagoPrestamo.fecha_pago <= fin)
+        ).all()
+        resultado["detalle"] = {
             "gastos": [{"id": g.id, "fecha": g.fecha.isoformat(), "monto": g.monto, "moneda": g.moneda.value, "tipo": g.tipo.value, "categoria": g.categoria, "descripcion": g.descripcion} for g in gastos],
             "pagos_tarjetas": [{"id": p.id, "fecha": p.fecha_pago.isoformat(), "monto": p.monto, "descripcion": p.descripcion} for p in pagos_tarjetas],
             "pagos_prestamos": [{"id": p.id, "fecha": p.fecha_pago.isoformat(), "monto": p.monto, "descripcion": p.descripcion} for p in pagos_prestamos]
         }
-    }
+    
+    return resultado
 
 
-def saldos_positivos(db: Session, ano: int, mes: int) -> Dict:
+@cache_resultados.cacheado(TABLAS_SALDOS)
+def saldos_positivos(db: Session, ano: int, mes: int, incluir_detalle: bool = True) -> Dict:
     """Genera reporte de saldos positivos (ingresos - egresos)"""
-    ingresos = db.query(models.Ingreso).filter(
-        and_(
-            extract('year', models.Ingreso.fecha) == ano,
-            extract('month', models.Ingreso.fecha) == mes
-        )
-    ).all()
+    filas = acumulados.filas_mes(db, ano, mes)
+    egresos_data = egresos_mensuales(db, ano, mes, incluir_detalle=False)
     
-    egresos_data = egresos_mensuales(db, ano, mes)
-    
-    total_ingresos_ars = sum(i.monto for i in ingresos if i.moneda == models.TipoMoneda.PESOS)
-    total_ingresos_usd = sum(i.monto for i in ingresos if i.moneda == models.TipoMoneda.DOLARES)
+    total_ingresos_ars = _sumar(filas, acumulados.ORIGEN_INGRESO, models.TipoMoneda.PESOS)
+    total_ingresos_usd = _sumar(filas, acumulados.ORIGEN_INGRESO, models.TipoMoneda.DOLARES)
     
     total_egresos_ars = egresos_data["totales"]["total_egresos_ars"]
     total_egresos_usd = egresos_data["totales"]["total_egresos_usd"]
@@ -101,25 +104,33 @@ def saldos_positivos(db: Session, ano: int, mes: int) -> Dict:
     
     # Agrupar ingresos por tipo
     ingresos_por_tipo = {}
-    for ingreso in ingresos:
-        tipo = ingreso.tipo.value
-        if tipo not in ingresos_por_tipo:
-            ingresos_por_tipo[tipo] = {"ars": 0, "usd": 0, "cantidad": 0}
-        if ingreso.moneda == models.TipoMoneda.PESOS:
-            ingresos_por_tipo[tipo]["ars"] += ingreso.monto
+    for fila in filas:
+        if fila.origen != acumulados.ORIGEN_INGRESO or not fila.cantidad:
+            continue
+        if fila.tipo not in ingresos_por_tipo:
+            ingresos_por_tipo[fila.tipo] = {"ars": 0, "usd": 0, "cantidad": 0}
+        if fila.moneda == models.TipoMoneda.PESOS:
+            ingresos_por_tipo[fila.tipo]["ars"] += fila.total
         else:
-            ingresos_por_tipo[tipo]["usd"] += ingreso.monto
-        ingresos_por_tipo[tipo]["cantidad"] += 1
+            ingresos_por_tipo[fila.tipo]["usd"] += fila.total
+        ingresos_por_tipo[fila.tipo]["cantidad"] += fila.cantidad
+    
+    ingresos = {
+        "total_ars": total_ingresos_ars,
+        "total_usd": total_ingresos_usd,
+        "por_tipo": ingresos_por_tipo
+    }
+    if incluir_detalle:
+        inicio, fin = _rango_mes(ano, mes)
+        detalle = db.query(models.Ingreso).filter(
+            and_(models.Ingreso.fecha >= inicio, models.Ingreso.fecha <= fin)
+        ).all()
+        ingresos["detalle"] = [{"id": i.id, "fecha": i.fecha.isoformat(), "monto": i.monto, "moneda": i.moneda.value, "tipo": i.tipo.value, "descripcion": i.descripcion} for i in detalle]
     
     return {
         "ano": ano,
         "mes": mes,
-        "ingresos": {
-            "total_ars": total_ingresos_ars,
-            "total_usd": total_ingresos_usd,
-            "por_tipo": ingresos_por_tipo,
-            "detalle": [{"id": i.id, "fecha": i.fecha.isoformat(), "monto": i.monto, "moneda": i.moneda.value, "tipo": i.tipo.value, "descripcion": i.descripcion} for i in ingresos]
-        },
+        "ingresos": ingresos,
         "egresos": {
             "total_ars": total_egresos_ars,
             "total_usd": total_egresos_usd
@@ -132,6 +143,7 @@ def saldos_positivos(db: Session, ano: int, mes: int) -> Dict:
     }
 
 
+@cache_resultados.cacheado(TABLAS_RESUMEN)
 def resumen_mensual(db: Session, ano: int, mes: int) -> Dict:
     """Genera un resumen completo del mes"""
     saldos = saldos_positivos(db, ano, mes)
@@ -161,11 +173,162 @@ def resumen_mensual(db: Session, ano: int, mes: int) -> Dict:
     }
 
 
-
-
-
-
-
-
-
-
+def proyecciones_tarjetas(db: Session, meses: int = 6) -> List[Dict]:
+    """Proyección de los pagos de tarjetas para los próximos `meses` meses"""
+    hoy = date.today()
+    tarjetas = db.query(models.TarjetaCredito).filter(models.TarjetaCredito.saldo_actual > 0).all()
+    
+    if not tarjetas:
+        return []
+    
+    proyecciones_por_mes = {}
+    
+    for mes_offset in range(meses):
+        # Calcular fecha del mes objetivo
+        mes_objetivo = hoy.month + mes_offset
+        ano_objetivo = hoy.year
+        
+        while mes_objetivo > 12:
+            mes_objetivo -= 12
+            ano_objetivo += 1
+        
+        mes_key = f"{ano_objetivo}-{mes_objetivo:02d}"
+        
+        if mes_key not in proyecciones_por_mes:
+            proyecciones_por_mes[mes_key] = {
+                "mes": mes_key,
+                "fecha_vencimiento": None,
+                "cantidad_cuotas": 0,
+                "total_ars": 0,
+                "total_usd": 0,
+                "detalle": []
+            }
+        
+        for tarjeta in tarjetas:
+            # Calcular fecha de cierre para este mes
+            ultimo_dia_mes = monthrange(ano_objetivo, mes_objetivo)[1]
+            dia_cierre = min(tarjeta.fecha_cierre, ultimo_dia_mes)
+            fecha_cierre = date(ano_objetivo, mes_objetivo, dia_cierre)
+            
+            # Calcular fecha de vencimiento (días después del cierre)
+            dias_hasta_vencimiento = tarjeta.fecha_vencimiento - tarjeta.fecha_cierre
+            if dias_hasta_vencimiento < 0:
+                # Si el vencimiento es antes del cierre, es del mes siguiente
+                if mes_objetivo == 12:
+                    fecha_vencimiento = date(ano_objetivo + 1, 1, min(tarjeta.fecha_vencimiento, 31))
+                else:
+                    ultimo_dia_sig = monthrange(ano_objetivo, mes_objetivo + 1)[1]
+                    fecha_vencimiento = date(ano_objetivo, mes_objetivo + 1, min(tarjeta.fecha_vencimiento, ultimo_dia_sig))
+            else:
+                fecha_vencimiento = fecha_cierre + timedelta(days=dias_hasta_vencimiento)
+                # Ajustar si se pasa del mes
+                if fecha_vencimiento.month != mes_objetivo:
+                    if mes_objetivo == 12:
+                        ultimo_dia_sig = monthrange(ano_objetivo + 1, 1)[1]
+                        fecha_vencimiento = date(ano_objetivo + 1, 1, min(tarjeta.fecha_vencimiento, ultimo_dia_sig))
+                    else:
+                        ultimo_dia_sig = monthrange(ano_objetivo, mes_objetivo + 1)[1]
+                        fecha_vencimiento = date(ano_objetivo, mes_objetivo + 1, min(tarjeta.fecha_vencimiento, ultimo_dia_sig))
+            
+            # Obtener gastos del período (desde el cierre anterior hasta el cierre actual)
+            if mes_offset == 0:
+                # Para el mes actual, usar gastos desde el inicio del mes
+                fecha_inicio_periodo = date(ano_objetivo, mes_objetivo, 1)
+            else:
+                # Para meses futuros, calcular desde el cierre del mes anterior
+                mes_anterior = mes_objetivo - 1
+                ano_anterior = ano_objetivo
+                if mes_anterior == 0:
+                    mes_anterior = 12
+                    ano_anterior -= 1
+                ultimo_dia_ant = monthrange(ano_anterior, mes_anterior)[1]
+                dia_cierre_ant = min(tarjeta.fecha_cierre, ultimo_dia_ant)
+                fecha_inicio_periodo = date(ano_anterior, mes_anterior, dia_cierre_ant) + timedelta(days=1)
+            
+            fecha_fin_periodo = fecha_cierre
+            
+            # Obtener gastos del período (asumiendo que los gastos tienen una relación con las tarjetas)
+            # Por ahora, usaremos el saldo actual como estimación
+            gastos_periodo = db.query(models.Gasto).filter(
+                models.Gasto.fecha >= fecha_inicio_periodo,
+                models.Gasto.fecha <= fecha_fin_periodo
+            ).all()
+            
+            # Filtrar gastos que podrían ser de esta tarjeta (por ahora todos)
+            gastos_tarjeta = [g for g in gastos_periodo if g.moneda == tarjeta.moneda]
+            total_gastos_periodo = sum(g.monto for g in gastos_tarjeta)
+            
+            # Calcular desglose de cuota (similar al de préstamos)
+            # Valores por defecto para tarjetas
+            tasa_interes_anual = 90.0  # Tasa típica en Argentina
+            tasa_interes_mensual = 7.5
+            impuesto_iva = 21.0
+            gastos_administrativos = 1000.0
+            
+            # Calcular intereses sobre el saldo pendiente
+            saldo_para_calculo = tarjeta.saldo_actual + total_gastos_periodo
+            intereses = (saldo_para_calculo * tasa_interes_mensual / 100.0) if tasa_interes_mensual > 0 else 0.0
+            iva_intereses = (intereses * impuesto_iva / 100.0) if intereses > 0 else 0.0
+            iva_gastos_admin = (gastos_administrativos * impuesto_iva / 100.0) if gastos_administrativos > 0 else 0.0
+            
+            # Calcular monto total de la cuota
+            capital = saldo_para_calculo
+            total_impuestos = iva_intereses + iva_gastos_admin
+            total_cargos = intereses + gastos_administrativos + total_impuestos
+            monto_total = capital + total_cargos
+            
+            # Solo agregar si hay algo que pagar
+            if monto_total > 0:
+                detalle = {
+                    "tarjeta_id": tarjeta.id,
+                    "tarjeta_nombre": tarjeta.nombre,
+                    "tarjeta_banco": tarjeta.banco,
+                    "fecha_cierre": fecha_cierre.isoformat(),
+                    "fecha_vencimiento": fecha_vencimiento.isoformat(),
+                    "monto_estimado": monto_total,
+                    "moneda": tarjeta.moneda.value,
+                    "periodo_cierre": {
+                        "fecha_inicio": fecha_inicio_periodo.isoformat(),
+                        "fecha_fin": fecha_fin_periodo.isoformat()
+                    },
+                    "gastos": [{
+                        "id": g.id,
+                        "fecha": g.fecha.isoformat(),
+                        "monto": g.monto,
+                        "tipo": g.tipo.value,
+                        "categoria": g.categoria,
+                        "descripcion": g.descripcion
+                    } for g in gastos_tarjeta],
+                    "total_gastos_periodo": total_gastos_periodo,
+                    "cantidad_gastos": len(gastos_tarjeta),
+                    "desglose": {
+                        "monto_total": monto_total,
+                        "capital": capital,
+                        "intereses": intereses,
+                        "iva_intereses": iva_intereses,
+                        "impuesto_ganancias": 0.0,
+                        "gastos_administrativos": gastos_administrativos,
+                        "iva_gastos_admin": iva_gastos_admin,
+                        "otros_impuestos": 0.0,
+                        "total_impuestos": total_impuestos,
+                        "total_cargos": total_cargos
+                    }
+                }
+                
+                proyecciones_por_mes[mes_key]["detalle"].append(detalle)
+                proyecciones_por_mes[mes_key]["cantidad_cuotas"] += 1
+                
+                if tarjeta.moneda == models.TipoMoneda.PESOS:
+                    proyecciones_por_mes[mes_key]["total_ars"] += monto_total
+                else:
+                    proyecciones_por_mes[mes_key]["total_usd"] += monto_total
+                
+                # Establecer fecha de vencimiento (la más temprana del mes)
+                if not proyecciones_por_mes[mes_key]["fecha_vencimiento"] or fecha_vencimiento < date.fromisoformat(proyecciones_por_mes[mes_key]["fecha_vencimiento"]):
+                    proyecciones_por_mes[mes_key]["fecha_vencimiento"] = fecha_vencimiento.isoformat()
+    
+    # Convertir a lista y ordenar por mes
+    resultado = list(proyecciones_por_mes.values())
+    resultado.sort(key=lambda x: x["mes"])
+    
+    return resultado
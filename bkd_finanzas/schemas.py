@@ -1,7 +1,7 @@
 from pydantic import BaseModel, ConfigDict, model_validator
 from datetime import date
-from typing import Optional
-from models import TipoIngreso, TipoGasto, TipoMoneda
+from typing import List, Optional
+from models import TipoIngreso, TipoGasto, TipoMoneda, SistemaAmortizacion
 
 
 # ========== INGRESOS ==========
@@ -31,6 +31,22 @@ class Ingreso(IngresoBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class IngresoModificacion(IngresoUpdate):
+    id: int
+
+
+class IngresosLote(BaseModel):
+    crear: List[IngresoCreate] = []
+    modificar: List[IngresoModificacion] = []
+    eliminar: List[int] = []
+
+
+class IngresosLoteResultado(BaseModel):
+    creados: List[Ingreso]
+    modificados: List[Ingreso]
+    eliminados: List[int]
+
+
 # ========== GASTOS ==========
 class GastoBase(BaseModel):
     fecha: date
@@ -60,6 +76,22 @@ class Gasto(GastoBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class GastoModificacion(GastoUpdate):
+    id: int
+
+
+class GastosLote(BaseModel):
+    crear: List[GastoCreate] = []
+    modificar: List[GastoModificacion] = []
+    eliminar: List[int] = []
+
+
+class GastosLoteResultado(BaseModel):
+    creados: List[Gasto]
+    modificados: List[Gasto]
+    eliminados: List[int]
+
+
 # ========== TARJETAS DE CRÉDITO ==========
 class TarjetaCreditoBase(BaseModel):
     nombre: str
@@ -138,6 +170,9 @@ class PrestamoBase(BaseModel):
     fecha_inicio: date
     fecha_vencimiento: Optional[date] = None
     cuota_mensual: Optional[float] = None
+    sistema_amortizacion: Optional[SistemaAmortizacion] = SistemaAmortizacion.FRANCES
+    cantidad_cuotas: Optional[int] = None
+    valor_uva_inicial: Optional[float] = None
     descripcion: Optional[str] = None
 
 
@@ -162,6 +197,10 @@ class PrestamoUpdate(BaseModel):
     fecha_inicio: Optional[date] = None
     fecha_vencimiento: Optional[date] = None
     cuota_mensual: Optional[float] = None
+    sistema_amortizacion: Optional[SistemaAmortizacion] = None
+    cantidad_cuotas: Optional[int] = None
+    valor_uva_inicial: Optional[float] = None
+    impuesto_sellos: Optional[float] = None
     monto_pagado: Optional[float] = None
     activo: Optional[bool] = None
     descripcion: Optional[str] = None
@@ -191,6 +230,14 @@ class DesgloseCuotaPrestamo(BaseModel):
     descripcion: Optional[str] = None
 
 
+class CuotaPrestamo(DesgloseCuotaPrestamo):
+    id: int
+    saldo_capital: float
+    adelanto_capital: Optional[float] = 0.0
+    pagada: bool
+    model_config = ConfigDict(from_attributes=True)
+
+
 class PagoPrestamoCreate(BaseModel):
     prestamo_id: int
     fecha_pago: date
@@ -198,6 +245,12 @@ class PagoPrestamoCreate(BaseModel):
     descripcion: Optional[str] = None
 
 
+class PagoPrestamo(PagoPrestamoCreate):
+    id: int
+    created_at: date
+    model_config = ConfigDict(from_attributes=True)
+
+
 # ========== INVERSIONES ==========
 class InversionBase(BaseModel):
     nombre: str
@@ -0,0 +1,53 @@
+"""
+Serialización rápida para los endpoints de listado.
+
+En lugar de cargar objetos ORM y validarlos fila por fila con pydantic, se
+seleccionan solo las columnas del schema de respuesta como tuplas y se arma
+el JSON directamente con orjson (las filas vienen de la base, ya son válidas).
+"""
+from fastapi.responses import Response
+from sqlalchemy import select
+from typing import Any, Dict, List, Sequence, Tuple
+import orjson
+
+
+class ORJSONResponse(Response):
+    """Respuesta JSON codificada con orjson (fechas y enums sin pasar por jsonable_encoder)"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def campos_de(schema) -> Tuple[str, ...]:
+    """Nombres de los campos del schema pydantic de respuesta"""
+    return tuple(schema.model_fields)
+
+
+def consulta_columnas(modelo, schema):
+    """SELECT con solo las columnas que expone el schema (sin instanciar objetos ORM)"""
+    campos = campos_de(schema)
+    return campos, select(*(getattr(modelo, campo) for campo in campos))
+
+
+def a_diccionarios(campos: Sequence[str], filas) -> List[Dict]:
+    return [dict(zip(campos, fila)) for fila in filas]
+
+
+def listar(db, modelo, schema, consulta=None) -> ORJSONResponse:
+    """Ejecuta el listado y devuelve la respuesta ya codificada.
+
+    `consulta` permite agregar filtros, orden o paginación al SELECT base.
+    """
+    campos, stmt = consulta_columnas(modelo, schema)
+    if consulta is not None:
+        stmt = consulta(stmt)
+    return ORJSONResponse(a_diccionarios(campos, db.execute(stmt)))
+
+
+async def listar_async(db, modelo, schema, consulta=None) -> ORJSONResponse:
+    """Versión para AsyncSession"""
+    campos, stmt = consulta_columnas(modelo, schema)
+    if consulta is not None:
+        stmt = consulta(stmt)
+    return ORJSONResponse(a_diccionarios(campos, await db.execute(stmt)))
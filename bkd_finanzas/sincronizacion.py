@@ -0,0 +1,201 @@
+"""
+Sincronización incremental (/api/sync).
+
+Cada transacción que escribe filas sincronizables toma, antes de su primera
+escritura, el siguiente número de un contador (fila SECUENCIA_SYNC de
+versiones_tablas) y todas las filas que inserta o modifica quedan con ese
+número en version_sync (default y onupdate de la columna, también en los
+INSERT/UPDATE masivos). Cada baja deja una fila en `eliminaciones`, con su
+número, tanto si se borra un objeto ORM como con delete(...).
+
+El incremento toma el lock del contador hasta el commit (en SQLite las
+sesiones de escritura ya empiezan con BEGIN IMMEDIATE), así que los números
+siguen el orden de confirmación: quien lee el contador sabe que todas las
+transacciones hasta ese número ya están confirmadas. El cursor es ese
+número; una importación larga que confirma tarde recibe un número mayor que
+el de cualquier consulta anterior y no se pierde.
+
+Las respuestas se paginan (PAGINA filas): mientras "mas" sea true el cursor
+es de continuación y el cliente lo vuelve a pedir; las bajas llegan en la
+primera página y se aplican antes que los cambios.
+"""
+from sqlalchemy import delete, event, func, insert, select, update
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+import os
+import models
+
+PAGINA = int(os.environ.get("FINANZAS_SYNC_PAGINA", "5000"))
+# Las bajas más viejas se depuran; un cursor anterior obliga al cliente a sincronizar todo
+RETENCION = timedelta(days=int(os.environ.get("FINANZAS_SYNC_RETENCION_DIAS", "90")))
+# Número de la última baja depurada (en versiones_tablas, como el contador)
+DEPURADO_SYNC = "_sync_depurado"
+
+# Entidades que se sincronizan (las tablas derivadas se recalculan en el servidor)
+MODELOS = (
+    models.Ingreso, models.Gasto, models.TarjetaCredito, models.PagoTarjeta,
+    models.DesgloseCuotaTarjeta, models.Prestamo, models.PagoPrestamo,
+    models.DesgloseCuotaPrestamo, models.Inversion, models.ProyeccionPago,
+    models.Cotizacion, models.IndicePrecios,
+)
+TABLAS = {modelo.__tablename__: modelo.__table__ for modelo in MODELOS}
+TABLA_ELIMINACIONES = models.Eliminacion.__table__
+TABLA_VERSIONES = models.VersionTabla.__table__
+
+
+def _numerar(session: Session):
+    """Toma el próximo número de sincronización (una vez por transacción, antes de escribir)"""
+    if session.info.get("sync_numerada"):
+        return
+    session.info["sync_numerada"] = True
+    conn = session.connection()
+    actualizadas = conn.execute(
+        update(TABLA_VERSIONES)
+        .where(TABLA_VERSIONES.c.tabla == models.SECUENCIA_SYNC)
+        .values(version=TABLA_VERSIONES.c.version + 1)
+    ).rowcount
+    if not actualizadas:
+        conn.execute(insert(TABLA_VERSIONES).values(tabla=models.SECUENCIA_SYNC, version=1))
+
+
+@event.listens_for(Session, "before_flush")
+def _antes_de_flush(session, contexto, instancias):
+    objetos = (*session.new, *session.dirty, *session.deleted)
+    if any(getattr(o, "__tablename__", None) in TABLAS for o in objetos):
+        _numerar(session)
+
+
+@event.listens_for(Session, "after_flush")
+def _bajas_orm(session, contexto):
+    filas = [
+        {"tabla": o.__tablename__, "fila_id": o.id}
+        for o in session.deleted if getattr(o, "__tablename__", None) in TABLAS
+    ]
+    if filas:
+        session.connection().execute(insert(TABLA_ELIMINACIONES), filas)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _al_ejecutar(estado):
+    if not (estado.is_insert or estado.is_update or estado.is_delete):
+        return
+    tabla = getattr(estado.statement, "table", None)
+    if tabla is None or tabla.name not in TABLAS:
+        return
+    _numerar(estado.session)
+    if not estado.is_delete:
+        return
+    consulta = select(tabla.c.id)
+    if estado.statement.whereclause is not None:
+        consulta = consulta.where(estado.statement.whereclause)
+    conn = estado.session.connection()
+    filas = [{"tabla": tabla.name, "fila_id": i} for i in conn.execute(consulta).scalars()]
+    if filas:
+        conn.execute(insert(TABLA_ELIMINACIONES), filas)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _fin_de_transaccion(session, transaccion):
+    if transaccion.parent is None:
+        session.info.pop("sync_numerada", None)
+
+
+def _contador(db: Session, nombre: str) -> int:
+    return db.execute(select(TABLA_VERSIONES.c.version).where(TABLA_VERSIONES.c.tabla == nombre)).scalar() or 0
+
+
+def inicializar(db: Session):
+    """Al arrancar: numera las filas previas a la columna (como 0) y depura bajas viejas"""
+    for nombre in (models.SECUENCIA_SYNC, DEPURADO_SYNC):
+        if db.execute(select(TABLA_VERSIONES.c.tabla).where(TABLA_VERSIONES.c.tabla == nombre)).first() is None:
+            db.execute(insert(TABLA_VERSIONES).values(tabla=nombre, version=0))
+    marca = models.ahora()
+    for tabla in (*TABLAS.values(), TABLA_ELIMINACIONES):
+        if db.execute(select(tabla.c.id).where(tabla.c.version_sync.is_(None)).limit(1)).first():
+            db.execute(update(tabla).where(tabla.c.version_sync.is_(None)).values(version_sync=0))
+
+    viejas = TABLA_ELIMINACIONES.c.eliminado_at < marca - RETENCION
+    depurado = db.execute(select(func.max(TABLA_ELIMINACIONES.c.version_sync)).where(viejas)).scalar()
+    if depurado is not None:
+        db.execute(
+            update(TABLA_VERSIONES)
+            .where(TABLA_VERSIONES.c.tabla == DEPURADO_SYNC)
+            .values(version=func.max(TABLA_VERSIONES.c.version, depurado))
+        )
+        db.execute(delete(TABLA_ELIMINACIONES).where(viejas))
+    db.commit()
+
+
+def leer_cursor(texto: Optional[str]) -> Optional[Tuple[int, int, int, int]]:
+    """(desde, hasta, tabla, último id) de un cursor; None para sincronizar todo.
+
+    Un cursor completo es el número de sincronización ("123"); uno de
+    continuación trae además la posición ("desde:hasta:tabla:id", desde -1 si
+    es la sincronización completa). Los cursores con fecha (formato anterior)
+    piden sincronizar todo. ValueError si no es ninguno de los dos.
+    """
+    if not texto:
+        return None
+    try:
+        datetime.fromisoformat(texto)
+        return None
+    except ValueError:
+        pass
+    partes = [int(parte) for parte in texto.split(":")]
+    if len(partes) == 1 and partes[0] >= 0:
+        return partes[0], -1, 0, 0
+    if len(partes) == 4 and partes[1] >= 0 and 0 <= partes[2] <= len(TABLAS):
+        return partes[0], partes[1], partes[2], partes[3]
+    raise ValueError(texto)
+
+
+def cambios(db: Session, cursor: Optional[Tuple[int, int, int, int]] = None, limite: int = PAGINA) -> Dict:
+    """Una página de filas cambiadas y bajas posteriores al cursor (todo, si no hay o es muy viejo)"""
+    desde, hasta, indice, ultimo_id = cursor or (-1, -1, 0, 0)
+    primera = indice == 0 and ultimo_id == 0
+    reiniciar = False
+    if hasta < 0:
+        # Las transacciones hasta `hasta` ya están confirmadas; lo posterior entra en la próxima
+        hasta = _contador(db, models.SECUENCIA_SYNC)
+        if desde >= 0 and desde < _contador(db, DEPURADO_SYNC):
+            desde = -1
+            reiniciar = True
+
+    nombres = list(TABLAS)
+    cambiadas = {}
+    restantes = limite
+    while indice < len(nombres) and restantes > 0:
+        tabla = TABLAS[nombres[indice]]
+        consulta = select(tabla).where(tabla.c.id > ultimo_id)
+        if desde >= 0:
+            consulta = consulta.where(tabla.c.version_sync > desde, tabla.c.version_sync <= hasta)
+        else:
+            consulta = consulta.where(func.coalesce(tabla.c.version_sync, 0) <= hasta)
+        filas = db.execute(consulta.order_by(tabla.c.id).limit(restantes)).mappings().all()
+        if filas:
+            cambiadas.setdefault(nombres[indice], []).extend(dict(fila) for fila in filas)
+        if len(filas) < restantes:
+            indice += 1
+            ultimo_id = 0
+        else:
+            ultimo_id = filas[-1]["id"]
+        restantes -= len(filas)
+
+    eliminadas: Dict[str, list] = {}
+    if desde >= 0 and primera:
+        bajas = db.execute(
+            select(TABLA_ELIMINACIONES.c.tabla, TABLA_ELIMINACIONES.c.fila_id)
+            .where(TABLA_ELIMINACIONES.c.version_sync > desde, TABLA_ELIMINACIONES.c.version_sync <= hasta)
+        )
+        for nombre, fila_id in bajas:
+            eliminadas.setdefault(nombre, []).append(fila_id)
+
+    mas = indice < len(nombres)
+    return {
+        "cursor": f"{desde}:{hasta}:{indice}:{ultimo_id}" if mas else str(hasta),
+        "mas": mas,
+        "reiniciar": primera and (reiniciar or desde < 0),
+        "cambios": cambiadas,
+        "eliminados": eliminadas,
+    }
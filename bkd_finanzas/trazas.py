@@ -0,0 +1,125 @@
+"""
+Trazas por etapas de la importación de liquidaciones.
+
+traza() abre la traza de una operación y span() mide cada etapa dentro de
+ella (se pueden anidar). Fuera de una traza span() no hace nada, así que las
+funciones de pdf_processor se pueden llamar igual desde scripts. Cada span
+guarda su duración, los atributos que se le anoten (páginas, bytes,
+movimientos) y, si hay un request medido, las consultas y el tiempo en la base
+de esa etapa.
+
+Al cerrar, la traza se agrega como una línea JSON a ARCHIVO, si está configurado.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+import os
+import threading
+import time
+import uuid
+import orjson
+import metricas
+
+# JSON-lines donde se exportan las trazas (sin definir o vacío: no se guardan). El archivo
+# solo crece: rotarlo por fuera (logrotate con copytruncate)
+ARCHIVO = os.environ.get("FINANZAS_TRAZAS_ARCHIVO", "")
+
+_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("nombre", "inicio", "fin", "atributos", "hijos")
+
+    def __init__(self, nombre: str, atributos: Dict):
+        self.nombre = nombre
+        self.inicio = time.perf_counter()
+        self.fin: Optional[float] = None
+        self.atributos = atributos
+        self.hijos: List["Span"] = []
+
+    def anotar(self, **atributos):
+        self.atributos.update(atributos)
+
+    def a_diccionario(self, origen: float) -> Dict:
+        return {
+            "nombre": self.nombre,
+            "desde_ms": round((self.inicio - origen) * 1000, 3),
+            "duracion_ms": round(((self.fin or time.perf_counter()) - self.inicio) * 1000, 3),
+            "atributos": self.atributos,
+            "hijos": [hijo.a_diccionario(origen) for hijo in self.hijos],
+        }
+
+
+_actual: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+
+
+@contextmanager
+def _medir(span: Span):
+    medicion = metricas.actual()
+    consultas, tiempo_sql = (medicion.consultas, medicion.tiempo_sql) if medicion else (0, 0.0)
+    token = _actual.set(span)
+    try:
+        yield span
+    except Exception as e:
+        span.anotar(error=str(e))
+        raise
+    finally:
+        span.fin = time.perf_counter()
+        _actual.reset(token)
+        if medicion is not None and medicion.consultas > consultas:
+            span.anotar(
+                consultas=medicion.consultas - consultas,
+                sql_ms=round((medicion.tiempo_sql - tiempo_sql) * 1000, 3),
+            )
+
+
+@contextmanager
+def span(nombre: str, **atributos):
+    """Mide una etapa de la traza en curso (no hace nada si no hay traza)"""
+    padre = _actual.get()
+    if padre is None:
+        yield None
+        return
+    hijo = Span(nombre, atributos)
+    padre.hijos.append(hijo)
+    with _medir(hijo):
+        yield hijo
+
+
+def anotar(**atributos):
+    """Agrega atributos al span en curso"""
+    actual = _actual.get()
+    if actual is not None:
+        actual.anotar(**atributos)
+
+
+class Traza:
+    def __init__(self, nombre: str, atributos: Dict):
+        self.id = uuid.uuid4().hex
+        self.momento = datetime.now()
+        self.raiz = Span(nombre, atributos)
+
+    def a_diccionario(self) -> Dict:
+        return {"traza_id": self.id, "momento": self.momento.isoformat(timespec="milliseconds"),
+                **self.raiz.a_diccionario(self.raiz.inicio)}
+
+
+@contextmanager
+def traza(nombre: str, **atributos):
+    """Abre una traza; al salir (también con error) la exporta a ARCHIVO"""
+    nueva = Traza(nombre, atributos)
+    try:
+        with _medir(nueva.raiz):
+            yield nueva
+    finally:
+        exportar(nueva)
+
+
+def exportar(nueva: Traza, ruta: Optional[str] = None):
+    ruta = ruta if ruta is not None else ARCHIVO
+    if not ruta:
+        return
+    linea = orjson.dumps(nueva.a_diccionario(), option=orjson.OPT_NON_STR_KEYS) + b"\n"
+    with _lock, open(ruta, "ab") as archivo:
+        archivo.write(linea)
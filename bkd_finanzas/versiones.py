@@ -0,0 +1,227 @@
+"""
+Versiones de datos por tabla.
+
+Cada transacción que escribe incrementa, al confirmar, el contador de las
+tablas que tocó (objetos ORM y sentencias insert/update/delete). Con esas
+versiones se arman los ETag de los GET: si ninguna tabla de la que depende
+una ruta cambió, el ETag es el mismo y se responde 304 sin ir a la base.
+
+Con varios procesos (workers) cada uno conoce solo sus propias escrituras;
+revalidar() detecta en O(1) si otro proceso confirmó algo (PRAGMA data_version
+en SQLite, suma de versiones en otras bases) y solo entonces relee la tabla.
+"""
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+from datetime import date
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+import hashlib
+import secrets
+import threading
+import models
+
+TABLA_VERSIONES = models.VersionTabla.__table__
+# Fila con un número al azar que identifica a la base: una base recreada o nueva
+# en la misma ruta vuelve a contar desde cero, pero con otra identidad
+IDENTIDAD = "_identidad"
+
+# Tablas de las que depende cada ruta (por prefijo, la más específica primero);
+# las rutas sin entrada dependen de todas las tablas
+TABLAS_POR_RUTA: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("/api/ingresos", ("ingresos",)),
+    ("/api/gastos", ("gastos",)),
+    ("/api/tarjetas", ("tarjetas_credito",)),
+    ("/api/prestamos", ("prestamos", "pagos_prestamo", "desglose_cuota_prestamo")),
+    ("/api/inversiones", ("inversiones",)),
+    ("/api/proyecciones/tarjetas", ("tarjetas_credito", "gastos")),
+    ("/api/proyecciones", ("proyecciones_pago",)),
+    ("/api/cotizaciones", ("cotizaciones",)),
+)
+
+# Versiones conocidas por este proceso (se actualizan al confirmar cada escritura)
+_versiones: Dict[str, int] = {}
+_lock = threading.Lock()
+# Funciones que reciben las tablas cuya versión avanzó (escrituras propias o de otros workers)
+_suscriptores: List[Callable[[Set[str]], None]] = []
+
+# Conexión propia para revalidar contra la base (ver iniciar_monitor)
+_monitor = None
+_monitor_sqlite = False
+_huella = None
+_lock_monitor = threading.Lock()
+
+
+def _anotar(session: Session, tablas: Iterable[str]):
+    tablas = {t for t in tablas if t != TABLA_VERSIONES.name}
+    if tablas:
+        session.info.setdefault("tablas_modificadas", set()).update(tablas)
+
+
+@event.listens_for(Session, "after_flush")
+def _despues_de_flush(session, contexto):
+    objetos = (*session.new, *session.dirty, *session.deleted)
+    _anotar(session, (o.__table__.name for o in objetos if hasattr(o, "__table__")))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _al_ejecutar(estado):
+    if estado.is_insert or estado.is_update or estado.is_delete:
+        tabla = getattr(estado.statement, "table", None)
+        if tabla is not None:
+            _anotar(estado.session, [tabla.name])
+
+
+@event.listens_for(Session, "before_commit")
+def _antes_de_commit(session):
+    session.flush()
+    tablas = session.info.pop("tablas_modificadas", None)
+    if not tablas:
+        return
+    conn = session.connection()
+    conn.execute(
+        update(TABLA_VERSIONES)
+        .where(TABLA_VERSIONES.c.tabla.in_(tablas))
+        .values(version=TABLA_VERSIONES.c.version + 1)
+    )
+    nuevas = dict(conn.execute(
+        select(TABLA_VERSIONES.c.tabla, TABLA_VERSIONES.c.version).where(TABLA_VERSIONES.c.tabla.in_(tablas))
+    ).all())
+    faltantes = [{"tabla": t, "version": 1} for t in tablas if t not in nuevas]
+    if faltantes:
+        conn.execute(insert(TABLA_VERSIONES), faltantes)
+        nuevas.update({f["tabla"]: 1 for f in faltantes})
+    session.info["versiones_nuevas"] = nuevas
+
+
+@event.listens_for(Session, "after_commit")
+def _despues_de_commit(session):
+    nuevas = session.info.pop("versiones_nuevas", None)
+    if nuevas:
+        actualizar(nuevas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _despues_de_rollback(session):
+    session.info.pop("tablas_modificadas", None)
+    session.info.pop("versiones_nuevas", None)
+
+
+def actualizar(nuevas: Dict[str, int]):
+    """Registra versiones confirmadas (nunca retrocede si llegan fuera de orden)"""
+    cambiadas = set()
+    with _lock:
+        for tabla, version in nuevas.items():
+            if version > _versiones.get(tabla, 0):
+                _versiones[tabla] = version
+                cambiadas.add(tabla)
+    if cambiadas:
+        for suscriptor in _suscriptores:
+            suscriptor(cambiadas)
+
+
+def al_cambiar(funcion: Callable[[Set[str]], None]):
+    """Registra `funcion` para que reciba las tablas modificadas después de cada commit"""
+    _suscriptores.append(funcion)
+    return funcion
+
+
+def identidad(db: Session) -> int:
+    """Identidad de la base (la crea y confirma si todavía no existe)"""
+    valor = db.execute(select(TABLA_VERSIONES.c.version).where(TABLA_VERSIONES.c.tabla == IDENTIDAD)).scalar()
+    if valor is None:
+        valor = secrets.randbits(31) or 1
+        db.execute(insert(TABLA_VERSIONES).values(tabla=IDENTIDAD, version=valor))
+        db.commit()
+    return valor
+
+
+def conocidas() -> Dict[str, int]:
+    with _lock:
+        return dict(_versiones)
+
+
+def cargar(db: Session):
+    """Lee las versiones guardadas (al arrancar)"""
+    actualizar(dict(db.execute(select(TABLA_VERSIONES.c.tabla, TABLA_VERSIONES.c.version)).all()))
+
+
+def iniciar_monitor(engine):
+    """Reserva una conexión fuera del pool para detectar escrituras de otros procesos.
+
+    Con SQLite en memoria no hay otros procesos y no hace falta.
+    """
+    global _monitor, _monitor_sqlite, _huella
+    if engine.url.get_backend_name() == "sqlite" and (
+        engine.url.database in (None, "", ":memory:") or engine.url.query.get("mode") == "memory"
+    ):
+        return
+    conexion = engine.raw_connection()
+    conexion.detach()
+    with _lock_monitor:
+        _monitor = conexion
+        _monitor_sqlite = engine.url.get_backend_name() == "sqlite"
+        _huella = _leer_huella()
+
+
+def _leer_huella():
+    cursor = _monitor.cursor()
+    try:
+        if _monitor_sqlite:
+            # Cambia cuando cualquier otra conexión (de este u otro proceso) confirma una escritura
+            cursor.execute("PRAGMA data_version")
+        else:
+            cursor.execute(f"SELECT COALESCE(SUM(version), 0) FROM {TABLA_VERSIONES.name}")
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+        if not _monitor_sqlite:
+            _monitor.rollback()
+
+
+def revalidar():
+    """Relee las versiones si la base cambió desde la última vez (una consulta trivial si no)"""
+    global _huella
+    if _monitor is None:
+        return
+    with _lock_monitor:
+        huella = _leer_huella()
+        if huella == _huella:
+            return
+        # La huella se lee antes que las versiones: lo que se confirme en el medio se ve la próxima vez
+        _huella = huella
+        cursor = _monitor.cursor()
+        try:
+            cursor.execute(f"SELECT tabla, version FROM {TABLA_VERSIONES.name}")
+            nuevas = dict(cursor.fetchall())
+        finally:
+            cursor.close()
+            if not _monitor_sqlite:
+                _monitor.rollback()
+    actualizar(nuevas)
+
+
+def versiones_de(tablas: Iterable[str]) -> Tuple[int, ...]:
+    with _lock:
+        return tuple(_versiones.get(t, 0) for t in tablas)
+
+
+def tablas_de_ruta(ruta: str) -> Optional[Tuple[str, ...]]:
+    for prefijo, tablas in TABLAS_POR_RUTA:
+        if ruta == prefijo or ruta.startswith(prefijo + "/"):
+            return tablas
+    return None
+
+
+def etag(ruta: str, parametros: str) -> str:
+    """ETag débil a partir de la ruta, los parámetros, la fecha y las versiones de sus tablas.
+
+    La fecha entra porque alertas, tendencias y proyecciones dependen del día actual.
+    """
+    tablas = tablas_de_ruta(ruta)
+    parametros = "&".join(sorted(p for p in parametros.split("&") if p))
+    with _lock:
+        if tablas is None:
+            versiones = sorted(_versiones.items())
+        else:
+            versiones = [(t, _versiones.get(t, 0)) for t in tablas]
+    clave = f"{ruta}?{parametros}|{date.today().isoformat()}|{versiones}"
+    return 'W/"' + hashlib.sha1(clave.encode("utf-8")).hexdigest() + '"'
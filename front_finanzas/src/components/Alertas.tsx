@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react'
-import { alertasApi, Alerta } from '../services/api'
+import { alertasApi, suscribirEventos, aplicarCambiosAlertas, Alerta } from '../services/api'
 import { useNavigate } from 'react-router-dom'
 
 const Alertas: React.FC = () => {
@@ -10,10 +10,15 @@ const Alertas: React.FC = () => {
   const navigate = useNavigate()
 
   useEffect(() => {
-    cargarAlertas()
-    // Recargar alertas cada 30 segundos
-    const intervalo = setInterval(cargarAlertas, 30000)
-    return () => clearInterval(intervalo)
+    // El servidor manda las alertas al conectarse y después solo los cambios
+    return suscribirEventos({
+      estado: ({ alertas }) => {
+        setAlertas(alertas)
+        setError(null)
+        setLoading(false)
+      },
+      alertas: (cambios) => setAlertas((actuales) => aplicarCambiosAlertas(actuales, cambios)),
+    })
   }, [])
 
   const cargarAlertas = async () => {
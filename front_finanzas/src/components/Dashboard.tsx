@@ -1,14 +1,15 @@
 import React, { useState, useEffect } from 'react'
-import { reportesApi, alertasApi, tarjetasApi, prestamosApi } from '../services/api'
+import { reportesApi, alertasApi, tarjetasApi, prestamosApi, suscribirEventos, aplicarCambiosAlertas, Alerta } from '../services/api'
 import { useNavigate } from 'react-router-dom'
 import { LineChart, Line, BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer } from 'recharts'
 
 const Dashboard: React.FC = () => {
   const [resumen, setResumen] = useState<any>(null)
-  const [alertas, setAlertas] = useState<any[]>([])
+  const [alertas, setAlertas] = useState<Alerta[]>([])
   const [tarjetas, setTarjetas] = useState<any[]>([])
   const [prestamos, setPrestamos] = useState<any[]>([])
   const [tendencias, setTendencias] = useState<any>(null)
+  const [horizonte, setHorizonte] = useState(6)
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState<string | null>(null)
   const navigate = useNavigate()
@@ -21,6 +22,42 @@ const Dashboard: React.FC = () => {
     cargarDatos()
   }, [])
 
+  // Alertas y saldos se actualizan con los eventos del servidor en lugar de recargar
+  useEffect(() => {
+    return suscribirEventos({
+      estado: ({ alertas }) => setAlertas(alertas),
+      alertas: (cambios) => setAlertas((actuales) => aplicarCambiosAlertas(actuales, cambios)),
+      saldo_tarjeta: ({ tarjeta_id, saldo_actual }) =>
+        setTarjetas((actuales) => actuales.map((t) => (t.id === tarjeta_id ? { ...t, saldo_actual } : t))),
+      importacion: () => {
+        reportesApi.resumenMensual(anoActual, mesActual)
+          .then((response) => setResumen(response.data))
+          .catch((err) => console.warn('Error al cargar resumen:', err))
+        tarjetasApi.getAll()
+          .then((response) => setTarjetas(response.data || []))
+          .catch((err) => console.warn('Error al cargar tarjetas:', err))
+      },
+    })
+  }, [])
+
+  useEffect(() => {
+    cargarTendencias(horizonte)
+  }, [horizonte])
+
+  // Horizontes largos se agrupan por trimestre; el backend resuelve cualquier horizonte con dos consultas
+  const cargarTendencias = async (meses: number) => {
+    try {
+      const tendenciasResponse = await alertasApi.getTendencias({
+        meses,
+        granularidad: meses > 24 ? 'trimestre' : 'mes'
+      })
+      setTendencias(tendenciasResponse.data)
+    } catch (err) {
+      console.warn('Error al cargar tendencias:', err)
+      setTendencias(null)
+    }
+  }
+
   const cargarDatos = async () => {
     try {
       setLoading(true)
@@ -38,21 +75,12 @@ const Dashboard: React.FC = () => {
       // Cargar alertas (solo las más importantes)
       try {
         const alertasResponse = await alertasApi.getAll()
-        setAlertas(alertasResponse.data?.slice(0, 5) || []) // Solo las primeras 5
+        setAlertas(alertasResponse.data || [])
       } catch (err) {
         console.warn('Error al cargar alertas:', err)
         setAlertas([])
       }
 
-      // Cargar tendencias
-      try {
-        const tendenciasResponse = await alertasApi.getTendencias()
-        setTendencias(tendenciasResponse.data)
-      } catch (err) {
-        console.warn('Error al cargar tendencias:', err)
-        setTendencias(null)
-      }
-
       // Cargar tarjetas
       try {
         const tarjetasResponse = await tarjetasApi.getAll()
@@ -139,12 +167,12 @@ const Dashboard: React.FC = () => {
 
   // Preparar datos para gráficos
   const datosGrafico = (tendencias?.saldos && tendencias?.ingresos && tendencias?.gastos) 
-    ? tendencias.saldos.slice().reverse().map((item: any, index: number) => ({
+    ? tendencias.saldos.map((item: any, index: number) => ({
         mes: item?.mes || '',
         ingresos: tendencias.ingresos[index]?.total || 0,
         gastos: tendencias.gastos[index]?.total || 0,
         saldo: item?.total || 0
-      }))
+      })).reverse()
     : []
 
   return (
@@ -219,9 +247,21 @@ const Dashboard: React.FC = () => {
           borderRadius: '8px',
           boxShadow: '0 2px 4px rgba(0,0,0,0.1)'
         }}>
-          <h2 style={{ margin: '0 0 1rem 0', fontSize: '1.2rem', color: '#2c3e50' }}>
-            Tendencias de los Últimos 6 Meses
-          </h2>
+          <div style={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', marginBottom: '1rem' }}>
+            <h2 style={{ margin: 0, fontSize: '1.2rem', color: '#2c3e50' }}>
+              Tendencias de los Últimos {horizonte >= 12 ? `${horizonte / 12} Año${horizonte > 12 ? 's' : ''}` : `${horizonte} Meses`}
+            </h2>
+            <select
+              value={horizonte}
+              onChange={(e) => setHorizonte(Number(e.target.value))}
+              style={{ padding: '0.25rem 0.5rem', borderRadius: '4px', border: '1px solid #dee2e6' }}
+            >
+              <option value={6}>6 meses</option>
+              <option value={12}>1 año</option>
+              <option value={24}>2 años</option>
+              <option value={60}>5 años</option>
+            </select>
+          </div>
           {datosGrafico.length > 0 ? (
             <ResponsiveContainer width="100%" height={300}>
               <LineChart data={datosGrafico}>
@@ -266,7 +306,7 @@ const Dashboard: React.FC = () => {
           </div>
           {alertas.length > 0 ? (
             <div style={{ display: 'flex', flexDirection: 'column', gap: '0.75rem' }}>
-              {alertas.map((alerta, index) => {
+              {alertas.slice(0, 5).map((alerta, index) => {
                 const colors = getColorSeveridad(alerta.severidad)
                 return (
                   <div
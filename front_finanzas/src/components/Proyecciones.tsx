@@ -118,13 +118,18 @@ const Proyecciones: React.FC = () => {
     setGastosEditando(nuevas)
   }
 
-  const guardarGasto = async (gastoId: number) => {
-    const nuevaDescripcion = gastosEditando.get(gastoId)
-    if (nuevaDescripcion === undefined) return
+  // Todas las descripciones editadas se guardan en un solo request (/gastos/bulk)
+  const guardarGastos = async (gastoIds: number[]) => {
+    const cambios = gastoIds
+      .filter(id => gastosEditando.has(id))
+      .map(id => ({ id, descripcion: gastosEditando.get(id) as string }))
+    if (cambios.length === 0) return
+    const ids = cambios.map(c => c.id)
+    const descripciones = new Map(cambios.map(c => [c.id, c.descripcion]))
 
     try {
-      setGastosGuardando(prev => new Set(prev).add(gastoId))
-      await gastosApi.update(gastoId, { descripcion: nuevaDescripcion })
+      setGastosGuardando(prev => new Set([...prev, ...ids]))
+      await gastosApi.bulk({ modificar: cambios })
       
       // Actualizar la proyección local
       setProyecciones(prev => prev.map(proy => ({
@@ -132,24 +137,30 @@ const Proyecciones: React.FC = () => {
         detalle: proy.detalle.map(det => ({
           ...det,
           gastos: det.gastos?.map(g => 
-            g.id === gastoId ? { ...g, descripcion: nuevaDescripcion } : g
+            descripciones.has(g.id) ? { ...g, descripcion: descripciones.get(g.id) } : g
           )
         }))
       })))
       
-      cancelarEdicionGasto(gastoId)
+      setGastosEditando(prev => {
+        const nuevas = new Map(prev)
+        ids.forEach(id => nuevas.delete(id))
+        return nuevas
+      })
     } catch (error) {
-      console.error('Error al guardar gasto:', error)
+      console.error('Error al guardar gastos:', error)
       alert('Error al guardar la descripción. Por favor, intenta nuevamente.')
     } finally {
       setGastosGuardando(prev => {
         const nuevas = new Set(prev)
-        nuevas.delete(gastoId)
+        ids.forEach(id => nuevas.delete(id))
         return nuevas
       })
     }
   }
 
+  const guardarGasto = (gastoId: number) => guardarGastos([gastoId])
+
   if (loading) {
     return (
       <div style={{ padding: '2rem', textAlign: 'center' }}>
@@ -183,6 +194,23 @@ const Proyecciones: React.FC = () => {
             <option value={6}>6 meses</option>
             <option value={12}>12 meses</option>
           </select>
+          {gastosEditando.size > 1 && (
+            <button
+              onClick={() => guardarGastos(Array.from(gastosEditando.keys()))}
+              disabled={gastosGuardando.size > 0}
+              style={{
+                padding: '0.5rem 1rem',
+                backgroundColor: '#27ae60',
+                color: '#fff',
+                border: 'none',
+                borderRadius: '4px',
+                cursor: gastosGuardando.size > 0 ? 'not-allowed' : 'pointer',
+                opacity: gastosGuardando.size > 0 ? 0.6 : 1
+              }}
+            >
+              {gastosGuardando.size > 0 ? 'Guardando...' : `Guardar todos (${gastosEditando.size})`}
+            </button>
+          )}
         </div>
       </div>
 
@@ -1,4 +1,4 @@
-import axios from 'axios'
+import axios, { AxiosResponse, InternalAxiosRequestConfig } from 'axios'
 
 const API_URL = 'http://localhost:8000/api'
 
@@ -9,6 +9,67 @@ const api = axios.create({
   },
 })
 
+// Cache de GET condicionales: guarda las respuestas con ETag y las revalida con
+// If-None-Match; un 304 devuelve los datos guardados. Respeta Cache-Control:
+// no-store no se guarda y max-age se sirve sin consultar al servidor mientras dure.
+interface RespuestaCacheada {
+  etag: string
+  data: unknown
+  expira: number
+}
+
+const respuestasCacheadas = new Map<string, RespuestaCacheada>()
+
+const esGet = (config: InternalAxiosRequestConfig) => (config.method ?? 'get').toLowerCase() === 'get'
+
+const maxAge = (cacheControl: string): number => {
+  if (/no-cache|no-store/.test(cacheControl)) return 0
+  const coincidencia = cacheControl.match(/max-age=(\d+)/)
+  return coincidencia ? Number(coincidencia[1]) : 0
+}
+
+api.interceptors.request.use((config) => {
+  if (!esGet(config)) return config
+  const cacheada = respuestasCacheadas.get(api.getUri(config))
+  if (!cacheada) return config
+
+  if (cacheada.expira > Date.now()) {
+    config.adapter = async () => ({
+      data: cacheada.data,
+      status: 200,
+      statusText: 'OK',
+      headers: { etag: cacheada.etag },
+      config,
+    })
+    return config
+  }
+  config.headers.set('If-None-Match', cacheada.etag)
+  config.validateStatus = (status) => (status >= 200 && status < 300) || status === 304
+  return config
+})
+
+api.interceptors.response.use((response: AxiosResponse) => {
+  if (!esGet(response.config)) return response
+  const clave = api.getUri(response.config)
+  const cacheControl = String(response.headers['cache-control'] ?? '')
+  const cacheada = respuestasCacheadas.get(clave)
+
+  if (response.status === 304 && cacheada) {
+    cacheada.expira = Date.now() + maxAge(cacheControl) * 1000
+    return { ...response, status: 200, statusText: 'OK', data: cacheada.data }
+  }
+
+  const etag = response.headers['etag']
+  if (response.status === 200 && etag && !cacheControl.includes('no-store')) {
+    respuestasCacheadas.set(clave, {
+      etag: String(etag),
+      data: response.data,
+      expira: Date.now() + maxAge(cacheControl) * 1000,
+    })
+  }
+  return response
+})
+
 // Tipos
 export interface Ingreso {
   id: number
@@ -80,6 +141,9 @@ export interface Prestamo {
   fecha_inicio: string
   fecha_vencimiento?: string
   cuota_mensual?: number
+  sistema_amortizacion?: 'Francés' | 'Alemán' | 'UVA'
+  cantidad_cuotas?: number
+  valor_uva_inicial?: number
   descripcion?: string
   activo: boolean
   created_at: string
@@ -94,6 +158,35 @@ export interface PrestamoCreate {
   fecha_inicio: string
   fecha_vencimiento?: string
   cuota_mensual?: number
+  sistema_amortizacion?: 'Francés' | 'Alemán' | 'UVA'
+  cantidad_cuotas?: number
+  valor_uva_inicial?: number
+  descripcion?: string
+}
+
+export interface CuotaPrestamo {
+  id: number
+  prestamo_id: number
+  fecha_vencimiento: string
+  numero_cuota: number
+  monto_total: number
+  capital: number
+  intereses: number
+  iva_intereses: number
+  impuesto_ganancias: number
+  gastos_administrativos: number
+  seguro: number
+  otros_impuestos: number
+  saldo_capital: number
+  moneda: 'ARS' | 'USD'
+  descripcion?: string
+  pagada: boolean
+}
+
+export interface PagoPrestamoCreate {
+  prestamo_id: number
+  fecha_pago: string
+  monto: number
   descripcion?: string
 }
 
@@ -152,13 +245,35 @@ export interface Alerta {
   detalle: any
 }
 
+export interface TendenciasParams {
+  meses?: number
+  granularidad?: 'semana' | 'mes' | 'trimestre'
+  ventana?: number
+  real?: boolean
+  base?: string
+}
+
 // API calls
+// Altas, modificaciones y bajas en una sola transacción (/bulk)
+export interface Lote<TCreate> {
+  crear?: TCreate[]
+  modificar?: Array<Partial<TCreate> & { id: number }>
+  eliminar?: number[]
+}
+
+export interface LoteResultado<T> {
+  creados: T[]
+  modificados: T[]
+  eliminados: number[]
+}
+
 export const ingresosApi = {
   getAll: () => api.get<Ingreso[]>('/ingresos'),
   getById: (id: number) => api.get<Ingreso>(`/ingresos/${id}`),
   create: (data: IngresoCreate) => api.post<Ingreso>('/ingresos', data),
   update: (id: number, data: Partial<IngresoCreate>) => api.put<Ingreso>(`/ingresos/${id}`, data),
   delete: (id: number) => api.delete(`/ingresos/${id}`),
+  bulk: (lote: Lote<IngresoCreate>) => api.post<LoteResultado<Ingreso>>('/ingresos/bulk', lote),
 }
 
 export const gastosApi = {
@@ -167,6 +282,7 @@ export const gastosApi = {
   create: (data: GastoCreate) => api.post<Gasto>('/gastos', data),
   update: (id: number, data: Partial<GastoCreate>) => api.put<Gasto>(`/gastos/${id}`, data),
   delete: (id: number) => api.delete(`/gastos/${id}`),
+  bulk: (lote: Lote<GastoCreate>) => api.post<LoteResultado<Gasto>>('/gastos/bulk', lote),
 }
 
 export const tarjetasApi = {
@@ -183,6 +299,8 @@ export const prestamosApi = {
   create: (data: PrestamoCreate) => api.post<Prestamo>('/prestamos', data),
   update: (id: number, data: Partial<PrestamoCreate>) => api.put<Prestamo>(`/prestamos/${id}`, data),
   delete: (id: number) => api.delete(`/prestamos/${id}`),
+  getCronograma: (id: number) => api.get<CuotaPrestamo[]>(`/prestamos/${id}/cronograma`),
+  registrarPago: (id: number, data: PagoPrestamoCreate) => api.post(`/prestamos/${id}/pagos`, data),
 }
 
 export const inversionesApi = {
@@ -206,8 +324,68 @@ export const reportesApi = {
 }
 
 export const alertasApi = {
-  getAll: () => api.get<Alerta[]>('/alertas'),
-  getTendencias: () => api.get('/alertas/tendencias'),
+  getAll: (real = false) => api.get<Alerta[]>('/alertas', { params: { real } }),
+  getTendencias: (params: TendenciasParams = {}) => api.get('/alertas/tendencias', { params }),
+}
+
+// Sincronización incremental: aplicar primero `eliminados` y después `cambios`;
+// con `reiniciar` la respuesta trae todas las filas y reemplaza la copia local
+export interface Sincronizacion {
+  cursor: string
+  reiniciar: boolean
+  cambios: Record<string, Array<Record<string, unknown> & { id: number }>>
+  eliminados: Record<string, number[]>
+}
+
+export const syncApi = {
+  get: (since?: string) => api.get<Sincronizacion>('/sync', { params: since ? { since } : {} }),
+}
+
+// Eventos del servidor (/api/eventos, Server-Sent Events): al conectarse llega `estado`
+// con la foto completa y después solo los cambios
+export interface SaldoTarjeta {
+  tarjeta_id: number
+  nombre: string
+  moneda: 'ARS' | 'USD'
+  saldo_actual: number
+  saldo_anterior?: number | null
+}
+
+export interface CambiosAlertas {
+  nuevas: Alerta[]
+  modificadas: Alerta[]
+  resueltas: Array<Pick<Alerta, 'tipo' | 'titulo'>>
+}
+
+export interface Importacion {
+  tarjeta_id: number
+  gastos_creados: number
+  monto_total?: number | null
+}
+
+export interface ManejadoresEventos {
+  estado?: (datos: { alertas: Alerta[]; tarjetas: SaldoTarjeta[] }) => void
+  alertas?: (cambios: CambiosAlertas) => void
+  saldo_tarjeta?: (saldo: SaldoTarjeta) => void
+  importacion?: (importacion: Importacion) => void
+}
+
+// Devuelve la función que cierra la conexión (EventSource reconecta solo y vuelve a recibir `estado`)
+export const suscribirEventos = (manejadores: ManejadoresEventos): (() => void) => {
+  const fuente = new EventSource(`${API_URL}/eventos`)
+  for (const [tipo, manejador] of Object.entries(manejadores)) {
+    if (manejador) {
+      fuente.addEventListener(tipo, (e) => manejador(JSON.parse((e as MessageEvent).data)))
+    }
+  }
+  return () => fuente.close()
+}
+
+// Aplica un evento `alertas` a la lista (una alerta se identifica por tipo y título)
+export const aplicarCambiosAlertas = (alertas: Alerta[], cambios: CambiosAlertas): Alerta[] => {
+  const clave = (a: Pick<Alerta, 'tipo' | 'titulo'>) => `${a.tipo}|${a.titulo}`
+  const quitar = new Set([...cambios.resueltas, ...cambios.modificadas].map(clave))
+  return [...alertas.filter((a) => !quitar.has(clave(a))), ...cambios.modificadas, ...cambios.nuevas]
 }
 
 export default api